@@ -0,0 +1,96 @@
+"""Benchmark do pré-processamento de áudio (mono 16 kHz Opus + remoção de silêncio).
+
+Para cada arquivo informado (ou, sem argumentos, para amostras sintéticas que
+imitam mensagens de voz: fala entremeada de pausas e respiração), mostra o
+tamanho enviado ao Whisper, os segundos faturados e o tempo gasto no
+pré-processamento. Requer ffmpeg no PATH.
+
+Uso:
+    python benchmarks/bench_audio_preprocessing.py [arquivo ...]
+"""
+import asyncio
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-bench')
+
+from pydub import AudioSegment  # noqa: E402
+from pydub.generators import Sine, WhiteNoise  # noqa: E402
+
+from src.models.audio import AudioPayload  # noqa: E402
+from src.services.audio_processing import AudioPreprocessor  # noqa: E402
+
+UPLOAD_MBPS = 2.0  # banda de upload assumida para estimar o tempo de envio
+
+
+def _speech_like(ms: int) -> AudioSegment:
+    # tons modulados + ruído: grosseiro, mas com energia de fala
+    tone = Sine(180).to_audio_segment(duration=ms, volume=-18)
+    tone = tone.overlay(Sine(420).to_audio_segment(duration=ms, volume=-24))
+    return tone.overlay(WhiteNoise().to_audio_segment(duration=ms, volume=-35))
+
+
+def _breath(ms: int) -> AudioSegment:
+    return WhiteNoise().to_audio_segment(duration=ms, volume=-60)
+
+
+def _synthetic_voice_note(lead_ms: int, words: int, pause_ms: int, tail_ms: int) -> AudioSegment:
+    audio = _breath(lead_ms)
+    for _ in range(words):
+        audio += _speech_like(700) + _breath(pause_ms)
+    audio += _breath(tail_ms)
+    # formato típico de voz do Telegram: Opus 48 kHz
+    return audio.set_frame_rate(48000).set_channels(2)
+
+
+def _encode_ogg(segment: AudioSegment) -> bytes:
+    out = io.BytesIO()
+    segment.export(out, format="ogg", codec="libopus", bitrate="64k")
+    return out.getvalue()
+
+
+def _samples():
+    specs = {
+        "curto_pausado.ogg": (1500, 6, 1200, 2000),
+        "medio.ogg": (800, 12, 600, 1000),
+        "hesitante.ogg": (3000, 8, 2500, 3000),
+    }
+    for name, spec in specs.items():
+        yield name, _encode_ogg(_synthetic_voice_note(*spec))
+
+
+def _files(paths):
+    for path in paths:
+        with open(path, 'rb') as f:
+            yield os.path.basename(path), f.read()
+
+
+async def main(paths):
+    preprocessor = AudioPreprocessor()
+    samples = _files(paths) if paths else _samples()
+
+    print(f"{'arquivo':<22} {'KB antes':>9} {'KB depois':>10} {'s antes':>8} {'s depois':>9} {'upload poupado':>15} {'ms':>6}")
+    for name, data in samples:
+        _, stats = await preprocessor.process(AudioPayload(data=data, filename=name))
+        if stats is None:
+            print(f"{name:<22} falhou (ffmpeg instalado?)")
+            continue
+        saved_ms = (stats.original_bytes - stats.processed_bytes) * 8 / (UPLOAD_MBPS * 1_000_000) * 1000
+        print(
+            f"{name:<22} {stats.original_bytes / 1024:>9.1f} {stats.processed_bytes / 1024:>10.1f} "
+            f"{stats.original_seconds:>8.1f} {stats.processed_seconds:>9.1f} {saved_ms:>12.0f} ms {stats.elapsed_ms:>6.0f}"
+        )
+
+    totals = preprocessor.snapshot()
+    if totals["seconds_in"]:
+        print(
+            f"\ntotal: {totals['bytes_in'] / 1024:.1f} KB → {totals['bytes_out'] / 1024:.1f} KB, "
+            f"{totals['seconds_in']:.1f}s → {totals['seconds_out']:.1f}s faturados "
+            f"({1 - totals['seconds_out'] / totals['seconds_in']:.0%} menos)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,113 @@
+"""Benchmark: N áudios processados em paralelo pelo workflow assíncrono.
+
+Substitui as chamadas externas (Whisper, LLM e Organizze) por `asyncio.sleep`
+com latências fixas e compara o tempo total de N execuções concorrentes com o
+tempo de uma única execução. Com o grafo rodando no event loop, N áudios devem
+terminar em aproximadamente o tempo de um.
+
+Uso:
+    python benchmarks/bench_concurrent_audio.py [N]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-bench')
+
+from src.graph import nodes  # noqa: E402
+from src.graph.workflow import create_expense_workflow  # noqa: E402
+from src.models.audio import AudioPayload  # noqa: E402
+from src.models.expense import Category, Account, CreditCard  # noqa: E402
+
+WHISPER_LATENCY = 0.8
+LLM_LATENCY = 0.6
+ORGANIZZE_LATENCY = 0.15
+
+
+# data de hoje: datas antigas seriam reprovadas no roteamento e iriam ao modelo forte
+_FAKE_EXTRACTION = {
+    "description": "Mercado", "date": date.today().isoformat(), "amount_cents": -5000,
+    "category_name": "Mercado", "payment_method": "cartão de crédito",
+    "card_name": "Nubank", "account_name": None,
+}
+
+
+class _FakeLLM:
+    """Imita `with_structured_output(..., include_raw=True)` do ChatOpenAI"""
+
+    @staticmethod
+    def get_num_tokens(text):
+        return len(text) // 4
+
+    def with_structured_output(self, schema, **kwargs):
+        async def ainvoke(prompt):
+            await asyncio.sleep(LLM_LATENCY)
+            return {"raw": None, "parsed": schema(**_FAKE_EXTRACTION), "parsing_error": None}
+        return type("FakeStructuredLLM", (), {"ainvoke": staticmethod(ainvoke)})()
+
+
+async def _fake_transcribe(audio):
+    await asyncio.sleep(WHISPER_LATENCY)
+    return "gastei 50 reais no mercado no cartão Nubank"
+
+
+async def _fake_get(value):
+    await asyncio.sleep(ORGANIZZE_LATENCY)
+    return value
+
+
+async def _fake_create_transaction(expense):
+    await asyncio.sleep(ORGANIZZE_LATENCY)
+    return {"id": 1}
+
+
+def _install_fakes():
+    categories = [Category(id=1, name="Mercado", kind="expense")]
+    accounts = [Account(id=10, name="Conta Corrente", type="checking")]
+    cards = [CreditCard(id=20, name="Nubank")]
+
+    nodes.audio_preprocessor.enabled = False
+    # mede o caminho com LLM (latência simulada), não o fast-path local
+    nodes.extraction_service.local_parser = None
+    nodes.transcription_service.transcribe = _fake_transcribe
+    nodes.extraction_service.llm = _FakeLLM()
+    for client in (nodes.organizze_client, nodes.extraction_service.organizze_client):
+        client.get_categories = lambda force_refresh=False: _fake_get(categories)
+        client.get_accounts = lambda force_refresh=False: _fake_get(accounts)
+        client.get_credit_cards = lambda force_refresh=False: _fake_get(cards)
+        client.create_transaction = _fake_create_transaction
+
+
+def _initial_state(i: int) -> dict:
+    return {
+        "audio": AudioPayload(data=b"OggS", filename=f"voice_{i}.ogg"),
+        "transcription": "",
+        "expense_data": None,
+        "organizze_response": None,
+        "messages": [],
+    }
+
+
+async def main(n: int):
+    _install_fakes()
+    workflow = create_expense_workflow()
+
+    start = time.perf_counter()
+    await workflow.ainvoke(_initial_state(0))  # falhas de nó são exceções (StepError)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(workflow.ainvoke(_initial_state(i)) for i in range(n)))
+    concurrent = time.perf_counter() - start
+
+    print(f"1 áudio:              {single:.2f}s")
+    print(f"{n} áudios (paralelo): {concurrent:.2f}s")
+    print(f"{n} áudios (serial, estimado): {single * n:.2f}s")
+    print(f"razão paralelo/único: {concurrent / single:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
@@ -0,0 +1,211 @@
+"""Benchmark de ponta a ponta, offline: o `main.py` real contra Telegram, OpenAI e Organizze locais.
+
+Sobe `fake_telegram`, `fake_openai` e `fake_organizze` (HTTP de verdade, com
+latências configuráveis), aponta o app para eles por variáveis de ambiente e
+envia N updates de voz ao `/webhook` com a concorrência pedida. Nada é
+substituído dentro do app: download, Whisper, modelo, Organizze, fila,
+outbox e camada de resiliência rodam como em produção.
+
+Os tempos por etapa vêm dos spans do tracing (exportador em memória):
+p50/p95/p99, máximo e vazão de cada etapa — webhook, espera na fila,
+download, cada nó do workflow, cada chamada externa e o update inteiro —,
+além do tempo até a resposta final no chat e até a confirmação do outbox.
+
+Uso:
+    python benchmarks/bench_end_to_end.py [--updates N] [--concurrency C] [--workers W] [--chats K]
+        [--telegram-latency S] [--whisper-latency S] [--llm-latency S] [--organizze-latency S]
+        [--error-rate F] [--fast-path]
+
+Fakes e app dividem o mesmo processo e event loop: os números servem para
+comparar mudanças entre si, não como latência absoluta de produção.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from fake_openai import FakeOpenAI  # noqa: E402
+from fake_organizze import FakeOrganizze  # noqa: E402
+from fake_telegram import FakeTelegram, voice_update  # noqa: E402
+
+# (rótulo, span) na ordem do caminho de um update
+STAGES = [
+    ("webhook", "telegram.webhook"),
+    ("espera na fila", "update_queue.wait"),
+    ("download", "telegram.download"),
+    ("nó preprocess", "node.preprocess"),
+    ("nó transcribe", "node.transcribe"),
+    ("  chamada whisper", "openai_whisper.call"),
+    ("nó load_metadata", "node.load_metadata"),
+    ("nó extract", "node.extract"),
+    ("  chamada modelo", "openai_chat.call"),
+    ("nó send", "node.send"),
+    ("nó finalize", "node.finalize"),
+    ("  chamada organizze", "organizze.call"),
+    ("update (fila + processamento)", "telegram.update"),
+]
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20, help="POSTs simultâneos ao /webhook")
+    parser.add_argument("--workers", type=int, default=8, help="UPDATE_CONCURRENCY")
+    parser.add_argument("--queue", type=int, default=1000, help="UPDATE_QUEUE_SIZE")
+    parser.add_argument("--chats", type=int, default=0, help="chats distintos (0 = um por update)")
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--whisper-latency", type=float, default=0.8)
+    parser.add_argument("--llm-latency", type=float, default=0.6)
+    parser.add_argument("--organizze-latency", type=float, default=0.15)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 503 da OpenAI e do Organizze")
+    parser.add_argument("--fast-path", action="store_true", help="mantém o parser local (sem chamada ao modelo)")
+    return parser.parse_args()
+
+
+async def main(args) -> int:
+    telegram = FakeTelegram(latency=args.telegram_latency)
+    openai_server = FakeOpenAI(transcription_latency=args.whisper_latency, chat_latency=args.llm_latency)
+    organizze = FakeOrganizze(latency=args.organizze_latency)
+    for faults in (openai_server.transcription_faults, openai_server.chat_faults,
+                   organizze.read_faults, organizze.write_faults):
+        faults.error_rate = args.error_rate
+    for server in (telegram, openai_server, organizze):
+        await server.start()
+
+    # configuração lida no import de `main`/`settings`
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'TELEGRAM_BOT_TOKEN': '123:bench',
+        'OPENAI_API_KEY': 'sk-bench',
+        'BOT_MODE': 'webhook',
+        'WEBHOOK_URL': 'http://localhost/webhook',
+        'AUTO_SET_WEBHOOK': '0',
+        'TELEGRAM_API_BASE_URL': telegram.base_url,
+        'OPENAI_BASE_URL': openai_server.base_url,
+        'ORGANIZZE_API_BASE': organizze.base_url,
+        'UPDATE_CONCURRENCY': str(args.workers),
+        'UPDATE_QUEUE_SIZE': str(args.queue),
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+        'OUTBOX_RATE_PER_ACCOUNT': '0',
+        'OUTBOX_BACKOFF_BASE': '0.1',
+        'CHECKPOINT_PATH': os.path.join(workdir, 'checkpoints.sqlite3'),
+        'TRACING_EXPORTER': 'memory',
+        'FAST_PATH_ENABLED': '1' if args.fast_path else '0',
+        # o áudio falso não é decodificável: o pré-processamento só somaria avisos
+        'AUDIO_PREPROCESSING': '0',
+    })
+    import httpx
+    import main as app_module
+    from src.services import tracing
+
+    app = app_module.app
+    chats = args.chats or args.updates
+    statuses: Dict[int, int] = {}
+    accepted = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with app.router.lifespan_context(app):
+        tracing.memory_exporter.clear()  # só os spans dos updates
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+
+            async def post(update_id: int):
+                nonlocal accepted
+                async with semaphore:
+                    response = await client.post("/webhook", json=voice_update(update_id, 1000 + update_id % chats))
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                accepted += response.status_code == 200
+
+            started = time.monotonic()
+            await asyncio.gather(*(post(i) for i in range(1, args.updates + 1)))
+
+            # fila vazia: todos os updates aceitos respondidos no chat
+            while True:
+                stats = (await client.get("/stats")).json()
+                queue = stats["update_queue"]
+                if queue["pending"] == 0 and queue["processed"] + queue["failed"] >= accepted:
+                    break
+                await asyncio.sleep(0.05)
+            answered = time.monotonic() - started
+
+            # outbox vazio: gastos enviados ao Organizze e respostas confirmadas
+            while stats["outbox"] and stats["outbox"]["pending"]:
+                await asyncio.sleep(0.05)
+                stats = (await client.get("/stats")).json()
+            confirmed = time.monotonic() - started
+
+    spans = tracing.memory_exporter.get_finished_spans()
+    for server in (telegram, openai_server, organizze):
+        await server.stop()
+
+    print(f"{args.updates} updates em {chats} chats, concorrência {args.concurrency}, {args.workers} workers")
+    print(f"latências simuladas: telegram {args.telegram_latency}s, whisper {args.whisper_latency}s, "
+          f"modelo {args.llm_latency}s, organizze {args.organizze_latency}s, erros {args.error_rate:.0%}")
+    print(f"respostas do webhook: {statuses}")
+    print(f"respondidos em {answered:.2f}s ({accepted / answered:.1f} updates/s); "
+          f"outbox confirmado em {confirmed:.2f}s")
+    print()
+    print(f"{'etapa':<32}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}{'erros':>7}{'vazão/s':>9}")
+    for label, name in STAGES:
+        stage = [span for span in spans if span.name == name]
+        if stage:
+            print(_row(label, stage))
+
+    chat_finals = _chat_latencies(telegram, spans)
+    if chat_finals:
+        print(f"\naté a resposta final no chat (desde o webhook): {_format_percentiles(chat_finals)}")
+    routing = stats["extraction"]["routing"]
+    print("camadas da extração: " + ", ".join(
+        f"{tier} {tiers['accepted']}/{tiers['attempts']} aceitas" for tier, tiers in routing["tiers"].items()
+        if tiers["attempts"]
+    ))
+    resilience = stats["resilience"]
+    print("resiliência: " + ", ".join(
+        f"{name} {dep['retries']} novas tentativas/{dep['timeouts']} timeouts" for name, dep in resilience.items()
+    ))
+    print(f"outbox: {stats['outbox']['sent']} enviados, {stats['outbox']['retries']} novas tentativas, "
+          f"{stats['outbox']['failed']} falhas" if stats["outbox"] else "outbox desabilitado")
+    return 0 if accepted == args.updates and queue["failed"] == 0 else 1
+
+
+def _row(label: str, spans) -> str:
+    durations = sorted((span.end_time - span.start_time) / 1e6 for span in spans)
+    errors = sum(1 for span in spans if not span.status.is_ok)
+    window = (max(span.end_time for span in spans) - min(span.start_time for span in spans)) / 1e9
+    rate = len(spans) / window if window > 0 else float('inf')
+    return (f"{label:<32}{len(durations):>6}{_pick(durations, 0.50):>10.1f}{_pick(durations, 0.95):>10.1f}"
+            f"{_pick(durations, 0.99):>10.1f}{durations[-1]:>10.1f}{errors:>7}{rate:>9.1f}")
+
+
+def _chat_latencies(telegram: FakeTelegram, spans) -> List[float]:
+    """Do início do webhook até a resposta final (com o resultado) no chat do update"""
+    webhook_start: Dict[int, List[float]] = {}
+    for span in sorted((s for s in spans if s.name == "telegram.webhook"), key=lambda s: s.start_time):
+        chat_id = span.attributes.get("telegram.chat_id")
+        webhook_start.setdefault(chat_id, []).append(span.start_time / 1e9)
+    # relógios diferentes (monotônico no fake, parede nos spans): alinha pelo deslocamento atual
+    offset = time.time() - time.monotonic()
+    latencies = []
+    for chat_id, starts in webhook_start.items():
+        finals = [m.at + offset for m in telegram.messages_for(chat_id) if "Transcrição" in m.text or "❌" in m.text]
+        latencies.extend((final - start) * 1000 for start, final in zip(starts, finals))
+    return sorted(latencies)
+
+
+def _pick(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _format_percentiles(values: List[float]) -> str:
+    return (f"p50={_pick(values, 0.50):.1f} ms  p95={_pick(values, 0.95):.1f} ms  "
+            f"p99={_pick(values, 0.99):.1f} ms  máx={values[-1]:.1f} ms")
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main(_parse_args())))
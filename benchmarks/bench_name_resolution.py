@@ -0,0 +1,86 @@
+"""Micro-benchmark: resolução de nomes com índice vs. busca linear antiga.
+
+Gera algumas centenas de categorias e mede o tempo por busca da varredura
+linear (`lower()` + substring, como antes) e do `NameIndex`, além do tempo de
+construção do índice. Também mostra onde as duas abordagens discordam.
+
+Uso:
+    python benchmarks/bench_name_resolution.py [N_CATEGORIAS]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.expense import Category  # noqa: E402
+from src.services.name_index import NameIndex  # noqa: E402
+
+BASE_NAMES = [
+    "Alimentação", "Mercado", "Supermercado", "Restaurante", "Delivery", "Padaria",
+    "Transporte", "Combustível", "Estacionamento", "Uber e Táxi", "Saúde", "Farmácia",
+    "Academia", "Moradia", "Aluguel", "Condomínio", "Energia Elétrica", "Água",
+    "Internet", "Celular", "Lazer", "Viagem", "Educação", "Livros", "Vestuário",
+    "Presentes", "Pets", "Beleza", "Assinaturas", "Impostos",
+]
+QUERIES = [
+    "alimentacao", "Farmacia", "mercado", "supermercado", "uber", "energia",
+    "combustivel", "saude", "condominio", "educação", "pet", "viagens",
+]
+ROUNDS = 2000
+
+
+def _categories(n: int):
+    categories = []
+    for i in range(n):
+        base = BASE_NAMES[i % len(BASE_NAMES)]
+        name = base if i < len(BASE_NAMES) else f"{base} {i // len(BASE_NAMES)}"
+        categories.append(Category(id=i, name=name, kind="expense"))
+    return categories
+
+
+def _legacy_find(categories, name):
+    lower = name.lower()
+    for cat in categories:
+        if cat.name.lower() == lower:
+            return cat
+    for cat in categories:
+        if lower in cat.name.lower() or cat.name.lower() in lower:
+            return cat
+    return None
+
+
+def _per_lookup_us(fn):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in QUERIES:
+            fn(query)
+    return (time.perf_counter() - start) / (ROUNDS * len(QUERIES)) * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    categories = _categories(n)
+
+    start = time.perf_counter()
+    index = NameIndex(categories)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    legacy_us = _per_lookup_us(lambda q: _legacy_find(categories, q))
+    search_us = _per_lookup_us(index._search)  # primeira busca de cada nome (sem memo)
+    index_us = _per_lookup_us(index.find)
+
+    print(f"{n} categorias, {len(QUERIES)} buscas x {ROUNDS}")
+    print(f"construção do índice: {build_ms:.2f} ms (uma vez por atualização do cache)")
+    print(f"busca linear:      {legacy_us:.1f} µs/busca")
+    print(f"índice, 1ª busca:  {search_us:.1f} µs/busca ({legacy_us / search_us:.1f}x)")
+    print(f"índice, repetida:  {index_us:.1f} µs/busca ({legacy_us / index_us:.1f}x)")
+    print()
+    for query in QUERIES:
+        legacy = _legacy_find(categories, query)
+        indexed = index.find(query)
+        print(f"  {query!r:16} linear={legacy.name if legacy else None!s:20} índice={indexed.name if indexed else None}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Servidor local que imita a API da OpenAI usada pelo bot (com injeção de falhas).
+
+- `POST /v1/audio/transcriptions`: devolve `transcript`;
+- `POST /v1/chat/completions`: responde com uma chamada da ferramenta pedida
+  (saída estruturada por function calling) com os argumentos de `extraction`,
+  incluindo `usage`.
+
+Uso programático:
+    server = FakeOpenAI()
+    await server.start()          # server.base_url -> OPENAI_BASE_URL
+    ...
+    await server.stop()
+"""
+import json
+import time
+from datetime import date
+from typing import Dict
+
+from fastapi import FastAPI, Request
+
+from fake_server import Faults, LocalServer
+
+DEFAULT_TRANSCRIPT = "gastei 50 reais no mercado no cartão Nubank"
+# data de hoje: datas antigas seriam reprovadas no roteamento e iriam ao modelo forte
+DEFAULT_EXTRACTION = {
+    "description": "Mercado", "date": date.today().isoformat(), "amount_cents": -5000,
+    "category_name": "Mercado", "payment_method": "cartão de crédito",
+    "card_name": "Nubank", "account_name": None,
+}
+
+
+class FakeOpenAI(LocalServer):
+    def __init__(self, transcription_latency: float = 0.0, chat_latency: float = 0.0, port: int = 0):
+        self.transcript = DEFAULT_TRANSCRIPT
+        self.extraction = dict(DEFAULT_EXTRACTION)
+        self.transcription_faults = Faults(latency=transcription_latency)
+        self.chat_faults = Faults(latency=chat_latency)
+        self.calls: Dict[str, int] = {}
+        super().__init__(port)
+
+    @property
+    def base_url(self) -> str:
+        return f"{super().base_url}/v1"
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/v1/audio/transcriptions")
+        async def transcriptions(request: Request):
+            self.calls["transcriptions"] = self.calls.get("transcriptions", 0) + 1
+            await request.body()  # multipart com o áudio: só consumido
+            error = await self.transcription_faults.apply()
+            return error or {"text": self.transcript}
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            self.calls["chat"] = self.calls.get("chat", 0) + 1
+            body = await request.json()
+            error = await self.chat_faults.apply()
+            if error:
+                return error
+            prompt_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages", []))
+            return _tool_call_response(body, self.extraction, prompt_tokens=prompt_chars // 4)
+
+        return app
+
+
+def _tool_call_response(body: dict, arguments: dict, prompt_tokens: int) -> dict:
+    # o nome da ferramenta precisa ser o do esquema pedido (o parser filtra por ele)
+    tool_name = body["tools"][0]["function"]["name"] if body.get("tools") else "extract"
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{
+            "index": 0,
+            "finish_reason": "tool_calls",
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": "call_fake",
+                    "type": "function",
+                    "function": {"name": tool_name, "arguments": json.dumps(arguments, ensure_ascii=False)},
+                }],
+            },
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": 40,
+            "total_tokens": prompt_tokens + 40,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        },
+    }
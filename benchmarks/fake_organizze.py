@@ -0,0 +1,79 @@
+"""Servidor local que imita a API REST v2 do Organizze (com injeção de falhas).
+
+Responde `categories`, `accounts`, `credit_cards` e `transactions` (listagem
+por data e criação). Leituras e gravações têm falhas independentes
+(`read_faults`, `write_faults`); as transações criadas ficam em
+`transactions`. Com `write_faults.after_commit`, a falha da gravação vem
+depois de criar a transação (resposta perdida no caminho).
+
+Uso programático:
+    server = FakeOrganizze()
+    await server.start()          # server.base_url -> ORGANIZZE_API_BASE
+    server.read_faults.fail_next = 2
+    ...
+    await server.stop()
+"""
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+
+from fake_server import Faults, LocalServer
+
+CATEGORIES = [
+    {"id": 1, "name": "Mercado", "kind": "expense", "archived": False},
+    {"id": 2, "name": "Restaurante", "kind": "expense", "archived": False},
+    {"id": 3, "name": "Transporte", "kind": "expense", "archived": False},
+    {"id": 4, "name": "Farmácia", "kind": "expense", "archived": False},
+    {"id": 5, "name": "Salário", "kind": "revenue", "archived": False},
+]
+ACCOUNTS = [{"id": 10, "name": "Conta Corrente", "type": "checking", "archived": False}]
+CREDIT_CARDS = [{"id": 20, "name": "Nubank", "archived": False}]
+
+
+class FakeOrganizze(LocalServer):
+    def __init__(self, latency: float = 0.0, port: int = 0):
+        self.read_faults = Faults(latency=latency)
+        self.write_faults = Faults(latency=latency)
+        self.transactions: List[dict] = []
+        self._last_id = 0
+        self.calls: Dict[str, int] = {}
+        super().__init__(port)
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI()
+        listings = {"categories": CATEGORIES, "accounts": ACCOUNTS, "credit_cards": CREDIT_CARDS}
+
+        @app.get("/transactions")
+        async def list_transactions(start_date: str = "", end_date: str = ""):
+            self.calls["list_transactions"] = self.calls.get("list_transactions", 0) + 1
+            error = await self.read_faults.apply()
+            return error or [
+                t for t in self.transactions
+                if (not start_date or t["date"] >= start_date) and (not end_date or t["date"] <= end_date)
+            ]
+
+        @app.get("/{resource}")
+        async def listing(resource: str):
+            self.calls[resource] = self.calls.get(resource, 0) + 1
+            error = await self.read_faults.apply()
+            return error or listings.get(resource, [])
+
+        @app.post("/transactions")
+        async def create_transaction(request: Request):
+            self.calls["transactions"] = self.calls.get("transactions", 0) + 1
+            transaction = self._new_transaction(await request.json())
+            committed = self.write_faults.after_commit
+            if committed:
+                self.transactions.append(transaction)
+            error = await self.write_faults.apply()
+            if error:
+                return error
+            if not committed:
+                self.transactions.append(transaction)
+            return transaction
+
+        return app
+
+    def _new_transaction(self, payload: dict) -> dict:
+        self._last_id += 1
+        return {"id": self._last_id, **payload}
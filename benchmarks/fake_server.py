@@ -0,0 +1,78 @@
+"""Base dos servidores locais que imitam APIs externas (Telegram, Organizze, OpenAI).
+
+Sobe um app FastAPI com uvicorn numa porta livre, no mesmo event loop do
+benchmark, e oferece injeção de falhas (`Faults`) para testar timeouts,
+novas tentativas e circuit breaker sem depender da rede.
+"""
+import asyncio
+import random
+import socket
+from dataclasses import dataclass
+from typing import Optional
+
+import uvicorn
+from fastapi import FastAPI, Response
+
+
+@dataclass
+class Faults:
+    """Falhas aplicadas antes de cada resposta"""
+    latency: float = 0.0      # atraso fixo (segundos)
+    hang: float = 0.0         # atraso extra para simular chamada travada
+    fail_next: int = 0        # as próximas N respostas falham (determinístico)
+    error_rate: float = 0.0   # fração aleatória de respostas com erro
+    error_status: int = 503
+    after_commit: bool = False  # gravações: falha depois de aplicar (ex.: resposta perdida)
+
+    async def apply(self) -> Optional[Response]:
+        """Espera o atraso configurado; devolve a resposta de erro, se houver"""
+        delay = self.latency + self.hang
+        if delay:
+            await asyncio.sleep(delay)
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            return self._error()
+        if self.error_rate and random.random() < self.error_rate:
+            return self._error()
+        return None
+
+    def reset(self):
+        self.hang = 0.0
+        self.fail_next = 0
+        self.error_rate = 0.0
+        self.after_commit = False
+
+    def _error(self) -> Response:
+        return Response('{"error": "falha injetada"}', status_code=self.error_status, media_type="application/json")
+
+
+class LocalServer:
+    def __init__(self, port: int = 0):
+        self.port = port or _free_port()
+        self._server: uvicorn.Server = None
+        self._task: asyncio.Task = None
+        self.app = self._create_app()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        self._server.should_exit = True
+        await self._task
+
+    def _create_app(self) -> FastAPI:
+        raise NotImplementedError
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,124 @@
+"""Servidor local que imita a Bot API do Telegram (para testes de carga sem rede).
+
+Responde `getMe`, `getFile`, `sendMessage` e o download de arquivos; os demais
+métodos retornam `true`. As mensagens enviadas ficam registradas com o horário,
+para medir quando cada chat recebeu a resposta final.
+
+Uso programático:
+    server = FakeTelegram()
+    await server.start()          # server.base_url -> TELEGRAM_API_BASE_URL
+    ...
+    await server.stop()
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, Request, Response
+
+from fake_server import LocalServer
+
+AUDIO_BYTES = b"OggS" + b"\0" * 2048
+
+
+@dataclass
+class SentMessage:
+    chat_id: int
+    text: str
+    at: float
+    method: str = "sendMessage"
+
+
+class FakeTelegram(LocalServer):
+    def __init__(self, latency: float = 0.0, port: int = 0):
+        self.latency = latency
+        self.sent: List[SentMessage] = []
+        self.calls: Dict[str, int] = {}
+        self._message_id = 0
+        super().__init__(port)
+
+    def messages_for(self, chat_id: int, method: str = "sendMessage") -> List[SentMessage]:
+        return [m for m in self.sent if m.chat_id == chat_id and m.method == method]
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/bot{token}/{method}")
+        async def bot_method(token: str, method: str, request: Request):
+            self.calls[method] = self.calls.get(method, 0) + 1
+            params = await _params(request)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return {"ok": True, "result": self._result(method, params)}
+
+        @app.get("/file/bot{token}/{path:path}")
+        async def download(token: str, path: str):
+            self.calls["download"] = self.calls.get("download", 0) + 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return Response(audio_bytes(path), media_type="audio/ogg")
+
+        return app
+
+    def _result(self, method: str, params: dict):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        if method == "getFile":
+            file_id = params.get("file_id", "file")
+            return {
+                "file_id": file_id,
+                "file_unique_id": f"u{file_id}",
+                "file_size": len(audio_bytes(f"voice/{file_id}.oga")),
+                "file_path": f"voice/{file_id}.oga",
+            }
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0))
+            self.sent.append(SentMessage(
+                chat_id=chat_id, text=params.get("text", ""), at=time.monotonic(), method=method
+            ))
+            self._message_id += 1
+            return {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+
+def audio_bytes(path: str) -> bytes:
+    """Conteúdo do arquivo: distinto por arquivo (o cache de transcrições usa o hash)"""
+    return AUDIO_BYTES + path.encode()
+
+
+def voice_update(update_id: int, chat_id: int, file_id: str = None) -> dict:
+    """Update de mensagem de voz como o Telegram envia ao webhook"""
+    file_id = file_id or f"voice{update_id}"
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Teste"},
+            "voice": {
+                "file_id": file_id,
+                "file_unique_id": f"u{file_id}",
+                "duration": 3,
+                "mime_type": "audio/ogg",
+                "file_size": len(audio_bytes(f"voice/{file_id}.oga")),
+            },
+        },
+    }
+
+
+async def _params(request: Request) -> dict:
+    # a python-telegram-bot envia os parâmetros como formulário urlencoded
+    content_type = request.headers.get("content-type", "")
+    body = await request.body()
+    if "json" in content_type:
+        return json.loads(body or b"{}")
+    return {key: values[-1] for key, values in parse_qs(body.decode()).items()}
@@ -0,0 +1,143 @@
+"""Teste de carga do /webhook contra um Telegram local (benchmarks/fake_telegram.py).
+
+Sobe a aplicação FastAPI em modo webhook apontando para o Telegram falso, com
+Whisper, LLM e Organizze substituídos pelos fakes de latência fixa do
+`bench_concurrent_audio`. Envia N updates de voz distribuídos entre CHATS chats
+(padrão: um chat por update) com a concorrência pedida e mede:
+
+- tempo de resposta do /webhook (o que o Telegram espera) e respostas 429;
+- tempo até a mensagem final chegar ao chat, e vazão de ponta a ponta;
+- métricas da fila (profundidade, espera) expostas em /stats;
+- se cada chat recebeu as respostas em ordem (um áudio só começa depois que o
+  anterior do mesmo chat terminou);
+- confirmações do outbox (respostas "na fila" editadas após o envio ao Organizze).
+
+Uso:
+    python benchmarks/load_webhook.py [N] [CONCORRENCIA] [WORKERS] [TAMANHO_FILA] [CHATS]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from fake_telegram import FakeTelegram, voice_update  # noqa: E402
+
+FINAL_MARKER = "Transcrição"
+PROCESSING_MARKER = "Processando"
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return "-"
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000  # noqa: E731
+    return f"p50={pick(0.50):.1f} ms  p95={pick(0.95):.1f} ms  p99={pick(0.99):.1f} ms"
+
+
+async def main(n: int, concurrency: int, workers: int, queue_size: int, chats: int):
+    telegram = FakeTelegram()
+    await telegram.start()
+
+    # configuração lida no import de `main`/`settings`
+    workdir = tempfile.mkdtemp()
+    os.environ.update({
+        'TELEGRAM_BOT_TOKEN': '123:bench',
+        'OPENAI_API_KEY': 'sk-bench',
+        'BOT_MODE': 'webhook',
+        'WEBHOOK_URL': 'http://localhost/webhook',
+        'AUTO_SET_WEBHOOK': '0',
+        'TELEGRAM_API_BASE_URL': telegram.base_url,
+        'UPDATE_CONCURRENCY': str(workers),
+        'UPDATE_QUEUE_SIZE': str(queue_size),
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+        'CHECKPOINT_PATH': os.path.join(workdir, 'checkpoints.sqlite3'),
+        'OUTBOX_RATE_PER_ACCOUNT': '0',
+    })
+    import httpx
+    import main as app_module
+    from bench_concurrent_audio import _install_fakes
+
+    _install_fakes()
+    app = app_module.app
+
+    acks, statuses = [], {}
+    sent_at = {}  # update_id -> (chat_id, início)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+
+            async def post(update_id: int):
+                chat_id = 1000 + update_id % chats
+                async with semaphore:
+                    start = time.monotonic()
+                    response = await client.post("/webhook", json=voice_update(update_id, chat_id))
+                    acks.append(time.monotonic() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                    if response.status_code == 200:
+                        sent_at[update_id] = (chat_id, start)
+
+            started = time.monotonic()
+            await asyncio.gather(*(post(i) for i in range(1, n + 1)))
+            acked = time.monotonic() - started
+
+            # espera as respostas finais dos updates aceitos
+            while sum(1 for m in telegram.sent if FINAL_MARKER in m.text and m.method == "sendMessage") < len(sent_at):
+                await asyncio.sleep(0.05)
+            finished = time.monotonic() - started
+
+            # e as edições feitas pelo outbox depois do envio ao Organizze
+            while len([m for m in telegram.sent if m.method == "editMessageText"]) < len(sent_at):
+                await asyncio.sleep(0.05)
+            confirmed = time.monotonic() - started
+
+            all_stats = (await client.get("/stats")).json()
+            stats, outbox_stats = all_stats["update_queue"], all_stats["outbox"]
+
+    await telegram.stop()
+
+    # n-ésima resposta final do chat corresponde ao n-ésimo update aceito do chat
+    finals = {}
+    for chat_id in {chat_id for chat_id, _ in sent_at.values()}:
+        finals[chat_id] = [m.at for m in telegram.messages_for(chat_id) if FINAL_MARKER in m.text]
+    end_to_end = []
+    for update_id in sorted(sent_at):
+        chat_id, start = sent_at[update_id]
+        end_to_end.append(finals[chat_id].pop(0) - start)
+    out_of_order = sum(1 for chat_id in finals if not _in_order(telegram.messages_for(chat_id)))
+
+    print(f"{n} updates em {chats} chats, concorrência {concurrency}, {workers} workers, fila {queue_size}")
+    print(f"respostas do webhook: {statuses}")
+    print(f"tempo de resposta do /webhook: {_percentiles(acks)}  (todos em {acked:.2f}s)")
+    print(f"até a resposta final no chat:  {_percentiles(end_to_end)}")
+    print(f"vazão de ponta a ponta: {len(sent_at) / finished:.1f} updates/s ({finished:.2f}s)")
+    print(f"fila: profundidade máx. {stats['max_depth']}, espera {stats['wait_ms']}, "
+          f"recusados {stats['rejected']}, máx. por chat {stats['max_chat_depth']}")
+    print(f"chats com respostas fora de ordem: {out_of_order}")
+    print(f"outbox: {outbox_stats['sent']} enviados em {outbox_stats['batches']} lotes, "
+          f"todas as respostas confirmadas em {confirmed:.2f}s")
+
+
+def _in_order(messages) -> bool:
+    """Cada "Processando" do chat só aparece depois da resposta final do áudio anterior"""
+    open_jobs = 0
+    for message in messages:
+        if PROCESSING_MARKER in message.text:
+            open_jobs += 1
+            if open_jobs > 1:
+                return False
+        elif FINAL_MARKER in message.text:
+            open_jobs -= 1
+    return True
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    n, concurrency, workers, queue_size = (args + [200, 50, 8, 100][len(args):])[:4]
+    chats = args[4] if len(args) > 4 else n
+    asyncio.run(main(n, concurrency, workers, queue_size, chats))
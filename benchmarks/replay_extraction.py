@@ -0,0 +1,194 @@
+"""Replay do corpus de extrações: acurácia por campo, tokens e latência.
+
+Reexecuta o `ExtractionService` sobre cada linha do corpus gravado
+(`EXTRACTION_CASSETTE_PATH`, formato em `src/services/extraction_cassette.py`)
+com os metadados da gravação e a mesma data de referência:
+
+- offline (padrão): o modelo é substituído pelas respostas gravadas. Mede o
+  que roda localmente — prompt (tokens contados de novo), reparo, resolução
+  de nomes, fast-path — sem rede e sem custo;
+- `--live [--model M] [--strong-model M]`: chama os modelos de verdade (precisa
+  de OPENAI_API_KEY), para comparar modelos mais baratos/rápidos, prompts
+  menores ou o roteamento entre camadas.
+
+No offline, as camadas do roteamento consomem as respostas gravadas na ordem;
+uma escalada que a gravação não tinha aparece como "sem resposta gravada".
+
+Compara o resultado com o `expected` de cada linha: valor, data, categoria e
+forma de pagamento (cartão/conta), além de tokens e latência (gravada no
+offline, medida no live). Linhas sintéticas (`"synthetic": true`) não têm
+uso nem latência reais: no offline, elas ficam fora da latência e, havendo
+alguma, os tokens do modelo não são mostrados.
+
+Uso:
+    python benchmarks/replay_extraction.py [CORPUS] [--live] [--model M] [--strong-model M] [--fast-path] [--verbose]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import date
+from typing import Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'cassettes', 'extraction.jsonl')
+FIELDS = ["amount", "date", "category", "payment"]
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--live", action="store_true", help="chama o modelo em vez de reproduzir as respostas")
+    parser.add_argument("--model", help="modelo barato no --live (padrão: OPENAI_MODEL)")
+    parser.add_argument("--strong-model", help="modelo forte no --live (padrão: OPENAI_STRONG_MODEL; '' = sem escalada)")
+    parser.add_argument("--fast-path", action="store_true", help="tenta o parser local antes do modelo")
+    parser.add_argument("--verbose", action="store_true", help="lista todas as divergências")
+    return parser.parse_args()
+
+
+async def main(args) -> int:
+    # configuração lida no import de `settings`
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-replay')
+    os.environ['FAST_PATH_ENABLED'] = '1' if args.fast_path else '0'
+    os.environ['EXTRACTION_CASSETTE_PATH'] = ''  # o replay não grava no corpus
+    if args.model:
+        os.environ['OPENAI_MODEL'] = args.model
+    if args.strong_model is not None:
+        os.environ['OPENAI_STRONG_MODEL'] = args.strong_model
+    from src.config.settings import settings
+    from src.models.expense import ExtractionContext
+    from src.services.extraction import ExtractionService
+    from src.services.extraction_cassette import (
+        ReplayExhaustedError, ReplayLLM, expected_fields, load_corpus, metadata_from_entry,
+    )
+
+    entries = load_corpus(args.corpus)
+    if not entries:
+        print(f"corpus vazio: {args.corpus}")
+        return 1
+
+    service = ExtractionService()
+    service.prompt_samples = []
+    tokenizer = service.llm
+
+    hits = {field: 0 for field in FIELDS}
+    all_hits = 0
+    latencies: List[float] = []
+    mismatches: List[str] = []
+    errors = 0
+    unrecorded = 0
+    synthetic = sum(1 for entry in entries if entry.get('synthetic'))
+
+    for number, entry in enumerate(entries, 1):
+        categories, accounts, credit_cards = metadata_from_entry(entry)
+        context = ExtractionContext(
+            categories=categories,
+            accounts=accounts,
+            credit_cards=credit_cards,
+            prompt_prefix=service._build_prefix(accounts, credit_cards),
+        )
+        replay = None if args.live else ReplayLLM(entry['responses'], tokenizer)
+        if replay:
+            # as duas camadas dividem a fila de respostas gravadas
+            service.llm = replay
+            if service.strong_llm is not None:
+                service.strong_llm = replay
+
+        started = time.perf_counter()
+        try:
+            result = await service.extract(entry['transcript'], context, today=date.fromisoformat(entry['today']))
+        except ReplayExhaustedError:
+            unrecorded += 1
+            mismatches.append(f"#{number} {entry['transcript']!r}: sem resposta gravada (o roteamento atual escalaria)")
+            continue
+        except Exception as e:
+            errors += 1
+            mismatches.append(f"#{number} {entry['transcript']!r}: erro {e}")
+            continue
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # offline: latência gravada do modelo + o que rodou localmente agora
+        if not replay:
+            latencies.append(elapsed_ms)
+        elif not entry.get('synthetic'):
+            latencies.append(elapsed_ms + replay.replayed_latency_ms)
+
+        got, expected = expected_fields(result), entry['expected']
+        diffs = [field for field in FIELDS if _value(got, field) != _value(expected, field)]
+        for field in FIELDS:
+            hits[field] += field not in diffs
+        all_hits += not diffs
+        if diffs:
+            mismatches.append(f"#{number} {entry['transcript']!r}: " + ", ".join(
+                f"{field} {_value(got, field)!r} (esperado {_value(expected, field)!r})" for field in diffs
+            ))
+
+    total = len(entries)
+    snapshot = service.snapshot()
+    usage = snapshot['token_usage']
+    prompts = service.prompt_token_report()
+    recorded_models = sorted({entry.get('model') for entry in entries if entry.get('model')})
+    routing = snapshot['routing']
+    models = settings.openai_model + (f" → {settings.openai_strong_model}" if settings.openai_strong_model else "")
+    mode = f"live ({models})" if args.live else "offline (respostas gravadas)"
+
+    print(f"corpus: {total} extrações de {args.corpus} (gravadas com {', '.join(recorded_models) or '-'}"
+          + (f"; {synthetic} sintéticas" if synthetic else "") + ")")
+    print(f"modo: {mode}, fast-path {'ligado' if args.fast_path else 'desligado'}")
+    print("acurácia: " + "  ".join(f"{field} {hits[field] / total:.0%}" for field in FIELDS)
+          + f"  todos os campos {all_hits / total:.0%}  erros {errors}"
+          + (f"  sem resposta gravada {unrecorded}" if unrecorded else ""))
+    if synthetic and not args.live:
+        print(f"tokens e latência do modelo: não medidos ({synthetic} linhas sintéticas, sem uso nem latência reais)")
+    elif usage['requests']:
+        print(f"tokens por chamada ao modelo: prompt {usage['prompt_tokens'] / usage['requests']:.0f} "
+              f"({usage['cached_ratio'] or 0:.0%} em cache), resposta {usage['completion_tokens'] / usage['requests']:.0f}; "
+              f"{usage['requests']} chamadas, custo estimado {_cost(usage['cost_usd'])}")
+        for model, model_usage in usage['per_model'].items():
+            print(f"  {model}: {model_usage['requests']} chamadas, prompt {model_usage['prompt_tokens']} "
+                  f"resposta {model_usage['completion_tokens']} tokens, custo {_cost(model_usage['cost_usd'])}")
+    if prompts['prompts']:
+        print(f"pedido atual (mensagens + esquema da ferramenta, contado localmente): {prompts['avg']} tokens em média "
+              f"({prompts['avg_all_categories']} listando todas as categorias)")
+    print(f"fast-path: {snapshot['fast_path_hits']} de {total}")
+    print("camadas: " + "  ".join(
+        f"{tier} {stats['accepted']}/{stats['attempts']} aceitas ({stats['avg_ms']} ms)"
+        for tier, stats in routing['tiers'].items() if stats['attempts']
+    ))
+    for tier, reasons in routing['escalation_reasons'].items():
+        print(f"  escaladas de {tier}: " + ", ".join(f"{reason} {count}" for reason, count in reasons.items()))
+    if latencies:
+        latencies.sort()
+        print(f"latência por extração: p50={_pick(latencies, 0.50):.1f} ms  p95={_pick(latencies, 0.95):.1f} ms  "
+              f"p99={_pick(latencies, 0.99):.1f} ms")
+    if mismatches:
+        print(f"\ndivergências ({len(mismatches)}):")
+        for line in mismatches if args.verbose else mismatches[:10]:
+            print(f"  {line}")
+    return 0
+
+
+def _value(fields: Dict, field: str):
+    if field == "amount":
+        return fields.get('amount_cents')
+    if field == "payment":
+        # cartão tem precedência, como no payload
+        if fields.get('card'):
+            return f"cartão {fields['card']}"
+        return f"conta {fields['account']}" if fields.get('account') else None
+    return fields.get(field)
+
+
+def _pick(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _cost(value) -> str:
+    return f"US$ {value:.4f}" if isinstance(value, (int, float)) else "-"
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(asyncio.run(main(_parse_args())))
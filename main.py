@@ -3,48 +3,103 @@ import os
 import asyncio
 import logging
 import functools
-from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack, asynccontextmanager
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Response
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters
 
-from src.bot.handlers import audio_handler, start_handler
+from src.bot.handlers import RETRY_PREFIX, audio_handler, configure_workflow, retry_handler, start_handler
+from src.bot.dedup import deduplicator, update_key
+from src.bot.update_queue import ChatOrderedUpdateProcessor, QueueFullError, UpdateQueue
 from src.config.settings import settings
+from src.graph.checkpoint import open_checkpointer
+from src.services.organizze import close_http_client
+from src.services import metrics, resilience, tracing
+from src.services.metadata_cache import metadata_cache
+from src.services.outbox import Outbox, create_outbox
+from src.graph.nodes import audio_preprocessor, extraction_service, organizze_client, transcription_service
 
 # Configurar logging
 logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s',
     level=logging.INFO
 )
+tracing.install_log_filter()
+tracing.setup(settings.tracing_exporter)
 logger = logging.getLogger(__name__)
 
 # Variável global para o bot
 bot_application: Application = None
 polling_task = None
+update_queue: UpdateQueue = None
+outbox: Outbox = None
+
+
+async def _edit_reply(chat_id: int, message_id: int, text: str):
+    """Atualiza a resposta "na fila" quando o outbox conclui o envio ao Organizze"""
+    await bot_application.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+
+
+async def _process_update_once(update: Update):
+    """Processa o update uma única vez por `update_id` (reentregas do Telegram são ignoradas)"""
+    await deduplicator.run(update_key(update.update_id), lambda: bot_application.process_update(update))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerenciar ciclo de vida da aplicação"""
-    global bot_application, polling_task
+    global bot_application, polling_task, update_queue, outbox
     
     # Startup: Inicializar bot
     logger.info("🚀 Inicializando bot...")
     logger.info(f"📍 Modo: {settings.bot_mode}")
     
-    bot_application = Application.builder().token(settings.telegram_bot_token).build()
+    # Checkpoints do workflow (execuções que falharam podem ser retomadas) e
+    # outbox do Organizze, os dois abertos aqui e não no import dos módulos
+    resources = AsyncExitStack()
+    saver = await resources.enter_async_context(open_checkpointer(settings.checkpoint_path))
+    # lambdas: resolvem o método na hora do envio (permite substituí-lo nos benchmarks)
+    outbox = create_outbox(
+        lambda expense: organizze_client.create_transaction(expense),
+        find=lambda expense: organizze_client.find_transaction(expense),
+    )
+    configure_workflow(saver, outbox)
+    
+    # Mesma fila nos dois modos: chats em paralelo, ordem estrita dentro de cada chat
+    update_queue = UpdateQueue(
+        _process_update_once,
+        workers=settings.update_concurrency,
+        maxsize=settings.update_queue_size,
+    )
+    metrics.track_gauge(metrics.UPDATE_QUEUE, 'waiting', lambda: update_queue.depth)
+    metrics.track_gauge(metrics.UPDATE_QUEUE, 'in_progress', lambda: update_queue.in_progress)
+    
+    builder = (
+        Application.builder()
+        .token(settings.telegram_bot_token)
+        .concurrent_updates(ChatOrderedUpdateProcessor(update_queue))
+    )
+    if settings.telegram_api_base_url:
+        base_url = settings.telegram_api_base_url.rstrip('/')
+        builder = builder.base_url(f"{base_url}/bot").base_file_url(f"{base_url}/file/bot")
+    bot_application = builder.build()
     
     # Registrar handlers
     bot_application.add_handler(CommandHandler("start", start_handler))
     bot_application.add_handler(
         MessageHandler(filters.AUDIO | filters.VOICE, audio_handler)
     )
+    bot_application.add_handler(CallbackQueryHandler(retry_handler, pattern=f"^{RETRY_PREFIX}"))
     
     # Inicializar bot
     await bot_application.initialize()
     await bot_application.start()
     
+    # Envio dos gastos ao Organizze em background (retoma pendentes de execuções anteriores)
+    if outbox is not None:
+        await outbox.start(notifier=_edit_reply)
+    
     # Escolher modo de operação
     if settings.bot_mode == 'polling':
         logger.info("🔄 Iniciando polling (desenvolvimento local)...")
@@ -95,8 +150,18 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
     
+    logger.info("⏳ Aguardando fila de updates...")
+    await update_queue.stop()
+    
+    # o que ainda não foi enviado continua no outbox para a próxima execução
+    if outbox is not None:
+        await outbox.stop()
+    
     await bot_application.stop()
     await bot_application.shutdown()
+    await close_http_client()
+    await resources.aclose()
+    tracing.shutdown()
 
 # Criar aplicação FastAPI
 app = FastAPI(
@@ -135,29 +200,74 @@ async def health_check():
     """Health check para Cloud Run"""
     return {"status": "healthy"}
 
+@app.get("/stats")
+async def stats():
+    """Contadores internos (caches) para diagnóstico de desempenho"""
+    return {
+        "metadata_cache": metadata_cache.snapshot(),
+        "audio_preprocessing": audio_preprocessor.snapshot(),
+        "transcription_cache": transcription_service.cache_snapshot(),
+        "extraction": extraction_service.snapshot(),
+        "update_queue": update_queue.snapshot() if update_queue else None,
+        "dedup": deduplicator.snapshot(),
+        "outbox": outbox.snapshot() if outbox else None,
+        "resilience": resilience.snapshot(),
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Métricas no formato do Prometheus (latência por etapa e por chamada externa, falhas)"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.post("/webhook")
 @_require_webhook_mode("Para webhook, acesse /webhook em modo webhook")
 async def telegram_webhook(request: Request):
     """
     Endpoint que recebe updates do Telegram
     
-    Este endpoint é chamado pelo Telegram sempre que há uma nova mensagem
+    Este endpoint é chamado pelo Telegram sempre que há uma nova mensagem.
+    Só valida e enfileira o update: o processamento (transcrição, extração,
+    Organizze) roda em background, em ordem dentro de cada chat, e a resposta
+    volta em milissegundos.
     """
     try:
         # Obter dados do webhook
         data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="JSON inválido")
+    
+    # raiz do trace do update: a tarefa criada em `submit` herda o contexto
+    with tracing.tracer.start_as_current_span("telegram.webhook"):
+        try:
+            # Criar objeto Update do Telegram
+            update = Update.de_json(data, bot_application.bot)
+            if update is None:
+                raise HTTPException(status_code=400, detail="Update vazio")
+            tracing.set_attributes({
+                "telegram.update_id": update.update_id,
+                "telegram.chat_id": update.effective_chat.id if update.effective_chat else None,
+            })
+            
+            # Reentrega de um update em andamento ou já processado: só confirma
+            if await deduplicator.is_known(update_key(update.update_id)):
+                logger.info(f"Update {update.update_id} repetido, ignorado")
+                return {"ok": True}
+            
+            # Enfileira (reentrega de um update ainda na fila é ignorada); com a
+            # fila cheia o Telegram recebe 429 e reenvia depois
+            if not update_queue.submit(update):
+                logger.info(f"Update {update.update_id} repetido (ainda na fila), ignorado")
+            
+            return {"ok": True}
         
-        # Criar objeto Update do Telegram
-        update = Update.de_json(data, bot_application.bot)
-        
-        # Processar update de forma assíncrona
-        await bot_application.process_update(update)
-        
-        return {"ok": True}
-        
-    except Exception as e:
-        logger.error(f"❌ Erro ao processar webhook: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        except HTTPException:
+            raise
+        except QueueFullError as e:
+            logger.warning(f"⚠️ Update {data.get('update_id')} recusado: {e}")
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar webhook: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/set-webhook")
 @_require_webhook_mode("Configure webhook apenas em modo webhook")
@@ -0,0 +1,186 @@
+"""Deduplicação de updates e áudios (reentregas do Telegram, encaminhamentos repetidos)"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class DedupStore:
+    """Chaves já processadas: LRU em memória com TTL e SQLite opcional.
+
+    Com SQLite (ex.: volume compartilhado) a marcação sobrevive a reinícios,
+    quando o Telegram costuma reenviar os updates pendentes.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, sqlite_path: str = "", clock: Callable[[], float] = time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if sqlite_path:
+            self._db = _open_db(sqlite_path)
+
+    async def contains(self, key: str) -> bool:
+        now = self.clock()
+        expires_at = self._entries.get(key)
+        if expires_at is not None:
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                return True
+            del self._entries[key]
+
+        if self._db is None:
+            return False
+        expires_at = await asyncio.to_thread(self._db_get, key)
+        if expires_at is None or expires_at <= now:
+            return False
+        self._remember(key, expires_at)
+        return True
+
+    async def add(self, key: str, ttl: Optional[float] = None):
+        """Marca a chave como processada por `ttl` segundos (padrão: o do store)"""
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        self._remember(key, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, key, expires_at)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: str, expires_at: float):
+        self._entries[key] = expires_at
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[float]:
+        with self._db_lock:
+            row = self._db.execute("SELECT expires_at FROM processed WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _db_put(self, key: str, expires_at: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO processed (key, expires_at) VALUES (?, ?)", (key, expires_at)
+            )
+            # limpeza oportunista das chaves vencidas
+            self._db.execute("DELETE FROM processed WHERE expires_at <= ?", (self.clock(),))
+            self._db.commit()
+
+
+class Deduplicator:
+    """Garante uma execução por chave.
+
+    - Chave em execução: a duplicata aguarda a execução em curso e recebe o
+      mesmo resultado (`attached`), sem iniciar outra.
+    - Chave já concluída dentro do TTL: não executa de novo (`duplicate`).
+    """
+
+    def __init__(self, store: DedupStore):
+        self.store = store
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.executed = 0
+        self.attached = 0
+        self.duplicates = 0
+
+    async def is_known(self, key: str) -> bool:
+        """Chave em execução ou já concluída (checagem barata antes de enfileirar)"""
+        return key in self._inflight or await self.store.contains(key)
+
+    async def run(
+        self,
+        key: str,
+        job: Callable[[], Awaitable[T]],
+        remember: Callable[[T], bool] = lambda result: True,
+        ttl: Optional[float] = None,
+    ) -> Tuple[str, Optional[T]]:
+        """Executa `job` se a chave for nova; retorna (status, resultado).
+
+        `remember` decide se o resultado marca a chave como concluída (ex.: não
+        marcar falhas, para o usuário poder reenviar o mesmo áudio); `ttl`, por
+        quanto tempo (padrão: o do store).
+        """
+        running = self._inflight.get(key)
+        if running is not None:
+            self.attached += 1
+            logger.info(f"Duplicata em andamento, aguardando a execução existente: {key}")
+            return 'attached', await asyncio.shield(running)
+
+        # registra antes de qualquer await para que duplicatas simultâneas se juntem a esta
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if await self.store.contains(key):
+                self.duplicates += 1
+                logger.info(f"Duplicata ignorada (já processada): {key}")
+                future.set_result(None)
+                return 'duplicate', None
+
+            self.executed += 1
+            try:
+                result = await job()
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # evita aviso de exceção não consumida sem duplicatas
+                raise
+            if remember(result):
+                await self.store.add(key, ttl)
+            future.set_result(result)
+            return 'new', result
+        finally:
+            del self._inflight[key]
+
+    def snapshot(self) -> dict:
+        return {
+            "executed": self.executed,
+            "attached": self.attached,
+            "duplicates": self.duplicates,
+            "in_flight": len(self._inflight),
+            "known_keys": len(self.store),
+        }
+
+
+def update_key(update_id: int) -> str:
+    return f"update:{update_id}"
+
+
+def audio_key(chat_id: int, file_unique_id: str) -> str:
+    return f"audio:{chat_id}:{file_unique_id}"
+
+
+def retry_key(thread: str) -> str:
+    return f"retry:{thread}"
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS processed ("
+        " key TEXT PRIMARY KEY,"
+        " expires_at REAL NOT NULL)"
+    )
+    db.commit()
+    logger.info(f"Deduplicação persistente em {path}")
+    return db
+
+
+deduplicator = Deduplicator(DedupStore(
+    ttl=settings.dedup_ttl_seconds,
+    max_entries=settings.dedup_max_entries,
+    sqlite_path=settings.dedup_path,
+))
@@ -1,14 +1,104 @@
 """Handlers do Telegram"""
+import hashlib
+import io
 import os
 import logging
-from telegram import Update
+import time
+from dataclasses import dataclass
+from typing import Optional
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
+from ..config.settings import settings
+from ..graph.audio_store import audio_store
+from ..graph.checkpoint import thread_config, thread_id
+from ..graph.nodes import StepError, transcription_service
 from ..graph.workflow import create_expense_workflow
 from ..graph.state import ExpenseState
-from .messages import WELCOME_MESSAGE, PROCESSING_MESSAGE, format_success, format_error
+from ..models.audio import AudioPayload
+from ..services.metrics import observe_stage, stage_timer
+from ..services.outbox import Outbox
+from ..services.tracing import tracer
+from .dedup import audio_key, deduplicator, retry_key
+from .messages import (
+    DUPLICATE_AUDIO_MESSAGE,
+    WELCOME_MESSAGE,
+    PROCESSING_MESSAGE,
+    RETRY_BUTTON,
+    RETRY_EXPIRED_MESSAGE,
+    format_success,
+    format_error,
+)
 
 logger = logging.getLogger(__name__)
 expense_workflow = create_expense_workflow()
+checkpointer: Optional[BaseCheckpointSaver] = None
+outbox: Optional[Outbox] = None
+
+# callback_data do botão "tentar novamente": prefixo + thread do checkpoint
+RETRY_PREFIX = "retry:"
+
+
+@dataclass
+class WorkflowOutcome:
+    ok: bool
+    text: str
+    outbox_id: Optional[int] = None
+    retry_thread: Optional[str] = None  # execução interrompida que pode ser retomada
+
+
+def configure_workflow(saver: Optional[BaseCheckpointSaver], organizze_outbox: Optional[Outbox]):
+    """Recompila o workflow com checkpoints e outbox (chamado no startup, com o loop já rodando)"""
+    global expense_workflow, checkpointer, outbox
+    checkpointer = saver
+    outbox = organizze_outbox
+    expense_workflow = create_expense_workflow(saver, organizze_outbox)
+
+
+class AudioTooLargeError(Exception):
+    """Áudio excede o tamanho máximo aceito (`settings.max_audio_bytes`)"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Áudio muito grande (máximo {max_bytes / (1024 * 1024):.0f} MB)")
+
+
+class _BoundedBuffer(io.BytesIO):
+    """Buffer em memória que recusa escrita além de `max_bytes`"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def write(self, data) -> int:
+        if self.tell() + len(data) > self.max_bytes:
+            raise AudioTooLargeError(self.max_bytes)
+        return super().write(data)
+
+
+async def download_to_memory(audio_file, file_type: str, max_bytes: int) -> AudioPayload:
+    """Baixa o áudio do Telegram direto para memória, sem passar pelo disco"""
+    file_size = getattr(audio_file, 'file_size', None)
+    if file_size and file_size > max_bytes:
+        raise AudioTooLargeError(max_bytes)
+
+    file = await audio_file.get_file()
+    buffer = _BoundedBuffer(max_bytes)
+    await file.download_to_memory(buffer)
+
+    # o Whisper identifica o formato pela extensão
+    ext = os.path.splitext(file.file_path or '')[1].lstrip('.')
+    if not ext:
+        ext = "ogg" if file_type == "voice" else "mp3"
+
+    data = buffer.getvalue()
+    return AudioPayload(
+        data=data,
+        filename=f"{file_type}.{ext}",
+        mime_type=getattr(audio_file, 'mime_type', None),
+        file_unique_id=getattr(audio_file, 'file_unique_id', None),
+        content_hash=hashlib.sha256(data).hexdigest(),
+        duration=getattr(audio_file, 'duration', None),
+    )
 
 async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler do comando /start"""
@@ -24,11 +114,8 @@ async def audio_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def _process_audio(update: Update, audio_file, file_type: str):
     """Processa áudio e envia para o workflow"""
+    started = time.perf_counter()
     try:
-        # responder processamento
-        if update.message:
-            await update.message.reply_text(PROCESSING_MESSAGE)
-
         # Se audio_file vier None, tentar encontrar em outros campos
         message = update.message
         if audio_file is None and message is not None:
@@ -54,37 +141,155 @@ async def _process_audio(update: Update, audio_file, file_type: str):
                 await update.message.reply_text(format_error(msg))
             return
 
-        # Download do arquivo
-        file = await audio_file.get_file()
-        ext = "ogg" if file_type == "voice" else "mp3"
-        audio_path = f"data/audios/{file_type}_{update.message.message_id}.{ext}"
+        # Mesmo áudio no mesmo chat (reentrega ou encaminhado de novo): uma execução só,
+        # decidida antes do download
+        file_unique_id = getattr(audio_file, 'file_unique_id', None)
+        if file_unique_id and update.effective_chat:
+            status, outcome = await deduplicator.run(
+                audio_key(update.effective_chat.id, file_unique_id),
+                lambda: _run_workflow(update, audio_file, file_type),
+                remember=lambda outcome: outcome.ok,
+                ttl=settings.dedup_audio_ttl_seconds,
+            )
+        else:
+            status, outcome = 'new', await _run_workflow(update, audio_file, file_type)
+
+        if status == 'duplicate':
+            reply, markup = DUPLICATE_AUDIO_MESSAGE, None
+        else:
+            # 'attached' responde a esta mensagem com o resultado da execução em andamento
+            reply, markup = outcome.text, _retry_markup(outcome)
+        if update.message:
+            sent = await update.message.reply_text(reply, reply_markup=markup)
+            if status != 'duplicate':
+                observe_stage('end_to_end', time.perf_counter() - started)
+            if status == 'new':
+                await _attach_outbox(outcome, sent.chat_id, sent.message_id)
+
+    except Exception as e:
+        logger.error(f"Erro ao processar áudio: {e}")
+        if update.message:
+            await update.message.reply_text(format_error(f"Erro: {str(e)}"))
+
+
+async def retry_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Botão "Tentar novamente": retoma a execução a partir do nó que falhou"""
+    query = update.callback_query
+    await query.answer()
+    thread = query.data[len(RETRY_PREFIX):]
+    # toques repetidos no botão: só o primeiro retoma (a ordem por chat serializa os demais)
+    await deduplicator.run(retry_key(thread), lambda: _retry(query, thread), remember=lambda outcome: outcome.ok)
+
 
-        os.makedirs("data/audios", exist_ok=True)
-        await file.download_to_drive(audio_path)
+async def _retry(query, thread: str) -> WorkflowOutcome:
+    # sem botão enquanto processa
+    await query.edit_message_text(PROCESSING_MESSAGE)
+    outcome = await _resume(thread)
+    message = await query.edit_message_text(outcome.text, reply_markup=_retry_markup(outcome))
+    await _attach_outbox(outcome, message.chat_id, message.message_id)
+    return outcome
+
+
+async def _run_workflow(update: Update, audio_file, file_type: str) -> WorkflowOutcome:
+    """Baixa (se preciso), roda o workflow e devolve o resultado para a resposta"""
+    try:
+        # responder processamento
+        if update.message:
+            await update.message.reply_text(PROCESSING_MESSAGE)
+
+        # com checkpoints, cada mensagem de áudio é uma thread (chat + mensagem)
+        thread = None
+        if checkpointer is not None and update.message and update.effective_chat:
+            thread = thread_id(update.effective_chat.id, update.message.message_id)
+            # reentrega de uma execução interrompida (falha ou reinício): retoma de onde parou
+            if await _resumable(thread):
+                logger.info(f"Retomando execução interrompida {thread}")
+                return await _resume(thread)
+
+        # Áudio já transcrito antes (reenvio/encaminhamento): pula download e Whisper
+        audio = None
+        transcription = await transcription_service.get_cached(
+            file_unique_id=getattr(audio_file, 'file_unique_id', None)
+        )
+        if transcription is None:
+            # Download do arquivo (em memória)
+            with stage_timer('download'), tracer.start_as_current_span("telegram.download"):
+                audio = await download_to_memory(audio_file, file_type, settings.max_audio_bytes)
+            # acerto por conteúdo também grava o file_unique_id deste arquivo
+            transcription = await transcription_service.get_cached(
+                file_unique_id=audio.file_unique_id, content_hash=audio.content_hash
+            )
         
-        # Processa
+        # Processa (o áudio fica em memória; o estado só leva a referência)
+        audio_ref = audio_store.add(audio) if transcription is None else None
         initial_state = ExpenseState(
-            audio_path=audio_path,
-            transcription="",
+            user_id=update.effective_user.id if update.effective_user else None,
+            audio_ref=audio_ref,
+            transcription=transcription or "",
             expense_data=None,
             organizze_response=None,
-            error=None,
             messages=[]
         )
         
-        result = expense_workflow.invoke(initial_state)
-        
-        # Cleanup
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-        
-        # Responde
-        if result.get('error'):
-            await update.message.reply_text(format_error(result['error']))
-        else:
-            await update.message.reply_text(format_success(result['messages']))
+        outcome = await _invoke(initial_state, thread)
+        if thread is None:
+            # sem checkpoint não há retomada: o áudio não é mais necessário
+            audio_store.discard(audio_ref)
+        return outcome
     
+    except AudioTooLargeError as e:
+        logger.warning(f"Áudio recusado: {e}")
+        return WorkflowOutcome(False, format_error(str(e)))
     except Exception as e:
         logger.error(f"Erro ao processar áudio: {e}")
-        if update.message:
-            await update.message.reply_text(format_error(f"Erro: {str(e)}"))
\ No newline at end of file
+        return WorkflowOutcome(False, format_error(f"Erro: {str(e)}"))
+
+
+async def _resume(thread: str) -> WorkflowOutcome:
+    """Retoma a thread do último checkpoint: só o nó que falhou (e os seguintes) rodam"""
+    if checkpointer is None or not await _resumable(thread):
+        return WorkflowOutcome(False, RETRY_EXPIRED_MESSAGE)
+    return await _invoke(None, thread)
+
+
+async def _resumable(thread: str) -> bool:
+    """A thread parou no meio e ainda pode continuar (já transcrita ou com o áudio em memória)"""
+    snapshot = await expense_workflow.aget_state(thread_config(thread))
+    if not snapshot.next:
+        return False
+    if snapshot.values.get('transcription') or audio_store.get(snapshot.values.get('audio_ref')):
+        return True
+    # o áudio se perdeu (reinício) antes da transcrição: retomar não adianta
+    await checkpointer.adelete_thread(thread)
+    return False
+
+
+async def _invoke(state: Optional[ExpenseState], thread: Optional[str]) -> WorkflowOutcome:
+    config = thread_config(thread) if thread else None
+    try:
+        result = await expense_workflow.ainvoke(state, config)
+    except Exception as e:
+        # o checkpoint da thread fica guardado para a nova tentativa
+        logger.error(f"Workflow interrompido ({thread or 'sem checkpoint'}): {e}")
+        message = str(e) if isinstance(e, StepError) else f"Erro: {str(e)}"
+        resumable = thread is not None and await _resumable(thread)
+        return WorkflowOutcome(False, format_error(message), retry_thread=thread if resumable else None)
+
+    if thread:
+        # concluída: nada a retomar
+        await checkpointer.adelete_thread(thread)
+    return WorkflowOutcome(True, format_success(result['messages']), outbox_id=result.get('outbox_id'))
+
+
+def _retry_markup(outcome: WorkflowOutcome) -> Optional[InlineKeyboardMarkup]:
+    if not outcome.retry_thread:
+        return None
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(RETRY_BUTTON, callback_data=f"{RETRY_PREFIX}{outcome.retry_thread}")
+    ]])
+
+
+async def _attach_outbox(outcome: WorkflowOutcome, chat_id: int, message_id: int):
+    # gasto no outbox: a resposta é editada quando o Organizze confirmar
+    if outcome.outbox_id is not None and outbox is not None:
+        await outbox.attach_reply(outcome.outbox_id, chat_id, message_id, outcome.text)
@@ -14,6 +14,12 @@ Ou: 'Paguei 120 reais de academia por boleto dia 15'
 
 PROCESSING_MESSAGE = "⏳ Processando..."
 
+DUPLICATE_AUDIO_MESSAGE = "ℹ️ Este áudio já foi processado."
+
+RETRY_BUTTON = "🔁 Tentar novamente"
+
+RETRY_EXPIRED_MESSAGE = "ℹ️ Não há mais o que tentar de novo: este áudio já foi concluído ou expirou."
+
 def format_success(messages: list) -> str:
     return "\n\n".join(messages)
 
@@ -0,0 +1,229 @@
+"""Fila de updates: concorrência global limitada e ordem estrita dentro de cada chat.
+
+Usada nos dois modos:
+- webhook: `submit` agenda o update e retorna na hora (o webhook não espera);
+- polling: `ChatOrderedUpdateProcessor` encaixa a mesma fila no
+  `Application` da python-telegram-bot (`concurrent_updates`).
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from ..services import tracing
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Update], Awaitable[None]]
+
+# Tempos de espera recentes guardados para os percentis
+WAIT_SAMPLES = 1000
+
+
+class QueueFullError(Exception):
+    """Fila cheia: o update deve ser recusado (o Telegram reenvia depois)"""
+
+
+class UpdateQueue:
+    """Processa updates de chats diferentes em paralelo (até `workers` por vez)
+    e os de um mesmo chat um de cada vez, na ordem de chegada.
+
+    Cada chat tem um `asyncio.Lock` (fila FIFO de espera); o lock do chat é
+    obtido antes da vaga global, então um chat com vários áudios pendentes
+    ocupa no máximo uma vaga e não atrasa os demais.
+
+    `submit` só agenda (não bloqueia); com `maxsize` updates pendentes lança
+    `QueueFullError`, que o webhook traduz em 429 para o Telegram tentar de novo.
+    Reentregas de um update ainda na fila são ignoradas já em `submit`, sem
+    ocupar outra posição.
+    """
+
+    def __init__(self, handler: Handler, workers: int, maxsize: int):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = max(1, maxsize)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._chat_locks: Dict[Optional[int], asyncio.Lock] = {}
+        self._pending_by_chat: Dict[Optional[int], int] = {}
+        self._queued_ids: Set[int] = set()  # updates de `submit` ainda não concluídos
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = False
+
+        self.pending = 0
+        self.enqueued = 0
+        self.rejected = 0
+        self.redelivered = 0
+        self.processed = 0
+        self.failed = 0
+        self.in_progress = 0
+        self.max_depth = 0
+        self.max_chat_depth = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        logger.info(f"Fila de updates iniciada: {self.workers} em paralelo, até {self.maxsize} pendentes")
+
+    async def stop(self, timeout: float = 10.0):
+        """Espera os updates pendentes (até `timeout`) e cancela o restante"""
+        if not self._running:
+            return
+        self._running = False
+        if self._tasks:
+            _, remaining = await asyncio.wait(set(self._tasks), timeout=timeout)
+            if remaining:
+                logger.warning(f"Encerrando com {len(remaining)} updates ainda pendentes")
+                for task in remaining:
+                    task.cancel()
+                await asyncio.gather(*remaining, return_exceptions=True)
+
+    def submit(self, update: Update) -> bool:
+        """Agenda o update em background (modo webhook); False se ele já estava na fila"""
+        if update.update_id in self._queued_ids:
+            self.redelivered += 1
+            return False
+        if self.pending >= self.maxsize:
+            self.rejected += 1
+            raise QueueFullError(f"Fila cheia ({self.maxsize} updates)")
+        # conta já aqui para o limite valer antes de a tarefa começar; as tarefas
+        # pegam o lock do chat na ordem em que foram criadas, preservando a ordem
+        chat_id = _chat_id(update)
+        enqueued_at = self._enter(chat_id)
+        self._queued_ids.add(update.update_id)
+        task = asyncio.create_task(
+            self._execute(update, chat_id, enqueued_at, lambda: self.handler(update))
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._queued_ids.discard(update.update_id))
+        return True
+
+    async def run(self, update: Update, job: Callable[[], Awaitable[Any]]):
+        """Executa `job` respeitando a ordem do chat e o limite global"""
+        chat_id = _chat_id(update)
+        enqueued_at = self._enter(chat_id)
+        await self._execute(update, chat_id, enqueued_at, job)
+
+    async def _execute(
+        self,
+        update: Update,
+        chat_id: Optional[int],
+        enqueued_at: float,
+        job: Callable[[], Awaitable[Any]],
+    ):
+        # spans começam no enfileiramento (relógio de parede, em ns)
+        enqueued_ns = time.time_ns() - int((time.monotonic() - enqueued_at) * 1e9)
+        attributes = {"telegram.update_id": update.update_id}
+        if chat_id is not None:
+            attributes["telegram.chat_id"] = chat_id
+        try:
+            with tracing.tracer.start_as_current_span("telegram.update", start_time=enqueued_ns, attributes=attributes):
+                async with self._chat_locks[chat_id], self._slots:
+                    self._waits.append((time.monotonic() - enqueued_at) * 1000)
+                    tracing.tracer.start_span("update_queue.wait", start_time=enqueued_ns).end()
+                    self.in_progress += 1
+                    try:
+                        await job()
+                        self.processed += 1
+                    except Exception as e:
+                        self.failed += 1
+                        tracing.record_error(e)
+                        logger.error(f"Erro ao processar update {update.update_id}: {e}", exc_info=True)
+                    finally:
+                        self.in_progress -= 1
+        finally:
+            self._leave(chat_id)
+
+    @property
+    def depth(self) -> int:
+        """Updates aguardando (ainda sem vaga ou esperando o anterior do chat)"""
+        return self.pending - self.in_progress
+
+    def chat_depths(self) -> Dict[str, int]:
+        """Updates pendentes por chat (incluindo o que está em execução)"""
+        return {str(chat_id): count for chat_id, count in self._pending_by_chat.items()}
+
+    def snapshot(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            "workers": self.workers,
+            "maxsize": self.maxsize,
+            "pending": self.pending,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "in_progress": self.in_progress,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "redelivered": self.redelivered,
+            "processed": self.processed,
+            "failed": self.failed,
+            "active_chats": len(self._pending_by_chat),
+            "max_chat_depth": self.max_chat_depth,
+            "per_chat": self.chat_depths(),
+            "wait_ms": {
+                "p50": _percentile(waits, 0.50),
+                "p95": _percentile(waits, 0.95),
+                "max": round(waits[-1], 1) if waits else None,
+            },
+        }
+
+    def _enter(self, chat_id: Optional[int]) -> float:
+        self.pending += 1
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.pending - self.in_progress)
+        if chat_id not in self._chat_locks:
+            self._chat_locks[chat_id] = asyncio.Lock()
+        count = self._pending_by_chat.get(chat_id, 0) + 1
+        self._pending_by_chat[chat_id] = count
+        self.max_chat_depth = max(self.max_chat_depth, count)
+        return time.monotonic()
+
+    def _leave(self, chat_id: Optional[int]):
+        self.pending -= 1
+        count = self._pending_by_chat[chat_id] - 1
+        if count:
+            self._pending_by_chat[chat_id] = count
+        else:
+            # nenhum update pendente do chat: libera o lock
+            del self._pending_by_chat[chat_id]
+            del self._chat_locks[chat_id]
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Processador de updates da python-telegram-bot que delega à `UpdateQueue`.
+
+    O semáforo da classe base só limita quantos updates ficam pendentes; o
+    paralelismo e a ordem por chat vêm da fila.
+    """
+
+    def __init__(self, queue: UpdateQueue):
+        super().__init__(max_concurrent_updates=queue.maxsize)
+        self.queue = queue
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        if not isinstance(update, Update):
+            await coroutine
+            return
+        await self.queue.run(update, lambda: coroutine)
+
+    async def initialize(self):
+        self.queue.start()
+
+    async def shutdown(self):
+        await self.queue.stop()
+
+
+def _chat_id(update: Update) -> Optional[int]:
+    # updates sem chat (ex.: inline) compartilham a chave None
+    chat = update.effective_chat
+    return chat.id if chat else None
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(q * len(values)))], 1)
@@ -45,6 +45,21 @@ def _load_dotenv_if_exists():
 # Carrega .env automaticamente
 _load_dotenv_if_exists()
 
+
+def _env_int(key: str, default: int) -> int:
+    value = os.getenv(key, '').strip()
+    return int(value) if value else default
+
+
+def _env_bool(key: str, default: bool) -> bool:
+    value = os.getenv(key, '').strip().lower()
+    return value in ('1', 'true', 'yes') if value else default
+
+
+def _env_float(key: str, default: float) -> float:
+    value = os.getenv(key, '').strip()
+    return float(value) if value else default
+
 @dataclass
 class Settings:
     # Telegram
@@ -62,13 +77,126 @@ class Settings:
     whisper_model: str = "whisper-1"
     organizze_api_base: str = "https://api.organizze.com.br/rest/v2"
 
-    # Diretórios
-    audio_dir: str = "data/audios"
+    # HTTP do Organizze: pool compartilhado com keep-alive e timeouts por chamada (segundos)
+    organizze_connect_timeout: float = 5.0
+    organizze_read_timeout: float = 15.0
+    organizze_max_connections: int = 10
+    organizze_max_keepalive_connections: int = 5
+    organizze_keepalive_expiry: float = 60.0
+
+    # Resiliência das chamadas externas: prazo por tentativa (segundos) de cada
+    # dependência, novas tentativas com backoff + jitter (só chamadas seguras de
+    # repetir) e circuit breaker (falhas seguidas para abrir, segundos aberto)
+    whisper_deadline: float = 60.0
+    llm_deadline: float = 30.0
+    organizze_deadline: float = 20.0
+    resilience_retries: int = 2
+    resilience_backoff_base: float = 0.5
+    resilience_backoff_max: float = 8.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+
+    # Cache de metadados do Organizze (segundos): TTL, janela servindo valor antigo
+    # enquanto revalida em background e backoff após falhas
+    metadata_cache_ttl: float = 300.0
+    metadata_cache_stale_ttl: float = 3600.0
+    metadata_error_backoff: float = 5.0
+    metadata_error_backoff_max: float = 300.0
+
+    # Áudio: tamanho máximo aceito para download em memória (bytes)
+    max_audio_bytes: int = 20 * 1024 * 1024
+
+    # Pré-processamento antes do Whisper: mono 16 kHz em Opus de baixo bitrate,
+    # sem silêncio nas pontas e com pausas internas encurtadas
+    audio_preprocessing: bool = True
+    audio_bitrate: str = "24k"
+    audio_silence_thresh_db: float = 16.0  # dB abaixo do volume médio considerados silêncio
+    audio_min_silence_ms: int = 300
+    audio_keep_silence_ms: int = 150
+    audio_max_pause_ms: int = 600
+
+    # Transcrição em partes: áudios longos são divididos em silêncios e os trechos
+    # transcritos em paralelo (limite de requisições simultâneas por áudio)
+    transcription_chunking: bool = True
+    transcription_chunk_threshold_seconds: float = 60.0
+    transcription_chunk_seconds: float = 30.0
+    transcription_chunk_overlap_ms: int = 500
+    transcription_max_workers: int = 4
+
+    # Cache de transcrições (por file_unique_id do Telegram ou hash do áudio):
+    # limite em memória (bytes de texto) e arquivo SQLite opcional para persistir
+    transcription_cache_max_bytes: int = 2 * 1024 * 1024
+    transcription_cache_path: str = ""
+
+    # Fast-path local: frases simples ("gastei 50 reais no mercado") são
+    # interpretadas por regras, sem LLM, quando a confiança atinge o mínimo
+    fast_path_enabled: bool = True
+    fast_path_min_confidence: float = 0.8
+
+    # Quantas categorias (as mais prováveis para o texto) vão no prompt; 0 = todas
+    category_top_k: int = 8
+
+    # Roteamento da extração: parser local → OPENAI_MODEL (barato) → modelo forte.
+    # Só sobe de camada o resultado reprovado na validação (valor, data, categoria);
+    # modelo forte vazio (padrão) = o resultado do barato é sempre aceito; ao
+    # definir um (ex.: gpt-4o), defina também os preços `strong` abaixo
+    openai_strong_model: str = ""
+    routing_max_date_age_days: int = 90  # datas mais antigas que isso são suspeitas
+
+    # Preços (USD por 1M tokens) para estimar custo em /stats; 0 = não calcula.
+    # Os primeiros valem para OPENAI_MODEL, os `strong` para o modelo forte
+    openai_input_cost_per_mtok: float = 0.0
+    openai_cached_input_cost_per_mtok: float = 0.0
+    openai_output_cost_per_mtok: float = 0.0
+    openai_strong_input_cost_per_mtok: float = 0.0
+    openai_strong_cached_input_cost_per_mtok: float = 0.0
+    openai_strong_output_cost_per_mtok: float = 0.0
     
     # Bot mode: 'polling' para desenvolvimento local, 'webhook' para produção
     # 'auto' detecta baseado em RUN_ENV ou WEBHOOK_URL
     bot_mode: str = "auto"
     webhook_url: str = ""
+
+    # Updates (polling e webhook): até `update_concurrency` em paralelo entre chats,
+    # sempre um por vez e em ordem dentro do mesmo chat; com `update_queue_size`
+    # pendentes o webhook responde 429 e o Telegram reenvia depois
+    update_concurrency: int = 4
+    update_queue_size: int = 100
+
+    # Deduplicação de updates (update_id) e áudios (chat + file_unique_id): por quanto
+    # tempo lembrar, limite em memória e SQLite opcional para sobreviver a reinícios.
+    # O áudio só é lembrado por pouco tempo (encaminhado duas vezes sem querer): reenviar
+    # de propósito depois disso (ex.: apagou o lançamento no Organizze) registra de novo
+    dedup_ttl_seconds: float = 24 * 60 * 60
+    dedup_audio_ttl_seconds: float = 60.0
+    dedup_max_entries: int = 10000
+    dedup_path: str = ""
+
+    # Outbox do Organizze: gastos gravados no SQLite e enviados em background
+    # (lotes, novas tentativas com backoff e limite de envios por conta/cartão)
+    outbox_enabled: bool = True
+    outbox_path: str = "data/outbox.sqlite3"
+    outbox_batch_size: int = 10
+    outbox_max_attempts: int = 8
+    outbox_backoff_base: float = 2.0
+    outbox_backoff_max: float = 300.0
+    outbox_rate_per_account: float = 1.0
+    outbox_burst: int = 3
+    outbox_poll_interval: float = 5.0
+
+    # Checkpoints do workflow (SQLite; vazio desabilita): uma execução que falhou
+    # é retomada pelo botão "tentar novamente" repetindo só o nó que falhou
+    checkpoint_path: str = "data/checkpoints.sqlite3"
+
+    # Corpus de extrações (JSONL) para replay/avaliação de prompt e modelo; vazio desabilita.
+    # Grava transcrições de usuários: habilite só quando for coletar o corpus
+    extraction_cassette_path: str = ""
+
+    # Tracing OpenTelemetry de cada update: "" (desligado), "console" ou "memory"
+    tracing_exporter: str = ""
+
+    # URL base da Bot API (vazio = api.telegram.org); usada em testes de carga locais
+    telegram_api_base_url: str = ""
     
     @classmethod
     def from_env(cls):
@@ -91,6 +219,81 @@ class Settings:
             organizze_token=os.getenv('ORGANIZZE_TOKEN', ''),
             bot_mode=mode,
             webhook_url=os.getenv('WEBHOOK_URL', ''),
+            update_concurrency=_env_int('UPDATE_CONCURRENCY', cls.update_concurrency),
+            update_queue_size=_env_int('UPDATE_QUEUE_SIZE', cls.update_queue_size),
+            dedup_ttl_seconds=_env_float('DEDUP_TTL_SECONDS', cls.dedup_ttl_seconds),
+            dedup_audio_ttl_seconds=_env_float('DEDUP_AUDIO_TTL_SECONDS', cls.dedup_audio_ttl_seconds),
+            dedup_max_entries=_env_int('DEDUP_MAX_ENTRIES', cls.dedup_max_entries),
+            dedup_path=os.getenv('DEDUP_PATH', cls.dedup_path),
+            outbox_enabled=_env_bool('OUTBOX_ENABLED', cls.outbox_enabled),
+            outbox_path=os.getenv('OUTBOX_PATH', cls.outbox_path),
+            outbox_batch_size=_env_int('OUTBOX_BATCH_SIZE', cls.outbox_batch_size),
+            outbox_max_attempts=_env_int('OUTBOX_MAX_ATTEMPTS', cls.outbox_max_attempts),
+            outbox_backoff_base=_env_float('OUTBOX_BACKOFF_BASE', cls.outbox_backoff_base),
+            outbox_backoff_max=_env_float('OUTBOX_BACKOFF_MAX', cls.outbox_backoff_max),
+            outbox_rate_per_account=_env_float('OUTBOX_RATE_PER_ACCOUNT', cls.outbox_rate_per_account),
+            outbox_burst=_env_int('OUTBOX_BURST', cls.outbox_burst),
+            outbox_poll_interval=_env_float('OUTBOX_POLL_INTERVAL', cls.outbox_poll_interval),
+            checkpoint_path=os.getenv('CHECKPOINT_PATH', cls.checkpoint_path),
+            extraction_cassette_path=os.getenv('EXTRACTION_CASSETTE_PATH', cls.extraction_cassette_path),
+            tracing_exporter=os.getenv('TRACING_EXPORTER', cls.tracing_exporter).strip().lower(),
+            telegram_api_base_url=os.getenv('TELEGRAM_API_BASE_URL', cls.telegram_api_base_url),
+            organizze_api_base=os.getenv('ORGANIZZE_API_BASE', cls.organizze_api_base),
+            organizze_connect_timeout=_env_float('ORGANIZZE_CONNECT_TIMEOUT', cls.organizze_connect_timeout),
+            organizze_read_timeout=_env_float('ORGANIZZE_READ_TIMEOUT', cls.organizze_read_timeout),
+            organizze_max_connections=_env_int('ORGANIZZE_MAX_CONNECTIONS', cls.organizze_max_connections),
+            organizze_max_keepalive_connections=_env_int(
+                'ORGANIZZE_MAX_KEEPALIVE_CONNECTIONS', cls.organizze_max_keepalive_connections
+            ),
+            organizze_keepalive_expiry=_env_float('ORGANIZZE_KEEPALIVE_EXPIRY', cls.organizze_keepalive_expiry),
+            whisper_deadline=_env_float('WHISPER_DEADLINE', cls.whisper_deadline),
+            llm_deadline=_env_float('LLM_DEADLINE', cls.llm_deadline),
+            organizze_deadline=_env_float('ORGANIZZE_DEADLINE', cls.organizze_deadline),
+            resilience_retries=_env_int('RESILIENCE_RETRIES', cls.resilience_retries),
+            resilience_backoff_base=_env_float('RESILIENCE_BACKOFF_BASE', cls.resilience_backoff_base),
+            resilience_backoff_max=_env_float('RESILIENCE_BACKOFF_MAX', cls.resilience_backoff_max),
+            breaker_failure_threshold=_env_int('BREAKER_FAILURE_THRESHOLD', cls.breaker_failure_threshold),
+            breaker_reset_seconds=_env_float('BREAKER_RESET_SECONDS', cls.breaker_reset_seconds),
+            metadata_cache_ttl=_env_float('METADATA_CACHE_TTL', cls.metadata_cache_ttl),
+            metadata_cache_stale_ttl=_env_float('METADATA_CACHE_STALE_TTL', cls.metadata_cache_stale_ttl),
+            metadata_error_backoff=_env_float('METADATA_ERROR_BACKOFF', cls.metadata_error_backoff),
+            metadata_error_backoff_max=_env_float('METADATA_ERROR_BACKOFF_MAX', cls.metadata_error_backoff_max),
+            max_audio_bytes=_env_int('MAX_AUDIO_BYTES', cls.max_audio_bytes),
+            audio_preprocessing=_env_bool('AUDIO_PREPROCESSING', cls.audio_preprocessing),
+            audio_bitrate=os.getenv('AUDIO_BITRATE', cls.audio_bitrate),
+            audio_silence_thresh_db=_env_float('AUDIO_SILENCE_THRESH_DB', cls.audio_silence_thresh_db),
+            audio_min_silence_ms=_env_int('AUDIO_MIN_SILENCE_MS', cls.audio_min_silence_ms),
+            audio_keep_silence_ms=_env_int('AUDIO_KEEP_SILENCE_MS', cls.audio_keep_silence_ms),
+            audio_max_pause_ms=_env_int('AUDIO_MAX_PAUSE_MS', cls.audio_max_pause_ms),
+            transcription_chunking=_env_bool('TRANSCRIPTION_CHUNKING', cls.transcription_chunking),
+            transcription_chunk_threshold_seconds=_env_float(
+                'TRANSCRIPTION_CHUNK_THRESHOLD_SECONDS', cls.transcription_chunk_threshold_seconds
+            ),
+            transcription_chunk_seconds=_env_float('TRANSCRIPTION_CHUNK_SECONDS', cls.transcription_chunk_seconds),
+            transcription_chunk_overlap_ms=_env_int('TRANSCRIPTION_CHUNK_OVERLAP_MS', cls.transcription_chunk_overlap_ms),
+            transcription_max_workers=_env_int('TRANSCRIPTION_MAX_WORKERS', cls.transcription_max_workers),
+            transcription_cache_max_bytes=_env_int('TRANSCRIPTION_CACHE_MAX_BYTES', cls.transcription_cache_max_bytes),
+            transcription_cache_path=os.getenv('TRANSCRIPTION_CACHE_PATH', cls.transcription_cache_path),
+            fast_path_enabled=_env_bool('FAST_PATH_ENABLED', cls.fast_path_enabled),
+            fast_path_min_confidence=_env_float('FAST_PATH_MIN_CONFIDENCE', cls.fast_path_min_confidence),
+            category_top_k=_env_int('CATEGORY_TOP_K', cls.category_top_k),
+            openai_model=os.getenv('OPENAI_MODEL', cls.openai_model).strip() or cls.openai_model,
+            openai_strong_model=os.getenv('OPENAI_STRONG_MODEL', cls.openai_strong_model).strip(),
+            routing_max_date_age_days=_env_int('ROUTING_MAX_DATE_AGE_DAYS', cls.routing_max_date_age_days),
+            openai_input_cost_per_mtok=_env_float('OPENAI_INPUT_COST_PER_MTOK', cls.openai_input_cost_per_mtok),
+            openai_cached_input_cost_per_mtok=_env_float(
+                'OPENAI_CACHED_INPUT_COST_PER_MTOK', cls.openai_cached_input_cost_per_mtok
+            ),
+            openai_output_cost_per_mtok=_env_float('OPENAI_OUTPUT_COST_PER_MTOK', cls.openai_output_cost_per_mtok),
+            openai_strong_input_cost_per_mtok=_env_float(
+                'OPENAI_STRONG_INPUT_COST_PER_MTOK', cls.openai_strong_input_cost_per_mtok
+            ),
+            openai_strong_cached_input_cost_per_mtok=_env_float(
+                'OPENAI_STRONG_CACHED_INPUT_COST_PER_MTOK', cls.openai_strong_cached_input_cost_per_mtok
+            ),
+            openai_strong_output_cost_per_mtok=_env_float(
+                'OPENAI_STRONG_OUTPUT_COST_PER_MTOK', cls.openai_strong_output_cost_per_mtok
+            ),
         )
     
     def validate(self):
@@ -0,0 +1,59 @@
+"""Áudios das execuções em andamento, fora do estado checkpointado.
+
+O estado do workflow guarda só a referência (`audio_ref`): os bytes do áudio
+não vão para o SQLite dos checkpoints. Depois de um reinício a referência não
+resolve mais e a execução recomeça do download (ver `bot.handlers`).
+"""
+from collections import OrderedDict
+from typing import Optional
+from uuid import uuid4
+from ..models.audio import AudioPayload
+
+# Limite da memória ocupada por áudios aguardando transcrição (ex.: falhas à espera do retry)
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class AudioStore:
+    """LRU em memória limitado pelo tamanho total dos áudios"""
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, AudioPayload]" = OrderedDict()
+        self._size = 0
+        self.evictions = 0
+
+    def add(self, audio: AudioPayload) -> str:
+        """Guarda o áudio e devolve a referência para o estado"""
+        ref = uuid4().hex
+        self.put(ref, audio)
+        return ref
+
+    def put(self, ref: str, audio: AudioPayload):
+        self.discard(ref)
+        self._entries[ref] = audio
+        self._size += audio.size
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted.size
+            self.evictions += 1
+
+    def get(self, ref: Optional[str]) -> Optional[AudioPayload]:
+        audio = self._entries.get(ref) if ref else None
+        if audio is not None:
+            self._entries.move_to_end(ref)
+        return audio
+
+    def discard(self, ref: Optional[str]):
+        audio = self._entries.pop(ref, None) if ref else None
+        if audio is not None:
+            self._size -= audio.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+
+audio_store = AudioStore()
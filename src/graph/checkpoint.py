@@ -0,0 +1,44 @@
+"""Checkpoints do workflow em SQLite: uma thread por mensagem de áudio (chat + mensagem)"""
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import aiosqlite
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+logger = logging.getLogger(__name__)
+
+# Tipos do estado que podem ser reconstruídos a partir dos checkpoints
+CHECKPOINT_TYPES = [
+    ('src.models.audio', 'AudioStats'),
+    ('src.models.expense', 'Category'),
+    ('src.models.expense', 'Account'),
+    ('src.models.expense', 'CreditCard'),
+    ('src.models.expense', 'ExpenseData'),
+    ('src.models.expense', 'ExtractionContext'),
+]
+
+
+def thread_id(chat_id: int, message_id: int) -> str:
+    return f"{chat_id}:{message_id}"
+
+
+def thread_config(thread: str) -> dict:
+    return {"configurable": {"thread_id": thread}}
+
+
+@asynccontextmanager
+async def open_checkpointer(path: str) -> AsyncIterator[Optional[AsyncSqliteSaver]]:
+    """Abre o checkpointer em `path` (vazio = sem checkpoints, devolve None)"""
+    if not path:
+        yield None
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    async with aiosqlite.connect(path) as conn:
+        saver = AsyncSqliteSaver(conn, serde=JsonPlusSerializer(allowed_msgpack_modules=CHECKPOINT_TYPES))
+        await saver.setup()
+        logger.info(f"Checkpoints do workflow em {path}")
+        yield saver
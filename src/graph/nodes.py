@@ -1,83 +1,130 @@
 """Nós do grafo LangGraph"""
 import logging
+from typing import Optional
+from .audio_store import audio_store
 from .state import ExpenseState
+from ..services.audio_processing import AudioPreprocessor
 from ..services.transcription import TranscriptionService
 from ..services.extraction import ExtractionService
+from ..services.metrics import stage_timer
+from ..services.tracing import set_attributes
 from ..services.organizze import OrganizzeClient
+from ..services.outbox import QUEUED_MESSAGE, SENT_MESSAGE, Outbox
 
 logger = logging.getLogger(__name__)
 
-transcription_service = TranscriptionService()
-extraction_service = ExtractionService()
+
+class StepError(Exception):
+    """Falha de um nó do workflow (mensagem já pronta para o usuário).
+
+    Os nós lançam em vez de gravar o erro no estado: com checkpointer, o
+    LangGraph guarda o que já foi concluído e a execução pode ser retomada
+    repetindo só o nó que falhou.
+    """
+
 organizze_client = OrganizzeClient()
+audio_preprocessor = AudioPreprocessor()
+transcription_service = TranscriptionService()
+extraction_service = ExtractionService(organizze_client)
+
 
+async def preprocess_node(state: ExpenseState) -> dict:
+    """Nó de pré-processamento: mono 16 kHz Opus e remoção de silêncio (opcional).
 
-def transcribe_node(state: ExpenseState) -> ExpenseState:
+    Em caso de falha o áudio original segue para a transcrição.
+    """
+    if not audio_preprocessor.enabled or state.get('transcription'):
+        return {}
+
+    ref = state.get('audio_ref')
+    original = audio_store.get(ref)
+    if original is None:
+        # a transcrição trata a falta do áudio
+        return {}
+    with stage_timer('preprocess'):
+        audio, stats = await audio_preprocessor.process(original)
+    audio_store.put(ref, audio)
+    return {'audio_stats': stats}
+
+
+async def transcribe_node(state: ExpenseState) -> dict:
     """Nó de transcrição: apenas popula `transcription` no estado."""
+    if state.get('transcription'):
+        # já veio do cache de transcrições
+        return {}
+
+    audio = audio_store.get(state.get('audio_ref'))
+    if audio is None:
+        # reinício ou áudio descartado por falta de memória: só um novo envio resolve
+        raise StepError("Erro na transcrição: o áudio não está mais disponível, envie de novo")
+    set_attributes({'audio.duration_s': audio.duration, 'audio.bytes': len(audio.data)})
     try:
-        transcription = transcription_service.transcribe(state['audio_path'])
-        state['transcription'] = transcription
-        return state
+        with stage_timer('transcribe'):
+            transcription = await transcription_service.transcribe(audio)
+        # o áudio não é mais necessário
+        audio_store.discard(state.get('audio_ref'))
+        return {'transcription': transcription}
     except Exception as e:
-        state['error'] = f"Erro na transcrição: {str(e)}"
-        return state
+        raise StepError(f"Erro na transcrição: {str(e)}") from e
+
 
+async def load_metadata_node(state: ExpenseState) -> dict:
+    """Nó de metadados: carrega categorias/contas/cartões e o bloco do prompt.
 
-def extract_node(state: ExpenseState) -> ExpenseState:
+    Roda em paralelo com `transcribe_node`, pois não depende da transcrição.
+    Falhas aqui não interrompem o fluxo: a extração segue com listas vazias.
+    """
+    with stage_timer('load_metadata'):
+        context = await extraction_service.load_context()
+    return {'extraction_context': context}
+
+
+async def extract_node(state: ExpenseState) -> dict:
     """Nó de extração: popula `expense_data` e `extracted_message` (não adiciona a `messages`)."""
     try:
-        expense = extraction_service.extract(state['transcription'])
-        state['expense_data'] = expense
-
-        amount = abs(expense.amount_cents) / 100
-
-        # Monta mensagem com informações (guardada separadamente)
-        msg_parts = [
-            "✅ Dados extraídos:",
-            f"💰 R$ {amount:.2f}",
-            f"📝 {expense.description}",
-            f"📅 {expense.date}"
-        ]
-
-        # Adiciona categoria se identificada
-        if expense.category_id:
-            categories = organizze_client.get_categories()
-            category = next((c for c in categories if c.id == expense.category_id), None)
-            if category:
-                msg_parts.append(f"📂 Categoria: {category.name}")
-
-        # Adiciona forma de pagamento
-        if expense.credit_card_id:
-            cards = organizze_client.get_credit_cards()
-            card = next((c for c in cards if c.id == expense.credit_card_id), None)
-            if card:
-                msg_parts.append(f"💳 Cartão: {card.name}")
-        elif expense.account_id:
-            accounts = organizze_client.get_accounts()
-            account = next((a for a in accounts if a.id == expense.account_id), None)
-            if account:
-                msg_parts.append(f"🏦 Conta: {account.name}")
-
-        state['extracted_message'] = "\n".join(msg_parts)
-        return state
+        with stage_timer('extract'):
+            result = await extraction_service.extract(
+                state['transcription'], state.get('extraction_context'), state.get('user_id')
+            )
+        return {
+            'expense_data': result.expense,
+            'category': result.category,
+            'account': result.account,
+            'credit_card': result.credit_card,
+            'extracted_message': _extracted_message(
+                result.expense, result.category, result.account, result.credit_card
+            ),
+        }
     except Exception as e:
-        state['error'] = f"Erro na extração: {str(e)}"
-        return state
+        raise StepError(f"Erro na extração: {str(e)}") from e
 
 
-def send_node(state: ExpenseState) -> ExpenseState:
-    """Nó de envio ao Organizze: realiza a chamada e guarda resposta (não adiciona mensagem)."""
-    try:
-        result = organizze_client.create_transaction(state['expense_data'])
-        state['organizze_response'] = result
-        state['sent_message'] = "✅ Gasto registrado no Organizze!"
-        return state
-    except Exception as e:
-        state['error'] = f"Erro ao registrar: {str(e)}"
-        return state
+def make_send_node(outbox: Optional[Outbox] = None):
+    """Nó de envio ao Organizze (não adiciona mensagem).
+
+    Com o outbox (criado no startup da aplicação) só grava o gasto nele e
+    responde "na fila"; o envio e a confirmação ao usuário ficam com o
+    flusher. Sem outbox, chama a API aqui.
+    """
+    async def send_node(state: ExpenseState) -> dict:
+        try:
+            with stage_timer('send'):
+                if outbox is not None:
+                    outbox_id = await outbox.enqueue(state['expense_data'])
+                    return {'outbox_id': outbox_id, 'sent_message': QUEUED_MESSAGE}
+
+                result = await organizze_client.create_transaction(state['expense_data'])
+            return {
+                'organizze_response': result,
+                'sent_message': SENT_MESSAGE,
+            }
+        except Exception as e:
+            raise StepError(f"Erro ao registrar: {str(e)}") from e
+
+    return send_node
 
 
-def finalize_messages_node(state: ExpenseState) -> ExpenseState:
+async def finalize_messages_node(state: ExpenseState) -> dict:
     """Compõe as mensagens finais e sobrescreve `state['messages']` com um único item.
 
     Formato desejado:
@@ -106,42 +153,13 @@ def finalize_messages_node(state: ExpenseState) -> ExpenseState:
     extracted = state.get('extracted_message')
     if not extracted and state.get('expense_data'):
         exp = state['expense_data']
+        context = state.get('extraction_context')
+        # objetos resolvidos na extração; sem eles, o índice por id do contexto (sem chamadas à API)
+        category = state.get('category') or (context and context.categories_by_id.get(exp.category_id))
+        account = state.get('account') or (context and context.accounts_by_id.get(exp.account_id))
+        card = state.get('credit_card') or (context and context.credit_cards_by_id.get(exp.credit_card_id))
         try:
-            amount = abs(exp.amount_cents) / 100
-            parts = [
-                "✅ Dados extraídos:",
-                f"💰 R$ {amount:.2f}",
-                f"📝 {exp.description}",
-                f"📅 {exp.date}"
-            ]
-            if getattr(exp, 'category_id', None):
-                # try to resolve category name if available in state (organizze client calls are expensive)
-                try:
-                    categories = organizze_client.get_categories()
-                    category = next((c for c in categories if c.id == exp.category_id), None)
-                    if category:
-                        parts.append(f"📂 Categoria: {category.name}")
-                except Exception:
-                    pass
-
-            if getattr(exp, 'credit_card_id', None):
-                try:
-                    cards = organizze_client.get_credit_cards()
-                    card = next((c for c in cards if c.id == exp.credit_card_id), None)
-                    if card:
-                        parts.append(f"💳 Cartão: {card.name}")
-                except Exception:
-                    pass
-            elif getattr(exp, 'account_id', None):
-                try:
-                    accounts = organizze_client.get_accounts()
-                    account = next((a for a in accounts if a.id == exp.account_id), None)
-                    if account:
-                        parts.append(f"🏦 Conta: {account.name}")
-                except Exception:
-                    pass
-
-            extracted = "\n".join(parts)
+            extracted = _extracted_message(exp, category, account, card)
         except Exception:
             extracted = None
 
@@ -151,7 +169,7 @@ def finalize_messages_node(state: ExpenseState) -> ExpenseState:
     # Sent/confirmation section (fallback to generic message if organizze_response exists)
     sent = state.get('sent_message')
     if not sent and state.get('organizze_response'):
-        sent = "✅ Gasto registrado no Organizze!"
+        sent = SENT_MESSAGE
 
     if sent:
         sections.append(sent)
@@ -159,10 +177,26 @@ def finalize_messages_node(state: ExpenseState) -> ExpenseState:
     # Compose final message with a blank line between sections
     final_text = "\n\n".join(sections) if sections else ""
 
-    state['messages'] = [final_text] if final_text else []
-    return state
+    return {'messages': [final_text] if final_text else []}
+
+
+def _extracted_message(expense, category=None, account=None, credit_card=None) -> str:
+    """Bloco "Dados extraídos" a partir do gasto e dos objetos já resolvidos"""
+    amount = abs(expense.amount_cents) / 100
+    parts = [
+        "✅ Dados extraídos:",
+        f"💰 R$ {amount:.2f}",
+        f"📝 {expense.description}",
+        f"📅 {expense.date}"
+    ]
+
+    if expense.category_id and category:
+        parts.append(f"📂 Categoria: {category.name}")
 
+    # Forma de pagamento: cartão tem precedência, como no payload
+    if expense.credit_card_id and credit_card:
+        parts.append(f"💳 Cartão: {credit_card.name}")
+    elif not expense.credit_card_id and expense.account_id and account:
+        parts.append(f"🏦 Conta: {account.name}")
 
-def check_error(state: ExpenseState) -> str:
-    """Verifica se houve erro"""
-    return "error" if state.get('error') else "continue"
\ No newline at end of file
+    return "\n".join(parts)
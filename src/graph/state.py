@@ -1,12 +1,24 @@
 """Estado do grafo LangGraph"""
 from typing import TypedDict, Annotated, Optional
 import operator
-from ..models.expense import ExpenseData
+from ..models.audio import AudioStats
+from ..models.expense import Account, Category, CreditCard, ExpenseData, ExtractionContext
 
 class ExpenseState(TypedDict):
-    audio_path: str
+    user_id: Optional[int]
+    # referência ao áudio em `audio_store`: os bytes não entram nos checkpoints
+    audio_ref: Optional[str]
+    audio_stats: Optional[AudioStats]
     transcription: str
+    extraction_context: Optional[ExtractionContext]
     expense_data: Optional[ExpenseData]
+    # objetos já resolvidos na extração (nomes para as mensagens sem nova busca)
+    category: Optional[Category]
+    account: Optional[Account]
+    credit_card: Optional[CreditCard]
+    extracted_message: Optional[str]
     organizze_response: Optional[dict]
-    error: Optional[str]
+    # id no outbox quando o envio ao Organizze fica para o flusher
+    outbox_id: Optional[int]
+    sent_message: Optional[str]
     messages: Annotated[list, operator.add]
\ No newline at end of file
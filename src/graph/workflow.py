@@ -1,39 +1,52 @@
 """Definição do workflow LangGraph"""
-from langgraph.graph import StateGraph, END
+from typing import Optional
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import StateGraph, START, END
+from ..services.outbox import Outbox
+from ..services.tracing import traced_node
 from .state import ExpenseState
-from .nodes import transcribe_node, extract_node, send_node, check_error, finalize_messages_node
+from .nodes import (
+    preprocess_node,
+    transcribe_node,
+    load_metadata_node,
+    extract_node,
+    make_send_node,
+    finalize_messages_node,
+)
 
-def create_expense_workflow():
-    """Cria o workflow de processamento de despesas"""
+def create_expense_workflow(
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    outbox: Optional[Outbox] = None,
+):
+    """Cria o workflow de processamento de despesas (nós assíncronos, use `ainvoke`).
+
+    Com `checkpointer`, cada execução (thread) guarda o estado após cada nó;
+    se um nó falhar, `ainvoke(None, config)` retoma repetindo só ele. Com
+    `outbox`, o envio ao Organizze fica com o flusher dele.
+    """
     workflow = StateGraph(ExpenseState)
     
-    # Adiciona nós
-    workflow.add_node("transcribe", transcribe_node)
-    workflow.add_node("extract", extract_node)
-    workflow.add_node("send", send_node)
-    workflow.add_node("finalize", finalize_messages_node)
-    
-    # Define fluxo
-    workflow.set_entry_point("transcribe")
-    
-    workflow.add_conditional_edges(
-        "transcribe",
-        check_error,
-        {"continue": "extract", "error": END}
-    )
+    # Adiciona nós (cada execução de nó vira um span `node.<nome>` no trace do update)
+    nodes = {
+        "preprocess": preprocess_node,
+        "transcribe": transcribe_node,
+        "load_metadata": load_metadata_node,
+        "extract": extract_node,
+        "send": make_send_node(outbox),
+        "finalize": finalize_messages_node,
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, traced_node(name, node))
     
-    workflow.add_conditional_edges(
-        "extract",
-        check_error,
-        {"continue": "send", "error": END}
-    )
-    
-    workflow.add_conditional_edges(
-        "send",
-        check_error,
-        {"continue": "finalize", "error": END}
-    )
-
+    # Define fluxo: áudio (pré-processamento + transcrição) e metadados do Organizze
+    # rodam em paralelo e se juntam antes da extração. Falhas são exceções
+    # (`StepError`) que interrompem a execução no nó que falhou.
+    workflow.add_edge(START, "preprocess")
+    workflow.add_edge("preprocess", "transcribe")
+    workflow.add_edge(START, "load_metadata")
+    workflow.add_edge(["transcribe", "load_metadata"], "extract")
+    workflow.add_edge("extract", "send")
+    workflow.add_edge("send", "finalize")
     workflow.add_edge("finalize", END)
     
-    return workflow.compile()
\ No newline at end of file
+    return workflow.compile(checkpointer=checkpointer)
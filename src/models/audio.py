@@ -0,0 +1,27 @@
+"""Modelos de áudio"""
+from dataclasses import dataclass, field
+from typing import Optional
+
+@dataclass
+class AudioPayload:
+    """Áudio baixado do Telegram, mantido em memória"""
+    data: bytes = field(repr=False)
+    filename: str  # nome com extensão: o Whisper identifica o formato por ela
+    mime_type: Optional[str] = None
+    file_unique_id: Optional[str] = None
+    content_hash: Optional[str] = None  # sha256 do áudio original (chave do cache de transcrições)
+    duration: Optional[int] = None  # segundos (informado pelo Telegram ou medido no pré-processamento)
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+@dataclass
+class AudioStats:
+    """Efeito do pré-processamento em um áudio (tamanho enviado e segundos faturados)"""
+    original_bytes: int
+    processed_bytes: int
+    original_seconds: float
+    processed_seconds: float
+    elapsed_ms: float
@@ -1,6 +1,7 @@
 """Modelos de dados"""
 from dataclasses import dataclass
-from typing import List, Optional
+from functools import cached_property
+from typing import Dict, List, Optional
 
 @dataclass
 class Tag:
@@ -52,4 +53,35 @@ class ExpenseData:
         elif self.account_id:
             payload["account_id"] = self.account_id
         
-        return payload
\ No newline at end of file
+        return payload
+
+
+@dataclass
+class ExtractionContext:
+    """Metadados do Organizze e bloco do prompt derivado deles, carregados antes da extração"""
+    categories: List[Category]
+    accounts: List[Account]
+    credit_cards: List[CreditCard]
+    prompt_prefix: str  # instruções + contas e cartões: parte estável do prompt
+
+    # índices por id calculados sob demanda (fora dos campos: o contexto vai nos checkpoints)
+    @cached_property
+    def categories_by_id(self) -> Dict[int, Category]:
+        return {cat.id: cat for cat in self.categories}
+
+    @cached_property
+    def accounts_by_id(self) -> Dict[int, Account]:
+        return {acc.id: acc for acc in self.accounts}
+
+    @cached_property
+    def credit_cards_by_id(self) -> Dict[int, CreditCard]:
+        return {card.id: card for card in self.credit_cards}
+
+
+@dataclass
+class ExtractionResult:
+    """Gasto extraído junto dos objetos já resolvidos (para exibir nomes sem nova busca)"""
+    expense: ExpenseData
+    category: Optional[Category] = None
+    account: Optional[Account] = None
+    credit_card: Optional[CreditCard] = None
@@ -0,0 +1,218 @@
+"""Pré-processamento de áudio antes da transcrição (pydub + ffmpeg)"""
+import asyncio
+import io
+import logging
+import math
+import os
+import time
+from typing import List, Optional, Tuple
+from pydub import AudioSegment
+from pydub.silence import detect_nonsilent, detect_silence
+from ..config.settings import settings
+from ..models.audio import AudioPayload, AudioStats
+
+logger = logging.getLogger(__name__)
+
+TARGET_FRAME_RATE = 16000
+
+
+class AudioPreprocessor:
+    """Converte o áudio para mono 16 kHz em Opus e remove silêncio.
+
+    Mensagens de voz costumam ter muito silêncio e respiração; enviar menos
+    segundos reduz o upload, a latência e o custo do Whisper (cobrado por
+    segundo de áudio).
+    """
+
+    def __init__(self):
+        self.enabled = settings.audio_preprocessing
+        self.bitrate = settings.audio_bitrate
+        self.silence_thresh_db = settings.audio_silence_thresh_db
+        self.min_silence_ms = settings.audio_min_silence_ms
+        self.keep_silence_ms = settings.audio_keep_silence_ms
+        self.max_pause_ms = settings.audio_max_pause_ms
+
+        # Totais acumulados para diagnóstico
+        self.processed = 0
+        self.failures = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds_in = 0.0
+        self.seconds_out = 0.0
+
+    async def process(self, audio: AudioPayload) -> Tuple[AudioPayload, Optional[AudioStats]]:
+        """Retorna o áudio pré-processado e as estatísticas (ou o original se falhar)"""
+        try:
+            # decodificação/encode rodam no ffmpeg e bloqueiam: fora do event loop
+            processed, stats = await asyncio.to_thread(self._process_sync, audio)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Pré-processamento falhou, enviando áudio original: {e}")
+            return audio, None
+
+        self.processed += 1
+        self.bytes_in += stats.original_bytes
+        self.bytes_out += stats.processed_bytes
+        self.seconds_in += stats.original_seconds
+        self.seconds_out += stats.processed_seconds
+        logger.info(
+            f"Áudio pré-processado em {stats.elapsed_ms:.0f} ms: "
+            f"{stats.original_bytes / 1024:.1f} KB → {stats.processed_bytes / 1024:.1f} KB, "
+            f"{stats.original_seconds:.1f}s → {stats.processed_seconds:.1f}s faturados"
+        )
+        return processed, stats
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "processed": self.processed,
+            "failures": self.failures,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "seconds_in": round(self.seconds_in, 1),
+            "seconds_out": round(self.seconds_out, 1),
+        }
+
+    def _process_sync(self, audio: AudioPayload) -> Tuple[AudioPayload, AudioStats]:
+        start = time.perf_counter()
+        segment = decode(audio)
+        original_seconds = segment.duration_seconds
+
+        segment = segment.set_channels(1).set_frame_rate(TARGET_FRAME_RATE)
+        segment = self.trim_silence(segment)
+
+        data = encode_opus(segment, self.bitrate)
+
+        if len(data) >= audio.size and segment.duration_seconds >= original_seconds:
+            # nada a ganhar (áudio já compacto e sem silêncio): mantém o original
+            processed, seconds = audio, original_seconds
+        else:
+            processed = AudioPayload(
+                data=data,
+                filename="voice.ogg",
+                mime_type="audio/ogg",
+                file_unique_id=audio.file_unique_id,
+                content_hash=audio.content_hash,
+                duration=math.ceil(segment.duration_seconds),
+            )
+            seconds = segment.duration_seconds
+
+        stats = AudioStats(
+            original_bytes=audio.size,
+            processed_bytes=processed.size,
+            original_seconds=original_seconds,
+            processed_seconds=seconds,
+            elapsed_ms=(time.perf_counter() - start) * 1000,
+        )
+        return processed, stats
+
+    def trim_silence(self, segment: AudioSegment) -> AudioSegment:
+        """Remove silêncio das pontas e encurta pausas internas longas"""
+        ranges = self.speech_ranges(segment)
+        if not ranges:
+            # nada detectado como fala: não arrisca mandar áudio vazio
+            return segment
+
+        trimmed = segment[ranges[0][0]:ranges[0][1]]
+        for (_, prev_end), (start, end) in zip(ranges, ranges[1:]):
+            pause = min(start - prev_end, self.max_pause_ms)
+            trimmed += segment[prev_end:prev_end + pause] + segment[start:end]
+        return trimmed
+
+    def speech_ranges(self, segment: AudioSegment) -> List[List[int]]:
+        """Trechos com fala (ms), com uma pequena margem de silêncio e já mesclados"""
+        if segment.dBFS == float('-inf'):
+            return []
+
+        ranges = detect_nonsilent(
+            segment,
+            min_silence_len=self.min_silence_ms,
+            silence_thresh=segment.dBFS - self.silence_thresh_db,
+            seek_step=10,
+        )
+        padded: List[List[int]] = []
+        for start, end in ranges:
+            start = max(0, start - self.keep_silence_ms)
+            end = min(len(segment), end + self.keep_silence_ms)
+            if padded and start <= padded[-1][1]:
+                padded[-1][1] = max(padded[-1][1], end)
+            else:
+                padded.append([start, end])
+        return padded
+
+
+def decode(audio: AudioPayload) -> AudioSegment:
+    """Decodifica o áudio em memória (formato pela extensão do nome)"""
+    ext = os.path.splitext(audio.filename)[1].lstrip('.').lower() or None
+    if ext == 'oga':
+        ext = 'ogg'
+    return AudioSegment.from_file(io.BytesIO(audio.data), format=ext)
+
+
+def encode_opus(segment: AudioSegment, bitrate: str) -> bytes:
+    out = io.BytesIO()
+    segment.export(out, format="ogg", codec="libopus", bitrate=bitrate, parameters=["-application", "voip"])
+    return out.getvalue()
+
+
+def chunk_bounds(
+    segment: AudioSegment,
+    chunk_ms: int,
+    overlap_ms: int,
+    min_silence_ms: int,
+    silence_thresh_db: float,
+) -> List[Tuple[int, int]]:
+    """Intervalos (ms) de trechos de ~`chunk_ms`, cortando no silêncio mais próximo.
+
+    Cada corte procura uma pausa na metade final do trecho; sem pausa, corta no
+    limite. Trechos vizinhos compartilham `overlap_ms` de áudio em volta do
+    corte para não perder palavras (a sobreposição é removida ao juntar os textos).
+    """
+    total = len(segment)
+    if total <= chunk_ms:
+        return [(0, total)]
+
+    if segment.dBFS == float('-inf'):
+        silences = []
+    else:
+        silences = detect_silence(
+            segment,
+            min_silence_len=min_silence_ms,
+            silence_thresh=segment.dBFS - silence_thresh_db,
+            seek_step=10,
+        )
+
+    cuts = []
+    start = 0
+    while total - start > chunk_ms:
+        target = start + chunk_ms
+        window_start = start + chunk_ms // 2
+        # meio da pausa mais próxima do limite, dentro da janela [metade, limite]
+        candidates = [
+            (s + e) // 2 for s, e in silences
+            if window_start <= (s + e) // 2 <= target
+        ]
+        cut = max(candidates) if candidates else target
+        cuts.append(cut)
+        start = cut
+
+    bounds = [0] + cuts + [total]
+    return [
+        (max(0, begin - overlap_ms), min(total, end + overlap_ms))
+        for begin, end in zip(bounds, bounds[1:])
+    ]
+
+
+def decode_for_speech(audio: AudioPayload) -> AudioSegment:
+    """Decodifica já em mono 16 kHz (formato usado para detectar silêncio e cortar)"""
+    return decode(audio).set_channels(1).set_frame_rate(TARGET_FRAME_RATE)
+
+
+def export_chunk(segment: AudioSegment, bounds: Tuple[int, int], index: int, bitrate: str) -> AudioPayload:
+    piece = segment[bounds[0]:bounds[1]]
+    return AudioPayload(
+        data=encode_opus(piece, bitrate),
+        filename=f"chunk_{index}.ogg",
+        mime_type="audio/ogg",
+        duration=math.ceil(piece.duration_seconds),
+    )
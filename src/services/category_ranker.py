@@ -0,0 +1,106 @@
+"""Pré-seleção local das categorias mais prováveis para o prompt de extração"""
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Set
+from ..models.expense import Category
+from .local_parser import CATEGORY_KEYWORDS
+from .text import fold, words
+
+# Pesos do score: palavras do nome citadas > sinônimos > histórico do usuário
+NAME_WEIGHT = 1.0
+SYNONYM_WEIGHT = 0.9
+HISTORY_WEIGHT = 0.3
+
+# Prefixo comparado entre palavras ("farmácias" ~ "farmácia", "mercadinho" ~ "mercado")
+STEM_LENGTH = 5
+
+
+class CategoryRanker:
+    """Ordena as categorias de despesa pela chance de serem a do texto.
+
+    Só as `top_k` primeiras vão para o prompt, em vez de um corte fixo na ordem
+    da API (que deixava de fora a categoria certa quando ela era a 21ª).
+    """
+
+    def __init__(self, top_k: int):
+        self.top_k = top_k
+        self._history: Dict[int, Counter] = defaultdict(Counter)
+
+        # Efeito na precisão: categoria escolhida estava entre as sugeridas?
+        self.chosen_in_top_k = 0
+        self.chosen_outside_top_k = 0
+
+    def rank(self, text: str, categories: Sequence[Category], user_id: Optional[int] = None) -> List[Category]:
+        """Categorias de despesa mais prováveis (todas, se `top_k` for 0)"""
+        candidates = [cat for cat in categories if cat.kind != 'revenue']
+        if not self.top_k or len(candidates) <= self.top_k:
+            return candidates
+
+        tokens = words(text)
+        stems = {_stem(t) for t in tokens if len(t) > 2}
+        hints = [hints for hints in (CATEGORY_KEYWORDS.get(t) for t in tokens) if hints]
+        history = self._history.get(user_id) if user_id is not None else None
+        total = sum(history.values()) if history else 0
+
+        scored = []
+        for index, category in enumerate(candidates):
+            score = _name_score(category, stems) + _synonym_score(category, hints)
+            if total:
+                score += HISTORY_WEIGHT * history[category.id] / total
+            scored.append((-score, index, category))
+
+        scored.sort(key=lambda item: (item[0], item[1]))
+        return [category for _, _, category in scored[:self.top_k]]
+
+    def record(
+        self,
+        user_id: Optional[int],
+        category_id: Optional[int],
+        suggested: Optional[Sequence[Category]] = None,
+    ):
+        """Registra a categoria escolhida (histórico do usuário e acerto do top-K).
+
+        `suggested` é a lista enviada no prompt; sem ela (fast-path local) só o
+        histórico é atualizado.
+        """
+        if category_id is None:
+            return
+        if suggested is not None:
+            if any(cat.id == category_id for cat in suggested):
+                self.chosen_in_top_k += 1
+            else:
+                self.chosen_outside_top_k += 1
+        if user_id is not None:
+            self._history[user_id][category_id] += 1
+
+    def snapshot(self) -> dict:
+        chosen = self.chosen_in_top_k + self.chosen_outside_top_k
+        return {
+            "top_k": self.top_k,
+            "chosen_in_top_k": self.chosen_in_top_k,
+            "chosen_outside_top_k": self.chosen_outside_top_k,
+            "top_k_recall": round(self.chosen_in_top_k / chosen, 4) if chosen else None,
+            "users_with_history": len(self._history),
+        }
+
+
+def _stem(word: str) -> str:
+    return word[:STEM_LENGTH]
+
+
+def _name_score(category: Category, stems: Set[str]) -> float:
+    name_words = [w for w in words(category.name) if len(w) > 2]
+    if not name_words:
+        return 0.0
+    matched = sum(1 for w in name_words if _stem(w) in stems)
+    return NAME_WEIGHT * matched / len(name_words)
+
+
+def _synonym_score(category: Category, hints: List[List[str]]) -> float:
+    name = fold(category.name)
+    best = 0.0
+    for options in hints:
+        for rank, hint in enumerate(options):
+            if hint in name:
+                best = max(best, SYNONYM_WEIGHT - 0.05 * rank)
+                break
+    return best
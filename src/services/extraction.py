@@ -1,142 +1,525 @@
 """Serviço de extração de dados com LLM"""
+import asyncio
 import json
 import logging
-from datetime import datetime
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, ValidationError
 from ..config.settings import settings
-from ..models.expense import ExpenseData, Tag
+from ..models.expense import Category, ExpenseData, ExtractionContext, ExtractionResult, Tag
+from .category_ranker import CategoryRanker
+from .extraction_cassette import CassetteRecorder, build_entry, response_record
+from .extraction_router import CHEAP, LOCAL, STRONG, RoutingStats, validate
+from .extraction_schema import OTHER_CATEGORY, build_schema, parse_json_text, repair, schema_category_names
+from .local_parser import LocalExpenseParser
+from .metadata_cache import metadata_cache
 from .organizze import OrganizzeClient
+from .resilience import dependency
+from .token_usage import TokenUsageTracker
+from .tracing import set_attributes
 
 logger = logging.getLogger(__name__)
 
+# Nova chamada ao modelo quando a resposta não valida nem após o reparo local
+MAX_RETRIES = 1
+
+# Pedido ao modelo: mensagens + nomes do enum de categorias do esquema (ferramenta)
+PromptRequest = Tuple[List[BaseMessage], Tuple[str, ...]]
+
+
+@dataclass
+class ParseStats:
+    responses: int = 0  # respostas recebidas do modelo
+    invalid: int = 0    # respostas fora do esquema (antes do reparo)
+    repaired: int = 0   # inválidas aproveitadas pelo reparo local
+    retries: int = 0
+    failures: int = 0   # extrações perdidas mesmo após reparo e nova tentativa
+
+
+class ExtractionError(Exception):
+    """Resposta do modelo inválida mesmo após reparo local e nova tentativa"""
+
+
 class ExtractionService:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model=settings.openai_model,
-            temperature=0,
-            api_key=settings.openai_api_key
+    def __init__(self, organizze_client: Optional[OrganizzeClient] = None):
+        # Camadas: o modelo barato atende tudo que o parser local não resolve;
+        # o forte só recebe o que foi reprovado na validação
+        self.llm = _chat_model(settings.openai_model)
+        self.strong_llm = _chat_model(settings.openai_strong_model) if settings.openai_strong_model else None
+        self.routing = RoutingStats()
+        self.resilience = dependency('openai_chat', settings.llm_deadline)
+        self.organizze_client = organizze_client or OrganizzeClient()
+        self.local_parser = LocalExpenseParser() if settings.fast_path_enabled else None
+        
+        # Estatísticas do fast-path local vs. LLM
+        self.fast_path_hits = 0
+        self.llm_calls = 0
+        self._fast_path_seconds = 0.0
+        self._llm_seconds = 0.0
+        self.parse_stats = ParseStats()
+        
+        # Só as categorias mais prováveis vão para o prompt
+        self.ranker = CategoryRanker(settings.category_top_k)
+        # Pedidos enviados (mensagens + enum de categorias do esquema) e o equivalente com
+        # todas as categorias, só para o benchmark: em produção os tokens vêm do
+        # `usage_metadata` da resposta (token_usage)
+        self.prompt_samples: Optional[List[Tuple[PromptRequest, PromptRequest]]] = None
+        self._tokenizer_available = True
+        
+        # Prefixo estável do prompt (instruções + contas/cartões) por versão dos metadados
+        self._prefixes: Dict[Tuple[int, int], str] = {}
+        self.token_usage = TokenUsageTracker()
+        
+        # Corpus de extrações para replay/avaliação (opcional)
+        path = settings.extraction_cassette_path
+        self.recorder = CassetteRecorder(path) if path else None
+    
+    async def load_context(self) -> ExtractionContext:
+        """Busca categorias, contas e cartões e monta o prefixo estável do prompt.
+
+        Não depende da transcrição, então pode rodar em paralelo com ela.
+        """
+        categories, accounts, credit_cards = await asyncio.gather(
+            self.organizze_client.get_categories(),
+            self.organizze_client.get_accounts(),
+            self.organizze_client.get_credit_cards(),
+        )
+        return ExtractionContext(
+            categories=categories,
+            accounts=accounts,
+            credit_cards=credit_cards,
+            prompt_prefix=self._prompt_prefix(accounts, credit_cards),
         )
-        self.organizze_client = OrganizzeClient()
     
-    def extract(self, transcription: str) -> ExpenseData:
-        """Extrai dados estruturados da transcrição"""
+    async def extract(
+        self,
+        transcription: str,
+        context: Optional[ExtractionContext] = None,
+        user_id: Optional[int] = None,
+        today: Optional[date] = None,
+    ) -> ExtractionResult:
+        """Extrai dados estruturados da transcrição, com categoria/conta/cartão resolvidos.
+
+        `today` fixa a data de referência (replay do corpus); padrão: hoje.
+        """
         try:
             logger.info("Extraindo informações da transcrição")
             
-            # Busca categorias, contas e cartões disponíveis
-            categories = self.organizze_client.get_categories()
-            accounts = self.organizze_client.get_accounts()
-            credit_cards = self.organizze_client.get_credit_cards()
+            if context is None:
+                context = await self.load_context()
             
-            today = datetime.now().strftime('%Y-%m-%d')
-            prompt = self._build_prompt(transcription, today, categories, accounts, credit_cards)
+            today = today or datetime.now().date()
+            responses = [] if self.recorder else None
+            result, tier, llm = await self._route(transcription, context, today, user_id, responses)
+            self.routing.extractions += 1
+            set_attributes({'extraction.tier': tier})
+            if tier != LOCAL and self.recorder:
+                await self.recorder.record(build_entry(
+                    transcription, today.isoformat(), context, responses, result,
+                    getattr(llm, 'model_name', settings.openai_model),
+                ))
             
-            response = self.llm.invoke(prompt)
-            data = self._parse_response(response.content)
+            logger.info(f"Dados extraídos: {result.expense}")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Erro na extração: {e}")
+            raise
+    
+    async def _route(
+        self,
+        transcription: str,
+        context: ExtractionContext,
+        today: date,
+        user_id: Optional[int],
+        responses: Optional[List[dict]],
+    ) -> Tuple[ExtractionResult, str, Optional[ChatOpenAI]]:
+        """Parser local → modelo barato → modelo forte: a primeira camada aprovada vence.
+
+        A última camada disponível é aceita mesmo reprovada. Resposta inválida
+        do modelo barato também sobe de camada; erros de rede/prazo não (o
+        provedor é o mesmo e a camada de resiliência já tentou de novo).
+        """
+        has_categories = bool(context.categories)
+        if self.local_parser is not None:
+            started = time.perf_counter()
+            result = self._try_fast_path(transcription, context, today)
+            self.routing.record(LOCAL, time.perf_counter() - started, result is not None)
+            if result is not None:
+                self.ranker.record(user_id, result.expense.category_id)
+                return result, LOCAL, None
+        
+        suggested = self.ranker.rank(transcription, context.categories, user_id)
+        tiers = [(CHEAP, self.llm)] + ([(STRONG, self.strong_llm)] if self.strong_llm else [])
+        for number, (tier, llm) in enumerate(tiers, 1):
+            last = number == len(tiers)
+            started = time.perf_counter()
+            try:
+                result = await self._extract_with_llm(
+                    transcription, context, today.isoformat(), suggested, user_id, llm, responses
+                )
+            except ExtractionError:
+                self.routing.record(tier, time.perf_counter() - started, False)
+                if last:
+                    raise
+                problems = ['invalid_response']
+            else:
+                problems = validate(result, transcription, today, has_categories)
+                self.routing.record(tier, time.perf_counter() - started, not problems)
+                if not problems or last:
+                    if problems:
+                        logger.warning(f"Extração aceita com problemas ({', '.join(problems)}): sem camada acima")
+                    # só o resultado aceito entra no histórico do ranking
+                    self.ranker.record(user_id, result.expense.category_id, suggested)
+                    return result, tier, llm
+            self.routing.escalate(tier, problems)
+            logger.info(f"Extração reprovada na camada {tier} ({', '.join(problems)}); escalando")
+    
+    async def _extract_with_llm(
+        self,
+        transcription: str,
+        context: ExtractionContext,
+        today: str,
+        suggested: List[Category],
+        user_id: Optional[int] = None,
+        llm: Optional[ChatOpenAI] = None,
+        responses: Optional[List[dict]] = None,
+    ) -> ExtractionResult:
+        accounts = context.accounts
+        credit_cards = context.credit_cards
+        
+        prompt = self._build_prompt(transcription, today, self._build_category_list(suggested), context.prompt_prefix)
+        names = schema_category_names(suggested, context.categories)
+        if self.prompt_samples is not None:
+            self.prompt_samples.append(((prompt, names), self._full_request(transcription, today, context)))
+        data = await self._structured_extract(
+            prompt, names, date.fromisoformat(today), user_id, responses, llm
+        )
+        
+        # Converte para modelo (não inclui tags, apenas a tag "Bot" será adicionada no payload)
+        expense = ExpenseData(
+            description=data.get('description', 'Gasto'),
+            date=data.get('date', today),
+            amount_cents=data.get('amount_cents', -1000),
+            notes="Lançamento via Bot"
+        )
+        result = ExtractionResult(expense=expense)
+        
+        # Identifica categoria (fora das sugeridas: o nome livre é resolvido na lista completa)
+        category_name = data.get('category_name')
+        if category_name == OTHER_CATEGORY:
+            category_name = data.get('other_category')
+        if category_name:
+            category = await self.organizze_client.find_category_by_name(category_name, context.categories)
+            if category:
+                expense.category_id = category.id
+                result.category = category
+                logger.info(f"Categoria identificada: {category.name} (ID: {category.id})")
+        
+        # Identifica conta ou cartão
+        payment_method = data.get('payment_method', '').lower()
+        
+        if 'cartão' in payment_method or 'cartao' in payment_method or 'crédito' in payment_method or 'credito' in payment_method:
+            # Tenta identificar qual cartão
+            card_name = data.get('card_name', '')
+            if card_name:
+                card = await self.organizze_client.find_credit_card_by_name(card_name, credit_cards)
+                if card:
+                    expense.credit_card_id = card.id
+                    result.credit_card = card
+                    logger.info(f"Cartão identificado: {card.name} (ID: {card.id})")
             
-            # Converte para modelo (não inclui tags, apenas a tag "Bot" será adicionada no payload)
-            expense = ExpenseData(
-                description=data.get('description', 'Gasto'),
-                date=data.get('date', today),
-                amount_cents=data.get('amount_cents', -1000),
-                notes="Lançamento via Bot"
-            )
+            # Se não encontrou, usa o primeiro cartão disponível
+            if not expense.credit_card_id and credit_cards:
+                expense.credit_card_id = credit_cards[0].id
+                result.credit_card = credit_cards[0]
+                logger.info(f"Usando cartão padrão: {credit_cards[0].name}")
+        
+        else:
+            # Tenta identificar qual conta
+            account_name = data.get('account_name', '')
+            if account_name:
+                account = await self.organizze_client.find_account_by_name(account_name, accounts)
+                if account:
+                    expense.account_id = account.id
+                    result.account = account
+                    logger.info(f"Conta identificada: {account.name} (ID: {account.id})")
             
-            # Identifica categoria
-            if data.get('category_name'):
-                category = self.organizze_client.find_category_by_name(data['category_name'])
-                if category:
-                    expense.category_id = category.id
-                    logger.info(f"Categoria identificada: {category.name} (ID: {category.id})")
+            # Se não encontrou, usa a primeira conta disponível
+            if not expense.account_id and accounts:
+                expense.account_id = accounts[0].id
+                result.account = accounts[0]
+                logger.info(f"Usando conta padrão: {accounts[0].name}")
+        
+        return result
+    
+    def _full_request(self, transcription: str, today: str, context: ExtractionContext) -> PromptRequest:
+        """O mesmo pedido listando todas as categorias de despesa, no prompt e no esquema (sem o ranking)"""
+        expense_categories = [c for c in context.categories if c.kind != 'revenue']
+        prompt = self._build_prompt(
+            transcription, today, self._build_category_list(expense_categories), context.prompt_prefix
+        )
+        return prompt, schema_category_names(expense_categories, context.categories)
+    
+    def prompt_token_report(self) -> dict:
+        """Tokens dos pedidos coletados vs. listando todas as categorias.
+
+        Conta as mensagens e a definição da ferramenta (o esquema, com o enum de
+        categorias). Usa o tokenizer do modelo (pode baixar o vocabulário do
+        tiktoken), por isso só roda fora das extrações, ao fim do benchmark.
+        """
+        samples = self.prompt_samples or []
+        tokens = sum(self._count_request_tokens(*request) for request, _ in samples)
+        full_tokens = sum(self._count_request_tokens(*full_request) for _, full_request in samples)
+        return {
+            "prompts": len(samples),
+            "avg": round(tokens / len(samples), 1) if samples else None,
+            "avg_all_categories": round(full_tokens / len(samples), 1) if samples else None,
+            "exact": self._tokenizer_available,
+        }
+    
+    def _count_request_tokens(self, messages: List[BaseMessage], names: Tuple[str, ...]) -> int:
+        tool = json.dumps(convert_to_openai_tool(build_schema(names)), ensure_ascii=False)
+        return self._count_tokens(messages) + self._count_text_tokens(tool)
+    
+    def _count_tokens(self, messages: List[BaseMessage]) -> int:
+        return self._count_text_tokens("\n".join(message.content for message in messages))
+    
+    def _count_text_tokens(self, text: str) -> int:
+        if self._tokenizer_available:
+            try:
+                return self.llm.get_num_tokens(text)
+            except Exception as e:
+                # sem o vocabulário (ex.: sem rede) cai na estimativa de ~4 caracteres/token
+                self._tokenizer_available = False
+                logger.warning(f"Tokenizer indisponível, estimando tokens: {e}")
+        return len(text) // 4
+    
+    async def _structured_extract(
+        self,
+        prompt: List[BaseMessage],
+        names: Sequence[str],
+        today: date,
+        user_id: Optional[int] = None,
+        responses: Optional[List[dict]] = None,
+        model: Optional[ChatOpenAI] = None,
+    ) -> dict:
+        """Chama o modelo com saída estruturada (function calling) e valida no esquema.
+
+        Resposta inválida é primeiro reparada localmente; só se o reparo não
+        bastar há uma nova chamada, com o erro anexado ao prompt. Com
+        `responses`, cada resposta crua é acrescentada à lista (gravação do corpus).
+        `model` escolhe a camada (padrão: o modelo barato).
+        """
+        schema = build_schema(tuple(names))
+        llm = (model or self.llm).with_structured_output(schema, method="function_calling", include_raw=True)
+        
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                self.parse_stats.retries += 1
+                # anexado ao fim: o prefixo (e o cache dele no provedor) continua igual
+                prompt = prompt + [HumanMessage(
+                    f"Sua resposta anterior foi inválida ({error}). Preencha todos os campos conforme o esquema."
+                )]
             
-            # Identifica conta ou cartão
-            payment_method = data.get('payment_method', '').lower()
+            started = time.perf_counter()
+            result = await self.resilience.call(lambda: llm.ainvoke(prompt))
+            elapsed = time.perf_counter() - started
+            self.llm_calls += 1
+            self._llm_seconds += elapsed
+            self.parse_stats.responses += 1
             
-            if 'cartão' in payment_method or 'cartao' in payment_method or 'crédito' in payment_method or 'credito' in payment_method:
-                # Tenta identificar qual cartão
-                card_name = data.get('card_name', '')
-                if card_name:
-                    card = self.organizze_client.find_credit_card_by_name(card_name)
-                    if card:
-                        expense.credit_card_id = card.id
-                        logger.info(f"Cartão identificado: {card.name} (ID: {card.id})")
-                
-                # Se não encontrou, usa o primeiro cartão disponível
-                if not expense.credit_card_id and credit_cards:
-                    expense.credit_card_id = credit_cards[0].id
-                    logger.info(f"Usando cartão padrão: {credit_cards[0].name}")
+            usage = self.token_usage.record(
+                user_id, getattr(result.get('raw'), 'usage_metadata', None), elapsed * 1000,
+                getattr(model or self.llm, 'model_name', settings.openai_model),
+            )
+            if responses is not None:
+                responses.append(response_record(result.get('raw'), elapsed * 1000))
+            logger.info(
+                f"Tokens: prompt {usage.prompt_tokens} ({usage.cached_tokens} em cache), "
+                f"resposta {usage.completion_tokens}"
+            )
+            set_attributes({
+                'llm.attempt': attempt + 1,
+                'llm.prompt_chars': sum(len(str(message.content)) for message in prompt),
+                'llm.prompt_tokens': usage.prompt_tokens,
+                'llm.cached_tokens': usage.cached_tokens,
+                'llm.completion_tokens': usage.completion_tokens,
+            })
             
-            else:
-                # Tenta identificar qual conta
-                account_name = data.get('account_name', '')
-                if account_name:
-                    account = self.organizze_client.find_account_by_name(account_name)
-                    if account:
-                        expense.account_id = account.id
-                        logger.info(f"Conta identificada: {account.name} (ID: {account.id})")
-                
-                # Se não encontrou, usa a primeira conta disponível
-                if not expense.account_id and accounts:
-                    expense.account_id = accounts[0].id
-                    logger.info(f"Usando conta padrão: {accounts[0].name}")
+            if result.get('parsing_error') is None and result.get('parsed') is not None:
+                return repair(result['parsed'].model_dump(), names, today)
             
-            logger.info(f"Dados extraídos: {expense}")
-            return expense
+            self.parse_stats.invalid += 1
+            logger.warning(f"Resposta do modelo fora do esquema: {result.get('parsing_error')}")
+            try:
+                data = _validate(schema, repair(_raw_arguments(result['raw']), names, today))
+            except (ValueError, ValidationError) as e:
+                error = e
+                continue
+            self.parse_stats.repaired += 1
+            logger.info("Resposta reparada localmente")
+            return data
         
-        except Exception as e:
-            logger.error(f"Erro na extração: {e}")
-            raise
+        self.parse_stats.failures += 1
+        raise ExtractionError(f"Resposta do modelo inválida: {error}")
+    
+    def _try_fast_path(self, transcription: str, context: ExtractionContext, today: date) -> Optional[ExtractionResult]:
+        """Parser local por regras; devolve None com confiança baixa ou reprovado na validação (segue para o LLM)"""
+        if self.local_parser is None:
+            return None
+        
+        started = time.perf_counter()
+        result = self.local_parser.parse(transcription, context, today)
+        elapsed = time.perf_counter() - started
+        self._fast_path_seconds += elapsed
+        
+        if result is None or result.confidence < settings.fast_path_min_confidence:
+            confidence = result.confidence if result else 0.0
+            logger.info(f"Fast-path local com confiança baixa ({confidence:.2f}); usando LLM")
+            self.routing.escalate(LOCAL, ['confidence'])
+            return None
+        
+        extraction = ExtractionResult(
+            expense=result.expense,
+            category=result.category,
+            account=result.account,
+            credit_card=result.credit_card,
+        )
+        problems = validate(extraction, transcription, today, bool(context.categories))
+        if problems:
+            logger.info(f"Fast-path local reprovado na validação ({', '.join(problems)}); usando LLM")
+            self.routing.escalate(LOCAL, problems)
+            return None
+        
+        self.fast_path_hits += 1
+        logger.info(f"Fast-path local (confiança {result.confidence:.2f}) em {elapsed * 1000:.1f} ms; LLM dispensado")
+        return extraction
+    
+    def snapshot(self) -> dict:
+        """Taxa de acerto do fast-path e latência economizada (estimada pela média das extrações com LLM).
+
+        Os denominadores são extrações, não chamadas ao modelo: novas tentativas
+        por resposta inválida e escaladas para o modelo forte não contam duas vezes.
+        """
+        extractions = self.routing.extractions
+        tiers = self.routing.tiers
+        attempts = tiers[LOCAL].attempts
+        llm_extractions = extractions - self.fast_path_hits
+        llm_extraction_seconds = tiers[CHEAP].seconds + tiers[STRONG].seconds
+        avg_llm_ms = self._llm_seconds / self.llm_calls * 1000 if self.llm_calls else None
+        avg_llm_extraction_ms = llm_extraction_seconds / llm_extractions * 1000 if llm_extractions else None
+        avg_fast_path_ms = self._fast_path_seconds / attempts * 1000 if attempts else None
+        saved_ms = None
+        if avg_llm_extraction_ms is not None and attempts:
+            # parses reprovados também custaram tempo
+            saved_ms = round(self.fast_path_hits * avg_llm_extraction_ms - self._fast_path_seconds * 1000)
+        return {
+            "fast_path_hits": self.fast_path_hits,
+            "llm_calls": self.llm_calls,
+            "fast_path_ratio": round(self.fast_path_hits / extractions, 4) if extractions else None,
+            "avg_llm_ms": round(avg_llm_ms, 1) if avg_llm_ms is not None else None,
+            "avg_llm_extraction_ms": round(avg_llm_extraction_ms, 1) if avg_llm_extraction_ms is not None else None,
+            "avg_fast_path_ms": round(avg_fast_path_ms, 3) if avg_fast_path_ms is not None else None,
+            "estimated_latency_saved_ms": saved_ms,
+            "structured_output": self._parse_snapshot(),
+            "category_ranking": self.ranker.snapshot(),
+            "token_usage": self.token_usage.snapshot(),
+            "routing": self.routing.snapshot(settings.openai_strong_model or None),
+        }
+    
+    def _parse_snapshot(self) -> dict:
+        stats = self.parse_stats
+        extractions = stats.responses - stats.retries
+        return {
+            **stats.__dict__,
+            # taxa de respostas inválidas do modelo vs. extrações efetivamente perdidas
+            "invalid_rate": round(stats.invalid / stats.responses, 4) if stats.responses else None,
+            "failure_rate": round(stats.failures / extractions, 4) if extractions else None,
+        }
+    
+    def _prompt_prefix(self, accounts: list, credit_cards: list) -> str:
+        """Prefixo do prompt, idêntico byte a byte enquanto contas/cartões não mudam.
+
+        O provedor reaproveita (cache) o processamento de prefixos repetidos;
+        por isso tudo que varia por mensagem fica no fim do prompt.
+        """
+        if not accounts and not credit_cards:
+            # listas vazias por falha na API: não fixa esse prefixo na versão atual
+            return self._build_prefix(accounts, credit_cards)
+        
+        key = (metadata_cache.version('accounts'), metadata_cache.version('credit_cards'))
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = self._build_prefix(accounts, credit_cards)
+            self._prefixes = {key: prefix}
+        return prefix
     
-    def _build_prompt(self, text: str, today: str, categories: list, accounts: list, credit_cards: list) -> str:
-        # Formata listas para o prompt
-        categories_str = "\n".join([f"- {cat.name} (ID: {cat.id}, tipo: {cat.kind})" for cat in categories[:20]])
+    def _build_prefix(self, accounts: list, credit_cards: list) -> str:
         accounts_str = "\n".join([f"- {acc.name} (ID: {acc.id})" for acc in accounts])
         cards_str = "\n".join([f"- {card.name} (ID: {card.id})" for card in credit_cards])
         
-        return f"""
-Você é um assistente que extrai informações de gastos de textos em português.
+        return f"""Você é um assistente que extrai informações de gastos de textos em português.
 
-Data de hoje: {today}
+Extraia o gasto descrito no texto preenchendo os campos do esquema.
 
-Texto: "{text}"
-
-CATEGORIAS DISPONÍVEIS:
-{categories_str}
+Regras importantes:
+- Se valor não mencionado, use -1000 (R$ 10,00)
+- amount_cents SEMPRE NEGATIVO para despesa
+- date formato YYYY-MM-DD (use data mencionada ou a data de hoje informada)
+- category_name: escolha a mais apropriada entre as categorias informadas junto do texto; se nenhuma servir, use "{OTHER_CATEGORY}" e escreva em other_category o nome da categoria adequada
+- payment_method: identifique se foi mencionado cartão, conta ou dinheiro
+- Se cartão mencionado, tente identificar qual na lista
+- Se conta mencionada, tente identificar qual na lista
+- NÃO inclua tags, elas serão adicionadas automaticamente
 
 CONTAS DISPONÍVEIS:
 {accounts_str}
 
 CARTÕES DE CRÉDITO DISPONÍVEIS:
-{cards_str}
+{cards_str}"""
+    
+    def _build_category_list(self, categories: list) -> str:
+        categories_str = "\n".join([f"- {cat.name} (ID: {cat.id}, tipo: {cat.kind})" for cat in categories])
+        return f"""CATEGORIAS MAIS PROVÁVEIS:
+{categories_str}"""
+    
+    def _build_prompt(self, text: str, today: str, categories: str, prefix: str) -> List[BaseMessage]:
+        # parte variável (categorias do texto, data e texto) sempre depois do prefixo estável
+        return [
+            SystemMessage(prefix),
+            HumanMessage(f'{categories}\n\nData de hoje: {today}\n\nTexto: "{text}"'),
+        ]
 
-Extraia as seguintes informações e retorne APENAS um JSON válido (sem markdown):
 
-{{
-    "description": "descrição curta do gasto (máximo 30 caracteres) sempre com a inicial maiúscula",
-    "date": "data no formato YYYY-MM-DD",
-    "amount_cents": valor em centavos negativo,
-    "category_name": "nome da categoria mais apropriada da lista acima",
-    "payment_method": "cartão de crédito" ou "conta corrente" ou "dinheiro",
-    "card_name": "nome do cartão se mencionado",
-    "account_name": "nome da conta se mencionada"
-}}
+def _chat_model(model: str) -> ChatOpenAI:
+    return ChatOpenAI(
+        model=model,
+        temperature=0,
+        api_key=settings.openai_api_key,
+        max_retries=0,  # novas tentativas e prazo ficam com `self.resilience`
+    )
 
-Regras importantes:
-- Se valor não mencionado, use -1000 (R$ 10,00)
-- amount_cents SEMPRE NEGATIVO para despesa
-- date formato YYYY-MM-DD (use data mencionada ou hoje)
-- category_name deve ser uma das categorias da lista acima (escolha a mais apropriada)
-- payment_method: identifique se foi mencionado cartão, conta ou dinheiro
-- Se cartão mencionado, tente identificar qual na lista
-- Se conta mencionada, tente identificar qual na lista
-- NÃO inclua tags no JSON, elas serão adicionadas automaticamente
-"""
-    
-    def _parse_response(self, content: str) -> dict:
-        # Remove markdown se presente
-        if content.startswith('```'):
-            content = content.split('```')[1]
-            if content.startswith('json'):
-                content = content[4:]
-        
-        return json.loads(content.strip())
\ No newline at end of file
+
+def _raw_arguments(message) -> dict:
+    """Argumentos brutos da resposta (chamada de ferramenta ou texto JSON)"""
+    if message is None:
+        raise ValueError("resposta vazia")
+    if message.tool_calls:
+        data = message.tool_calls[0]['args']
+    elif message.invalid_tool_calls:
+        data = parse_json_text(message.invalid_tool_calls[0]['args'] or '')
+    else:
+        data = parse_json_text(message.content or '')
+    if not isinstance(data, dict):
+        raise ValueError("resposta não é um objeto JSON")
+    return data
+
+
+def _validate(schema: Type[BaseModel], data: dict) -> dict:
+    return schema.model_validate(data).model_dump()
@@ -0,0 +1,195 @@
+"""Corpus de extrações gravadas ("cassetes") para avaliar mudanças de prompt e de modelo.
+
+Com `EXTRACTION_CASSETTE_PATH`, cada extração feita pelo LLM vira uma linha
+JSON no arquivo:
+
+    {"version": 1, "recorded_at": ..., "model": ..., "today": "AAAA-MM-DD",
+     "transcript": ...,
+     "metadata": {"categories": [...], "accounts": [...], "credit_cards": [...]},
+     "responses": [{"content": ..., "tool_calls": [{"name": ..., "args": {...}}],
+                    "usage": {...}, "latency_ms": ...}],
+     "expected": {"description": ..., "date": ..., "amount_cents": ...,
+                  "category": ..., "card": ..., "account": ...}}
+
+`responses` guarda cada chamada ao modelo (mais de uma se a primeira
+resposta foi inválida). `expected` começa como o resultado gravado: corrija à
+mão as linhas em que o modelo errou e o corpus vira o gabarito usado por
+`benchmarks/replay_extraction.py`.
+
+Linhas escritas à mão (sem chamada real ao modelo) levam `"synthetic": true`,
+sem `recorded_at`/`model` e com `usage`/`latency_ms` nulos: servem para medir
+acurácia e o que roda localmente, nunca latência ou tokens do modelo.
+
+`ReplayLLM` reproduz as respostas gravadas no lugar do `ChatOpenAI`, sem rede.
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from langchain_core.messages import AIMessage
+from pydantic import ValidationError
+from ..models.expense import Account, Category, CreditCard, ExtractionContext, ExtractionResult
+
+logger = logging.getLogger(__name__)
+
+# Incrementar quando o formato da linha mudar
+CASSETTE_VERSION = 1
+
+
+class ReplayExhaustedError(Exception):
+    """O extrator pediu mais respostas do que as gravadas (ex.: prompt novo gerou nova tentativa)"""
+
+
+class CassetteRecorder:
+    """Acrescenta extrações ao corpus (JSONL); gravações com erro não afetam a extração"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def record(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False)
+        try:
+            await asyncio.to_thread(self._append, line)
+            self.recorded += 1
+        except OSError as e:
+            logger.warning(f"Falha ao gravar cassete em {self.path}: {e}")
+
+    def _append(self, line: str):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as file:
+            file.write(line + '\n')
+
+
+def response_record(message: Optional[AIMessage], latency_ms: float) -> dict:
+    """Resposta crua do modelo, no formato reproduzido por `ReplayLLM`"""
+    if message is None:
+        return {"content": "", "tool_calls": [], "usage": None, "latency_ms": round(latency_ms, 1)}
+    return {
+        "content": message.content if isinstance(message.content, str) else "",
+        "tool_calls": [{"name": call['name'], "args": call['args']} for call in message.tool_calls],
+        "usage": getattr(message, 'usage_metadata', None),
+        "latency_ms": round(latency_ms, 1),
+    }
+
+
+def build_entry(
+    transcript: str,
+    today: str,
+    context: ExtractionContext,
+    responses: List[dict],
+    result: ExtractionResult,
+    model: str,
+) -> dict:
+    return {
+        "version": CASSETTE_VERSION,
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "model": model,
+        "today": today,
+        "transcript": transcript,
+        "metadata": {
+            "categories": [vars(c) for c in context.categories],
+            "accounts": [vars(a) for a in context.accounts],
+            "credit_cards": [vars(c) for c in context.credit_cards],
+        },
+        "responses": responses,
+        "expected": expected_fields(result),
+    }
+
+
+def expected_fields(result: ExtractionResult) -> dict:
+    """Campos comparados na avaliação (categoria, cartão e conta por nome)"""
+    expense = result.expense
+    return {
+        "description": expense.description,
+        "date": expense.date,
+        "amount_cents": expense.amount_cents,
+        "category": result.category.name if result.category else None,
+        # cartão tem precedência, como no payload
+        "card": result.credit_card.name if result.credit_card else None,
+        "account": result.account.name if result.account and not result.credit_card else None,
+    }
+
+
+def load_corpus(path: str) -> List[dict]:
+    """Lê o corpus, ignorando linhas de outra versão do formato"""
+    entries = []
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get('version') != CASSETTE_VERSION:
+                logger.warning(f"{path}:{number}: versão {entry.get('version')} ignorada (esperada {CASSETTE_VERSION})")
+                continue
+            entries.append(entry)
+    return entries
+
+
+def metadata_from_entry(entry: dict) -> Tuple[List[Category], List[Account], List[CreditCard]]:
+    metadata = entry['metadata']
+    return (
+        [Category(**c) for c in metadata['categories']],
+        [Account(**a) for a in metadata['accounts']],
+        [CreditCard(**c) for c in metadata['credit_cards']],
+    )
+
+
+class ReplayLLM:
+    """Imita `ChatOpenAI` para a extração: devolve as respostas gravadas, em ordem.
+
+    `tokenizer` (o `ChatOpenAI` real) só é usado para contar os tokens do prompt.
+    """
+
+    def __init__(self, responses: Sequence[dict], tokenizer: Any = None):
+        self._responses = list(responses)
+        self.tokenizer = tokenizer
+        self.replayed_latency_ms = 0.0  # soma das latências gravadas das respostas já usadas
+
+    def get_num_tokens(self, text: str) -> int:
+        if self.tokenizer is None:
+            return len(text) // 4
+        return self.tokenizer.get_num_tokens(text)
+
+    def with_structured_output(self, schema, **kwargs):
+        return _ReplayStructured(self, schema)
+
+    def next_message(self) -> AIMessage:
+        if not self._responses:
+            raise ReplayExhaustedError("sem mais respostas gravadas")
+        response = self._responses.pop(0)
+        self.replayed_latency_ms += response.get('latency_ms') or 0.0
+        return AIMessage(
+            content=response.get('content') or "",
+            tool_calls=[
+                {"name": call['name'], "args": call['args'], "id": f"replay_{i}"}
+                for i, call in enumerate(response.get('tool_calls') or [])
+            ],
+            usage_metadata=response.get('usage'),
+        )
+
+
+class _ReplayStructured:
+    """Resultado no formato de `with_structured_output(..., include_raw=True)`"""
+
+    def __init__(self, llm: ReplayLLM, schema):
+        self.llm = llm
+        self.schema = schema
+
+    async def ainvoke(self, prompt) -> Dict[str, Any]:
+        message = self.llm.next_message()
+        parsed, error = None, None
+        if message.tool_calls:
+            try:
+                parsed = self.schema.model_validate(message.tool_calls[0]['args'])
+            except ValidationError as e:
+                error = e
+        else:
+            error = ValueError("resposta sem chamada de ferramenta")
+        return {"raw": message, "parsed": parsed, "parsing_error": error}
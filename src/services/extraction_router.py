@@ -0,0 +1,92 @@
+"""Roteamento da extração em camadas: parser local → modelo barato → modelo forte.
+
+Cada camada só é aceita se o resultado passar em `validate`; senão a próxima
+tenta. A última camada disponível é aceita mesmo com problemas (o usuário
+ainda vê o que foi extraído e pode corrigir no Organizze).
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from ..config.settings import settings
+from ..models.expense import ExtractionResult
+from .extraction_schema import DEFAULT_AMOUNT_CENTS
+
+LOCAL = 'local'
+CHEAP = 'cheap'
+STRONG = 'strong'
+TIERS = (LOCAL, CHEAP, STRONG)
+
+_DIGITS_RE = re.compile(r"\d")
+
+
+def validate(result: ExtractionResult, transcription: str, today: date, has_categories: bool) -> List[str]:
+    """Problemas do resultado (lista vazia = aceito): valor, data e categoria"""
+    problems = []
+    expense = result.expense
+
+    amount = expense.amount_cents
+    if not isinstance(amount, int) or amount >= 0:
+        problems.append('amount')
+    elif amount == DEFAULT_AMOUNT_CENTS and _DIGITS_RE.search(transcription):
+        # valor padrão ("não mencionado") com números no texto: valor provavelmente perdido
+        problems.append('amount')
+
+    try:
+        day = date.fromisoformat(expense.date)
+    except (TypeError, ValueError):
+        problems.append('date')
+    else:
+        oldest = today - timedelta(days=settings.routing_max_date_age_days)
+        # um dia de folga para o futuro: fuso do usuário vs. do servidor
+        if not oldest <= day <= today + timedelta(days=1):
+            problems.append('date')
+
+    # sem categorias (falha na API do Organizze) não há o que resolver
+    if has_categories and not expense.category_id:
+        problems.append('category')
+    return problems
+
+
+@dataclass
+class TierStats:
+    attempts: int = 0
+    accepted: int = 0
+    seconds: float = 0.0
+
+    def snapshot(self, extractions: int) -> dict:
+        return {
+            "attempts": self.attempts,
+            "accepted": self.accepted,
+            "hit_rate": round(self.accepted / self.attempts, 4) if self.attempts else None,
+            "share": round(self.accepted / extractions, 4) if extractions else None,
+            "avg_ms": round(self.seconds / self.attempts * 1000, 1) if self.attempts else None,
+        }
+
+
+class RoutingStats:
+    """Taxa de acerto e latência por camada, e motivos das escaladas"""
+
+    def __init__(self):
+        self.tiers: Dict[str, TierStats] = {tier: TierStats() for tier in TIERS}
+        self.escalations: Dict[str, Counter] = {tier: Counter() for tier in TIERS}
+        self.extractions = 0
+
+    def record(self, tier: str, seconds: float, accepted: bool):
+        stats = self.tiers[tier]
+        stats.attempts += 1
+        stats.seconds += seconds
+        if accepted:
+            stats.accepted += 1
+
+    def escalate(self, tier: str, problems: List[str]):
+        self.escalations[tier].update(problems)
+
+    def snapshot(self, strong_model: Optional[str]) -> dict:
+        return {
+            "extractions": self.extractions,
+            "strong_model": strong_model,
+            "tiers": {tier: stats.snapshot(self.extractions) for tier, stats in self.tiers.items()},
+            "escalation_reasons": {tier: dict(reasons) for tier, reasons in self.escalations.items() if reasons},
+        }
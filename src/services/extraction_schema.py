@@ -0,0 +1,189 @@
+"""Esquema de saída estruturada da extração e reparo local de respostas inválidas"""
+import json
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Literal, Optional, Sequence, Tuple, Type
+from pydantic import BaseModel, Field, create_model
+from .local_parser import digits_to_cents, parse_number_words
+from .text import fold, words
+
+PaymentMethod = Literal["cartão de crédito", "conta corrente", "dinheiro"]
+
+DEFAULT_AMOUNT_CENTS = -1000
+# Opção extra do enum quando só as categorias mais prováveis vão no esquema:
+# o modelo escreve em `other_category` a categoria fora da lista
+OTHER_CATEGORY = "Outra categoria"
+MAX_DESCRIPTION_LENGTH = 30
+
+_DATE_DMY_RE = re.compile(r"^(\d{1,2})[/.-](\d{1,2})(?:[/.-](\d{2,4}))?$")
+_AMOUNT_RE = re.compile(r"-?\d[\d.,]*")
+
+
+class ExpenseExtraction(BaseModel):
+    """Gasto extraído do texto (espelha `ExpenseData`, com nomes em vez de IDs)"""
+    description: str = Field(
+        description="Descrição curta do gasto (máximo 30 caracteres), com a inicial maiúscula",
+    )
+    date: str = Field(description="Data do gasto no formato YYYY-MM-DD (data mencionada ou hoje)")
+    amount_cents: int = Field(
+        description="Valor em centavos, SEMPRE negativo para despesa; -1000 se não mencionado",
+    )
+    category_name: Optional[str] = Field(
+        default=None, description="Categoria mais apropriada, exatamente como na lista",
+    )
+    other_category: Optional[str] = Field(
+        default=None, description=f"Só se category_name for '{OTHER_CATEGORY}': nome da categoria adequada",
+    )
+    payment_method: PaymentMethod = Field(description="Forma de pagamento mencionada")
+    card_name: Optional[str] = Field(default=None, description="Nome do cartão, se mencionado")
+    account_name: Optional[str] = Field(default=None, description="Nome da conta, se mencionada")
+
+
+@lru_cache(maxsize=256)
+def build_schema(category_names: Tuple[str, ...]) -> Type[ExpenseExtraction]:
+    """Esquema com `category_name` restrito (enum) às categorias dadas.
+
+    Com o ranking, são as mais prováveis para o texto mais `OTHER_CATEGORY`.
+    Cacheado pela tupla de nomes: o mesmo conjunto de categorias gera o mesmo
+    esquema (e a mesma definição de ferramenta enviada ao modelo).
+    """
+    if not category_names:
+        return ExpenseExtraction
+    return create_model(
+        "ExpenseExtraction",
+        __base__=ExpenseExtraction,
+        category_name=(
+            Optional[Literal[category_names]],
+            Field(default=None, description="Categoria mais apropriada, exatamente como na lista"),
+        ),
+    )
+
+
+def category_names(categories: Sequence) -> Tuple[str, ...]:
+    """Nomes únicos das categorias, na ordem da API"""
+    return tuple(dict.fromkeys(cat.name for cat in categories))
+
+
+def schema_category_names(suggested: Sequence, categories: Sequence) -> Tuple[str, ...]:
+    """Enum de `category_name`: as sugeridas, mais `OTHER_CATEGORY` se alguma ficou de fora"""
+    names = category_names(suggested)
+    expense_names = category_names([cat for cat in categories if cat.kind != 'revenue'])
+    if len(names) < len(expense_names):
+        names += (OTHER_CATEGORY,)
+    return names
+
+
+def parse_json_text(content: str) -> dict:
+    """Lê JSON de uma resposta em texto, tolerando markdown e texto em volta"""
+    content = content.strip()
+    if content.startswith('```'):
+        content = content.split('```')[1]
+        if content.startswith('json'):
+            content = content[4:]
+    try:
+        return json.loads(content.strip())
+    except json.JSONDecodeError:
+        start, end = content.find('{'), content.rfind('}')
+        if start == -1 or end <= start:
+            raise
+        return json.loads(content[start:end + 1])
+
+
+def repair(data: dict, names: Sequence[str], today: date) -> dict:
+    """Corrige localmente os erros comuns do modelo antes de tentar de novo.
+
+    Valor como texto (com dígitos ou por extenso) ou positivo, data fora do
+    formato, categoria com caixa ou acento diferente e forma de pagamento livre
+    são ajustados; campos que não dá para salvar recebem o padrão do prompt.
+    """
+    repaired = dict(data)
+
+    description = str(repaired.get('description') or 'Gasto').strip() or 'Gasto'
+    repaired['description'] = (description[0].upper() + description[1:])[:MAX_DESCRIPTION_LENGTH]
+
+    repaired['date'] = _repair_date(repaired.get('date'), today)
+    repaired['amount_cents'] = _repair_amount(repaired.get('amount_cents'))
+    category = repaired.get('category_name')
+    repaired['category_name'] = _repair_category(category, names)
+    other = repaired.get('other_category')
+    if category and repaired['category_name'] is None and OTHER_CATEGORY in names:
+        # categoria fora do enum: vira "outra" e é resolvida na lista completa
+        repaired['category_name'] = OTHER_CATEGORY
+        other = other or category
+    repaired['other_category'] = (str(other).strip() or None) if other else None
+    repaired['payment_method'] = _repair_payment(repaired.get('payment_method'))
+
+    for key in ('card_name', 'account_name'):
+        value = repaired.get(key)
+        repaired[key] = (str(value).strip() or None) if value else None
+    return repaired
+
+
+def _repair_date(value, today: date) -> str:
+    text = str(value or '').strip()
+    try:
+        return datetime.strptime(text[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+
+    match = _DATE_DMY_RE.match(text)
+    if match:
+        day, month, year = match.groups()
+        year = int(year) if year else today.year
+        if year < 100:
+            year += 2000
+        try:
+            return date(year, int(month), int(day)).isoformat()
+        except ValueError:
+            pass
+    return today.isoformat()
+
+
+def _repair_amount(value) -> int:
+    if isinstance(value, bool) or value is None:
+        return DEFAULT_AMOUNT_CENTS
+    if isinstance(value, (int, float)):
+        cents = int(round(value))
+    else:
+        match = _AMOUNT_RE.search(str(value))
+        if match:
+            number = match.group().lstrip('-')
+            cents = int(number) if number.isdigit() else digits_to_cents(number)
+        else:
+            # por extenso: "cento e oitenta reais"
+            cents = _amount_from_words(str(value))
+    if cents == 0:
+        return DEFAULT_AMOUNT_CENTS
+    return -abs(cents)
+
+
+def _amount_from_words(text: str) -> int:
+    tokens = words(text)
+    for start in range(len(tokens)):
+        value, _ = parse_number_words(tokens, start)
+        if value is not None:
+            return value * 100
+    return 0
+
+
+def _repair_category(value, names: Sequence[str]) -> Optional[str]:
+    if not value or not names:
+        return value or None
+    if value in names:
+        return value
+    folded = fold(str(value)).strip()
+    for name in names:
+        if fold(name) == folded:
+            return name
+    partial = [name for name in names if folded in fold(name) or fold(name) in folded]
+    return partial[0] if len(partial) == 1 else None
+
+
+def _repair_payment(value) -> str:
+    folded = fold(str(value or ''))
+    if 'cart' in folded or 'credito' in folded:
+        return "cartão de crédito"
+    if 'dinheiro' in folded or 'especie' in folded:
+        return "dinheiro"
+    return "conta corrente"
@@ -0,0 +1,451 @@
+"""Parser local (regras) para frases simples de gasto, dispensando o LLM.
+
+Cobre os casos mais comuns, como "gastei 50 reais no mercado hoje no cartão
+Nubank": valor (dígitos ou por extenso), datas relativas, forma de pagamento e
+categoria/conta/cartão pelos nomes já carregados do Organizze. Cada resultado
+traz uma confiança; abaixo do limite configurado a extração segue para o LLM.
+"""
+import calendar
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from ..models.expense import Account, Category, CreditCard, ExpenseData, ExtractionContext
+from .text import fold, words
+
+UNITS = {
+    "zero": 0, "um": 1, "uma": 1, "dois": 2, "duas": 2, "tres": 3, "quatro": 4,
+    "cinco": 5, "seis": 6, "sete": 7, "oito": 8, "nove": 9, "dez": 10, "onze": 11,
+    "doze": 12, "treze": 13, "quatorze": 14, "catorze": 14, "quinze": 15,
+    "dezesseis": 16, "dezessete": 17, "dezoito": 18, "dezenove": 19,
+}
+TENS = {
+    "vinte": 20, "trinta": 30, "quarenta": 40, "cinquenta": 50, "sessenta": 60,
+    "setenta": 70, "oitenta": 80, "noventa": 90,
+}
+HUNDREDS = {
+    "cem": 100, "cento": 100, "duzentos": 200, "duzentas": 200, "trezentos": 300,
+    "trezentas": 300, "quatrocentos": 400, "quatrocentas": 400, "quinhentos": 500,
+    "quinhentas": 500, "seiscentos": 600, "seiscentas": 600, "setecentos": 700,
+    "setecentas": 700, "oitocentos": 800, "oitocentas": 800, "novecentos": 900,
+    "novecentas": 900,
+}
+CURRENCY_WORDS = {"real", "reais", "conto", "contos", "pila", "pilas"}
+
+WEEKDAYS = {"segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6}
+MONTHS = {
+    "janeiro": 1, "fevereiro": 2, "marco": 3, "abril": 4, "maio": 5, "junho": 6, "julho": 7,
+    "agosto": 8, "setembro": 9, "outubro": 10, "novembro": 11, "dezembro": 12,
+}
+
+CREDIT_WORDS = {"cartao", "credito"}
+ACCOUNT_WORDS = {"debito", "pix", "boleto", "transferencia", "conta"}
+CASH_WORDS = {"dinheiro", "especie"}
+
+# Frases que o parser não trata com segurança: receitas, parcelamentos, vários itens
+UNSUPPORTED_WORDS = {
+    "recebi", "ganhei", "salario", "receita", "reembolso", "estorno", "parcelado",
+    "parcelas", "parcela", "vezes", "transferi", "emprestei", "devolvi",
+}
+
+# Frases em que o valor dito pode não ser o lançado (divisão, valor por item,
+# parcelas): o parser ainda tenta, mas com confiança abaixo do limite
+AMBIGUOUS_WORDS = {
+    "dividi", "dividimos", "dividido", "dividida", "divide", "rachei", "rachamos", "rachado",
+    "metade", "cada", "parcelei", "parcelou", "entrada", "troco", "desconto",
+}
+
+# Palavra-chave -> trechos de nomes de categoria prováveis (em ordem de preferência)
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "mercado": ["mercado", "supermercado", "alimentacao"],
+    "supermercado": ["supermercado", "mercado", "alimentacao"],
+    "feira": ["feira", "mercado", "alimentacao"],
+    "padaria": ["padaria", "alimentacao", "lanche"],
+    "acougue": ["acougue", "mercado", "alimentacao"],
+    "restaurante": ["restaurante", "alimentacao"],
+    "almoco": ["restaurante", "alimentacao"],
+    "jantar": ["restaurante", "alimentacao"],
+    "lanche": ["lanche", "restaurante", "alimentacao"],
+    "cafe": ["cafe", "lanche", "alimentacao"],
+    "pizza": ["delivery", "restaurante", "alimentacao"],
+    "ifood": ["delivery", "restaurante", "alimentacao"],
+    "delivery": ["delivery", "restaurante", "alimentacao"],
+    "uber": ["transporte", "uber"],
+    "taxi": ["transporte", "taxi"],
+    "onibus": ["transporte"],
+    "metro": ["transporte"],
+    "gasolina": ["combustivel", "transporte", "carro"],
+    "combustivel": ["combustivel", "transporte", "carro"],
+    "posto": ["combustivel", "transporte", "carro"],
+    "estacionamento": ["estacionamento", "transporte", "carro"],
+    "pedagio": ["transporte", "carro"],
+    "farmacia": ["farmacia", "saude"],
+    "remedio": ["farmacia", "saude"],
+    "medico": ["saude"],
+    "consulta": ["saude"],
+    "dentista": ["saude"],
+    "academia": ["academia", "esporte", "saude"],
+    "aluguel": ["aluguel", "moradia", "casa"],
+    "condominio": ["condominio", "moradia", "casa"],
+    "luz": ["luz", "energia", "moradia", "contas"],
+    "energia": ["energia", "luz", "moradia", "contas"],
+    "agua": ["agua", "moradia", "contas"],
+    "internet": ["internet", "moradia", "contas"],
+    "celular": ["celular", "telefone", "contas"],
+    "netflix": ["assinatura", "streaming", "lazer"],
+    "spotify": ["assinatura", "streaming", "lazer"],
+    "cinema": ["lazer", "cinema"],
+    "bar": ["bar", "lazer"],
+    "cerveja": ["bar", "lazer"],
+    "roupa": ["roupa", "vestuario", "compras"],
+    "roupas": ["roupa", "vestuario", "compras"],
+    "sapato": ["vestuario", "roupa", "compras"],
+    "presente": ["presente", "compras"],
+    "escola": ["educacao", "escola"],
+    "curso": ["educacao", "curso"],
+    "livro": ["educacao", "livro", "lazer"],
+    "pet": ["pet", "animal"],
+    "racao": ["pet", "animal"],
+    "veterinario": ["pet", "animal", "saude"],
+    "cabelo": ["beleza", "cuidados pessoais"],
+    "salao": ["beleza", "cuidados pessoais"],
+    "viagem": ["viagem", "lazer"],
+    "hotel": ["viagem", "hospedagem"],
+    "passagem": ["viagem", "transporte"],
+}
+
+# Palavras genéricas que não identificam uma conta/cartão específico ("Itaú Poupança" -> itau)
+GENERIC_NAME_WORDS = {"conta", "corrente", "poupanca", "cartao", "credito", "debito", "banco", "de", "do", "da"}
+# Nomes só com palavras genéricas ("Conta Corrente", "Poupança"): o tipo da conta é o que os distingue
+PAYMENT_NAME_WORDS = {"conta", "cartao", "credito", "debito", "banco", "de", "do", "da"}
+
+_DIGIT_AMOUNT_RE = re.compile(
+    r"(?P<prefix>r\$\s*)?"
+    r"(?P<number>\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+,\d{1,2}|\d+\.\d{1,2}(?!\d)|\d+)"
+    r"(?:\s*(?P<suffix>reais|real|contos?|pilas?)"
+    r"(?:\s*e\s*(?P<cents>\d{1,2})\s*centavos?)?)?"
+)
+_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b")
+
+
+@dataclass
+class ParseResult:
+    expense: ExpenseData
+    confidence: float
+    category: Optional[Category] = None
+    account: Optional[Account] = None
+    credit_card: Optional[CreditCard] = None
+
+
+class LocalExpenseParser:
+    """Extrai um gasto de frases simples por regras; retorna None quando não dá"""
+
+    def parse(self, text: str, context: ExtractionContext, today: date) -> Optional[ParseResult]:
+        folded = fold(text)
+        tokens = words(text)
+        if not tokens or UNSUPPORTED_WORDS.intersection(tokens):
+            return None
+
+        amount = parse_amount(folded, tokens)
+        if amount is None:
+            return None
+        amount_cents, explicit_currency = amount
+
+        expense_date = parse_date(folded, tokens, today) or today
+        category, category_score, keyword = match_category(tokens, context.categories)
+        payment, payment_resolved = match_payment(tokens, context)
+        description = _description(text, keyword, category)
+
+        # só a frase completa (valor com moeda, categoria clara, forma de
+        # pagamento identificada) chega a 1.0; faltando uma parte fica abaixo de 0.8
+        confidence = 0.4 if explicit_currency else 0.2
+        if category_score >= 0.8:
+            confidence += 0.3
+        elif category_score > 0:
+            confidence += 0.05
+        if description:
+            confidence += 0.05
+        if payment_resolved:
+            confidence += 0.25
+        if AMBIGUOUS_WORDS.intersection(tokens):
+            confidence -= 0.4
+
+        expense = ExpenseData(
+            description=description or "Gasto",
+            date=expense_date.strftime('%Y-%m-%d'),
+            amount_cents=-abs(amount_cents),
+            category_id=category.id if category else None,
+        )
+        result = ParseResult(expense=expense, confidence=round(min(max(confidence, 0.0), 1.0), 2), category=category)
+        if isinstance(payment, CreditCard):
+            expense.credit_card_id = payment.id
+            result.credit_card = payment
+        elif isinstance(payment, Account):
+            expense.account_id = payment.id
+            result.account = payment
+        return result
+
+
+def parse_amount(folded: str, tokens: List[str]) -> Optional[Tuple[int, bool]]:
+    """Valor em centavos e se veio com moeda explícita (R$, reais); None se ausente/ambíguo"""
+    explicit = set()
+    bare = set()
+
+    for match in _DIGIT_AMOUNT_RE.finditer(folded):
+        has_currency = bool(match.group("prefix") or match.group("suffix"))
+        before = folded[:match.start()].rstrip()
+        after = folded[match.end():]
+        if not has_currency and (
+            before.endswith(("dia", "/")) or after.startswith(("/", "h", "x", " x ", " vezes", " de "))
+        ):
+            # "dia 15", "15/03/2025", "10h", "3x", "2 de março": não é valor
+            continue
+        cents = digits_to_cents(match.group("number"))
+        if match.group("cents"):
+            cents += int(match.group("cents"))
+        if has_currency:
+            explicit.add(cents)
+        else:
+            bare.add(cents)
+
+    explicit.update(_word_amounts(tokens))
+
+    if len(explicit) == 1:
+        return explicit.pop(), True
+    if not explicit and len(bare) == 1:
+        return bare.pop(), False
+    return None
+
+
+def digits_to_cents(number: str) -> int:
+    if "," in number:
+        integer, decimal = number.replace(".", "").split(",")
+        return int(integer) * 100 + int(decimal.ljust(2, "0"))
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+", number):
+        return int(number.replace(".", "")) * 100
+    if "." in number:
+        integer, decimal = number.split(".")
+        return int(integer) * 100 + int(decimal.ljust(2, "0"))
+    return int(number) * 100
+
+
+def parse_number_words(tokens: List[str], start: int) -> Tuple[Optional[int], int]:
+    """Lê um número por extenso a partir de `start` ("mil e duzentos e cinquenta")"""
+    total = current = 0
+    i = start
+    consumed = False
+    while i < len(tokens):
+        token = tokens[i]
+        if token in UNITS:
+            current += UNITS[token]
+        elif token in TENS:
+            current += TENS[token]
+        elif token in HUNDREDS:
+            current += HUNDREDS[token]
+        elif token == "mil":
+            total += (current or 1) * 1000
+            current = 0
+        elif token == "e" and consumed and i + 1 < len(tokens) and _is_number_word(tokens[i + 1]):
+            i += 1
+            continue
+        else:
+            break
+        consumed = True
+        i += 1
+    return (total + current if consumed else None), i
+
+
+def _is_number_word(token: str) -> bool:
+    return token in UNITS or token in TENS or token in HUNDREDS or token == "mil"
+
+
+def _word_amounts(tokens: List[str]) -> List[int]:
+    """Valores por extenso seguidos de moeda: "cinquenta e dois reais (e dez centavos)" """
+    amounts = []
+    i = 0
+    while i < len(tokens):
+        if not _is_number_word(tokens[i]):
+            i += 1
+            continue
+        value, end = parse_number_words(tokens, i)
+        if value is not None and end < len(tokens) and tokens[end] in CURRENCY_WORDS:
+            cents = value * 100
+            # "... reais e cinquenta centavos"
+            if end + 2 < len(tokens) and tokens[end + 1] == "e":
+                extra, extra_end = parse_number_words(tokens, end + 2)
+                if extra is not None and extra < 100 and extra_end < len(tokens) and tokens[extra_end].startswith("centavo"):
+                    cents += extra
+                    end = extra_end
+            amounts.append(cents)
+        i = max(end, i + 1)
+    return amounts
+
+
+def parse_date(folded: str, tokens: List[str], today: date) -> Optional[date]:
+    """Datas relativas e explícitas: hoje, ontem, anteontem, dia 15, 15/03, sexta passada"""
+    if "anteontem" in tokens:
+        return today - timedelta(days=2)
+    if "ontem" in tokens:
+        return today - timedelta(days=1)
+
+    match = _DATE_RE.search(folded)
+    if match:
+        day, month = int(match.group(1)), int(match.group(2))
+        year = int(match.group(3)) if match.group(3) else today.year
+        if year < 100:
+            year += 2000
+        return _safe_date(year, month, day, today, roll_back=not match.group(3))
+
+    for i, token in enumerate(tokens[:-1]):
+        if token != "dia":
+            continue
+        following = tokens[i + 1]
+        if following.isdigit():
+            day, end = int(following), i + 2
+        elif following == "primeiro":
+            day, end = 1, i + 2
+        else:
+            day, end = parse_number_words(tokens, i + 1)
+            if day is None:
+                continue
+        month = today.month
+        if end + 1 < len(tokens) and tokens[end] == "de" and tokens[end + 1] in MONTHS:
+            month = MONTHS[tokens[end + 1]]
+        return _safe_date(today.year, month, day, today, roll_back=True)
+
+    for i, token in enumerate(tokens):
+        if token not in WEEKDAYS:
+            continue
+        previous = tokens[i - 1] if i > 0 else ""
+        following = tokens[i + 1:i + 3]
+        # "segunda" também é ordinal: exige contexto de dia da semana
+        if previous not in ("na", "no", "nesta", "nessa", "ultima", "ultimo", "de") and not (
+            {"feira", "passada", "passado"} & set(following)
+        ):
+            continue
+        delta = (today.weekday() - WEEKDAYS[token]) % 7
+        if delta == 0 and ({"passada", "passado"} & set(following) or previous in ("ultima", "ultimo")):
+            delta = 7
+        return today - timedelta(days=delta)
+
+    if "hoje" in tokens:
+        return today
+    return None
+
+
+def _safe_date(year: int, month: int, day: int, today: date, roll_back: bool) -> Optional[date]:
+    if not 1 <= month <= 12:
+        return None
+    try:
+        result = date(year, month, day)
+    except ValueError:
+        return None
+    if roll_back and result > today:
+        # "dia 20" dito no dia 15 se refere ao mês (ou ano) anterior
+        if month == today.month and year == today.year:
+            month, year = (12, year - 1) if month == 1 else (month - 1, year)
+            day = min(day, calendar.monthrange(year, month)[1])
+            return date(year, month, day)
+        return _safe_date(year - 1, month, day, today, roll_back=False)
+    return result
+
+
+def match_category(tokens: List[str], categories: List[Category]) -> Tuple[Optional[Category], float, Optional[str]]:
+    """Melhor categoria de despesa para o texto: (categoria, score, palavra-chave usada).
+
+    Palavras-chave de gasto ("uber" -> Transporte) valem mais que o nome da
+    categoria citado de passagem ("uber pra casa" não é Casa).
+    """
+    token_set = set(tokens)
+    best: Tuple[Optional[Category], float, Optional[str]] = (None, 0.0, None)
+    tie = False
+
+    for category in categories:
+        if category.kind == "revenue":
+            continue
+        name = fold(category.name)
+        name_words = [w for w in words(category.name) if len(w) > 2]
+        if not name_words:
+            continue
+
+        score, keyword = 0.0, None
+        for token in tokens:
+            hints = CATEGORY_KEYWORDS.get(token)
+            if not hints:
+                continue
+            for rank, hint in enumerate(hints):
+                if hint in name:
+                    candidate = 1.0 - 0.05 * rank
+                    if candidate > score:
+                        score, keyword = candidate, token
+                    break
+        overlap = sum(1 for w in name_words if w in token_set) / len(name_words)
+        # nome inteiro citado: abaixo da palavra-chave principal de outra categoria
+        name_score = 0.85 if overlap == 1 else 0.6 * overlap
+        if name_score > score:
+            score, keyword = name_score, next(w for w in name_words if w in token_set)
+
+        if score > best[1]:
+            best, tie = (category, score, keyword), False
+        elif score and score == best[1]:
+            tie = True
+
+    if tie:
+        # duas categorias igualmente prováveis: deixa o LLM decidir
+        return None, 0.0, best[2]
+    return best
+
+
+def match_payment(tokens: List[str], context: ExtractionContext):
+    """Conta ou cartão mencionado: (objeto ou None, se a forma de pagamento ficou clara)"""
+    token_set = set(tokens)
+    wants_credit = bool(CREDIT_WORDS & token_set) and "debito" not in token_set
+    wants_account = bool((ACCOUNT_WORDS | CASH_WORDS) & token_set)
+
+    card = _match_named(token_set, context.credit_cards)
+    account = _match_named(token_set, context.accounts)
+
+    if card and (wants_credit or not (account or wants_account)):
+        return card, True
+    if account and not wants_credit:
+        return account, True
+    if wants_credit:
+        # cartão sem nome: usa o primeiro, como o fluxo do LLM
+        return (context.credit_cards[0] if context.credit_cards else None), len(context.credit_cards) == 1
+    if wants_account or not (CREDIT_WORDS & token_set):
+        # conta padrão: palpite, não identificação (o LLM decide)
+        return (context.accounts[0] if context.accounts else None), False
+    return None, False
+
+
+def _match_named(token_set, items):
+    """Item cujo nome tem mais palavras citadas no texto ("cartão itaú" -> "Itaú Platinum")"""
+    best, best_score, tie = None, 0, False
+    for item in items:
+        name_words = _identifying_words(item.name)
+        score = sum(1 for w in name_words if w in token_set)
+        if score > best_score:
+            best, best_score, tie = item, score, False
+        elif score and score == best_score:
+            tie = True
+    return None if tie else best
+
+
+def _identifying_words(name: str) -> List[str]:
+    """Palavras do nome que o identificam: sem as genéricas, se sobrar alguma"""
+    name_words = words(name)
+    for generic in (GENERIC_NAME_WORDS, PAYMENT_NAME_WORDS):
+        specific = [w for w in name_words if w not in generic]
+        if specific:
+            return specific
+    return name_words
+
+
+def _description(text: str, keyword: Optional[str], category: Optional[Category]) -> Optional[str]:
+    if keyword:
+        for word in re.findall(r"\w+", text):
+            if fold(word) == keyword:
+                return word[:30].capitalize()
+    if category:
+        return category.name[:30]
+    return None
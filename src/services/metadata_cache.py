@@ -0,0 +1,181 @@
+"""Cache compartilhado de metadados do Organizze (categorias, contas, cartões)"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class _Entry:
+    value: Any = None
+    has_value: bool = False
+    version: int = 0
+    fetched_at: float = 0.0
+    failures: int = 0
+    retry_after: float = 0.0
+    last_error: Optional[str] = None
+    inflight: Optional[asyncio.Task] = None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    negative_hits: int = 0
+    coalesced: int = 0
+    refreshes: int = 0
+    refresh_errors: int = 0
+
+
+@dataclass
+class MetadataCache:
+    """Cache em memória, único por processo, com TTL e revalidação em background.
+
+    - Dentro do TTL o valor é servido direto (hit).
+    - Entre o TTL e `ttl + stale_ttl` o valor antigo é servido e uma atualização
+      é disparada em background (stale-while-revalidate).
+    - Falhas são cacheadas com backoff exponencial: enquanto durar o backoff não
+      há nova chamada à API e o último valor conhecido (se houver) é servido.
+    - Misses concorrentes da mesma chave compartilham uma única busca (single-flight).
+    """
+    ttl: float
+    stale_ttl: float
+    error_backoff: float
+    error_backoff_max: float
+    clock: Callable[[], float] = time.monotonic
+    stats: CacheStats = field(default_factory=CacheStats)
+    _entries: Dict[str, _Entry] = field(default_factory=dict)
+    _background: Set[asyncio.Task] = field(default_factory=set)
+
+    async def get(self, key: str, loader: Loader, force_refresh: bool = False) -> Any:
+        """Retorna o valor da chave, buscando com `loader` quando necessário"""
+        entry = self._entries.setdefault(key, _Entry())
+        now = self.clock()
+
+        if not force_refresh and entry.has_value:
+            age = now - entry.fetched_at
+            if age < self.ttl:
+                self.stats.hits += 1
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stats.hits += 1
+                self.stats.stale_hits += 1
+                if now >= entry.retry_after:
+                    self._refresh_in_background(key, entry, loader)
+                return entry.value
+
+        if not force_refresh and now < entry.retry_after:
+            # Falha recente: não martela a API durante o backoff
+            self.stats.negative_hits += 1
+            if entry.has_value:
+                return entry.value
+            raise MetadataUnavailableError(key, entry.last_error)
+
+        self.stats.misses += 1
+        try:
+            return await self._refresh(key, entry, loader)
+        except Exception:
+            if entry.has_value:
+                logger.warning(f"Usando {key} em cache após falha na atualização")
+                return entry.value
+            raise
+
+    def version(self, key: str) -> int:
+        """Versão atual da chave (incrementa a cada atualização com conteúdo novo)"""
+        entry = self._entries.get(key)
+        return entry.version if entry else 0
+
+    def invalidate(self, key: Optional[str] = None):
+        """Força nova busca na próxima leitura (de uma chave ou de todas)"""
+        keys = [key] if key else list(self._entries)
+        for k in keys:
+            entry = self._entries.get(k)
+            if entry:
+                entry.fetched_at = float('-inf')
+                entry.retry_after = 0.0
+
+    def snapshot(self) -> dict:
+        """Contadores e estado das chaves, para exposição em endpoints de diagnóstico"""
+        now = self.clock()
+        lookups = self.stats.hits + self.stats.misses + self.stats.negative_hits
+        return {
+            **self.stats.__dict__,
+            "hit_rate": round(self.stats.hits / lookups, 4) if lookups else None,
+            "keys": {
+                key: {
+                    "version": entry.version,
+                    "age_seconds": round(now - entry.fetched_at, 1) if entry.has_value else None,
+                    "failures": entry.failures,
+                    "last_error": entry.last_error,
+                }
+                for key, entry in self._entries.items()
+            },
+        }
+
+    async def _refresh(self, key: str, entry: _Entry, loader: Loader) -> Any:
+        if entry.inflight is None:
+            entry.inflight = asyncio.create_task(self._load(key, entry, loader))
+        else:
+            self.stats.coalesced += 1
+        # shield: cancelar quem espera não cancela a busca compartilhada
+        return await asyncio.shield(entry.inflight)
+
+    def _refresh_in_background(self, key: str, entry: _Entry, loader: Loader):
+        if entry.inflight is not None:
+            return
+        task = asyncio.create_task(self._refresh(key, entry, loader))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Falha na atualização em background: {task.exception()}")
+
+    async def _load(self, key: str, entry: _Entry, loader: Loader) -> Any:
+        try:
+            value = await loader()
+        except Exception as e:
+            entry.failures += 1
+            entry.last_error = str(e)
+            backoff = min(self.error_backoff * 2 ** (entry.failures - 1), self.error_backoff_max)
+            entry.retry_after = self.clock() + backoff
+            self.stats.refresh_errors += 1
+            logger.error(f"Erro ao atualizar {key}; nova tentativa em {backoff:.1f}s: {e}")
+            raise
+        else:
+            if not entry.has_value or value != entry.value:
+                entry.version += 1
+            entry.value = value
+            entry.has_value = True
+            entry.fetched_at = self.clock()
+            entry.failures = 0
+            entry.retry_after = 0.0
+            entry.last_error = None
+            self.stats.refreshes += 1
+            return value
+        finally:
+            entry.inflight = None
+
+
+class MetadataUnavailableError(Exception):
+    """Metadado indisponível: sem valor em cache e a API está em backoff"""
+
+    def __init__(self, key: str, last_error: Optional[str]):
+        super().__init__(f"{key} indisponível (último erro: {last_error})")
+        self.key = key
+
+
+metadata_cache = MetadataCache(
+    ttl=settings.metadata_cache_ttl,
+    stale_ttl=settings.metadata_cache_stale_ttl,
+    error_backoff=settings.metadata_error_backoff,
+    error_backoff_max=settings.metadata_error_backoff_max,
+)
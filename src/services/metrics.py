@@ -0,0 +1,71 @@
+"""Métricas Prometheus (servidas em `/metrics`).
+
+- `expense_bot_stage_seconds{stage}`: duração de cada etapa de um áudio
+  (download, preprocess, transcribe, load_metadata, extract, send) e de ponta
+  a ponta (`end_to_end`: do início do processamento até a resposta no chat);
+- `expense_bot_stage_errors_total{stage}`: falhas por etapa;
+- `expense_bot_outbound_seconds{dependency,outcome}`: cada tentativa de
+  chamada externa (Whisper, modelo, Organizze), com `ok`, `error` ou `timeout`;
+- `expense_bot_outbound_retries_total{dependency}` e
+  `expense_bot_circuit_breaker_state{dependency}` (0 fechado, 1 meio-aberto, 2 aberto);
+- `expense_bot_update_queue{state}`: updates aguardando (`waiting`) e em
+  execução (`in_progress`), para dimensionar a concorrência.
+
+Registrar uma observação custa alguns microssegundos (sem I/O); o texto só
+é montado quando o Prometheus consulta o endpoint.
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Segundos: de leituras em cache (ms) a áudios longos no Whisper (minutos)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+STAGE_SECONDS = Histogram(
+    'expense_bot_stage_seconds', 'Duração das etapas do processamento de um áudio',
+    ['stage'], buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter('expense_bot_stage_errors', 'Falhas por etapa do processamento', ['stage'])
+OUTBOUND_SECONDS = Histogram(
+    'expense_bot_outbound_seconds', 'Duração de cada tentativa de chamada a serviços externos',
+    ['dependency', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_RETRIES = Counter('expense_bot_outbound_retries', 'Novas tentativas de chamadas externas', ['dependency'])
+BREAKER_STATE = Gauge(
+    'expense_bot_circuit_breaker_state', 'Estado do circuit breaker (0 fechado, 1 meio-aberto, 2 aberto)',
+    ['dependency'],
+)
+UPDATE_QUEUE = Gauge('expense_bot_update_queue', 'Updates na fila (aguardando ou em execução)', ['state'])
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Mede a etapa; exceções contam como falha da etapa e seguem adiante"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def observe_outbound(dependency: str, outcome: str, seconds: float):
+    OUTBOUND_SECONDS.labels(dependency, outcome).observe(seconds)
+
+
+def track_gauge(gauge: Gauge, label: str, read: Callable[[], float]):
+    """Valor lido na hora da coleta (sem custo no caminho do update)"""
+    gauge.labels(label).set_function(read)
+
+
+def render() -> bytes:
+    return generate_latest()
@@ -0,0 +1,122 @@
+"""Índice de nomes (categorias, contas, cartões) para busca sem caixa e sem acentos"""
+from collections import Counter, defaultdict
+from typing import Dict, Generic, List, Optional, Sequence, Set, TypeVar
+from .text import words
+
+T = TypeVar('T')
+
+# Score mínimo para aceitar uma correspondência aproximada
+MIN_SCORE = 0.35
+# Peso das palavras vs. trigramas (que toleram erros de grafia)
+TOKEN_WEIGHT = 0.6
+TRIGRAM_WEIGHT = 0.4
+# Prefixo comum que iguala duas palavras ("viagens" ~ "viagem", "pet" ~ "pets")
+STEM_LENGTH = 5
+# Buscas já resolvidas guardadas por índice (o LLM repete os nomes da lista)
+MEMO_SIZE = 1024
+# Itens (por trigramas em comum) pontuados numa busca aproximada
+MAX_CANDIDATES = 16
+
+
+class NameIndex(Generic[T]):
+    """Índice construído uma vez por lista de itens (objetos com `.name`).
+
+    - Nome normalizado idêntico: dicionário, O(1).
+    - Senão: candidatos que compartilham palavras ou trigramas com a busca,
+      pontuados por sobreposição; vence o maior score (empates: nome mais
+      curto, depois a ordem da API), então o resultado é sempre o mesmo.
+    """
+
+    def __init__(self, items: Sequence[T]):
+        self.items = items
+        self._exact: Dict[str, int] = {}
+        self._tokens: List[Set[str]] = []
+        self._trigrams: List[Set[str]] = []
+        self._by_token: Dict[str, Set[int]] = defaultdict(set)
+        self._by_trigram: Dict[str, Set[int]] = defaultdict(set)
+        self._memo: Dict[str, Optional[int]] = {}
+
+        for index, item in enumerate(items):
+            tokens = words(item.name)
+            key = ' '.join(tokens)
+            self._exact.setdefault(key, index)
+
+            token_set = set(tokens)
+            trigram_set = _trigrams(key)
+            self._tokens.append(token_set)
+            self._trigrams.append(trigram_set)
+            for token in token_set:
+                self._by_token[token].add(index)
+            for trigram in trigram_set:
+                self._by_trigram[trigram].add(index)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def find(self, name: str) -> Optional[T]:
+        if not name:
+            return None
+        if name in self._memo:
+            index = self._memo[name]
+        else:
+            index = self._search(name)
+            if len(self._memo) < MEMO_SIZE:
+                self._memo[name] = index
+        return None if index is None else self.items[index]
+
+    def _search(self, name: str) -> Optional[int]:
+        tokens = words(name)
+        key = ' '.join(tokens)
+        index = self._exact.get(key)
+        if index is not None:
+            return index
+
+        token_set = set(tokens)
+        trigram_set = _trigrams(key)
+
+        # trigramas em comum por item, contados pelas listas invertidas
+        shared: Counter = Counter()
+        for trigram in trigram_set:
+            shared.update(self._by_trigram.get(trigram, ()))
+        # só os itens com mais trigramas em comum (e os que têm palavra igual) são pontuados
+        candidates = {index for index, _ in shared.most_common(MAX_CANDIDATES)}
+        for token in token_set:
+            candidates |= self._by_token.get(token, set())
+
+        best, best_key = None, None
+        for candidate in candidates:
+            dice = 2 * shared[candidate] / (len(trigram_set) + len(self._trigrams[candidate]))
+            score = (
+                TOKEN_WEIGHT * _overlap(token_set, self._tokens[candidate])
+                + TRIGRAM_WEIGHT * dice
+            )
+            rank = (-score, len(self.items[candidate].name), candidate)
+            if best_key is None or rank < best_key:
+                best, best_key = candidate, rank
+
+        if best is None or -best_key[0] < MIN_SCORE:
+            return None
+        return best
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _overlap(query: Set[str], name: Set[str]) -> float:
+    """Fração das palavras da busca presentes no nome, com leve penalidade para
+    palavras sobrando no nome ("itaú" prefere "Itaú" a "Conta Itaú")"""
+    if not query or not name:
+        return 0.0
+    matched = sum(1 for word in query if any(_same_word(word, other) for other in name))
+    return matched / len(query) * (0.75 + 0.25 * min(matched, len(name)) / len(name))
+
+
+def _same_word(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if min(len(a), len(b)) < 3:
+        return False
+    return a.startswith(b) or b.startswith(a) or a[:STEM_LENGTH] == b[:STEM_LENGTH] and len(a) >= STEM_LENGTH
+
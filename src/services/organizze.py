@@ -1,12 +1,49 @@
 """Cliente da API Organizze"""
 import logging
-import requests
-from typing import List, Optional
+import httpx
+from typing import Dict, List, Optional, Sequence
 from ..config.settings import settings
 from ..models.expense import ExpenseData, Category, Account, CreditCard
+from .metadata_cache import metadata_cache
+from .name_index import NameIndex
+from .resilience import dependency
 
 logger = logging.getLogger(__name__)
 
+# Cliente HTTP compartilhado pelo processo (pool de conexões com keep-alive)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Retorna o cliente HTTP compartilhado, criando-o sob demanda"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.organizze_max_connections,
+                max_keepalive_connections=settings.organizze_max_keepalive_connections,
+                keepalive_expiry=settings.organizze_keepalive_expiry,
+            ),
+            timeout=_default_timeout(),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Fecha o cliente HTTP compartilhado (chamado no shutdown da aplicação)"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def _default_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        settings.organizze_read_timeout,
+        connect=settings.organizze_connect_timeout,
+    )
+
+
 class OrganizzeClient:
     def __init__(self):
         self.base_url = settings.organizze_api_base
@@ -15,150 +52,129 @@ class OrganizzeClient:
             'Content-Type': 'application/json',
             'User-Agent': 'OrganizzeTelegramBot/1.0'
         }
-        
-        # Cache de dados
-        self._categories: Optional[List[Category]] = None
-        self._accounts: Optional[List[Account]] = None
-        self._credit_cards: Optional[List[CreditCard]] = None
+        self.timeout = _default_timeout()
+        # Índices de nomes, reconstruídos só quando a lista do cache é substituída
+        self._indexes: Dict[str, NameIndex] = {}
+        # prazo, novas tentativas (só leituras) e circuit breaker compartilhados
+        self.resilience = dependency('organizze', settings.organizze_deadline)
     
-    def get_categories(self, force_refresh: bool = False) -> List[Category]:
-        """Obtém lista de categorias ativas"""
-        if self._categories and not force_refresh:
-            return self._categories
-        
+    async def get_categories(self, force_refresh: bool = False) -> List[Category]:
+        """Obtém lista de categorias ativas (via cache compartilhado)"""
         try:
-            logger.info("Buscando categorias do Organizze")
-            
-            url = f"{self.base_url}/categories"
-            response = requests.get(url, auth=self.auth, headers=self.headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Filtra apenas categorias ativas
-            active_categories = [
-                Category(
-                    id=cat['id'],
-                    name=cat['name'],
-                    kind=cat.get('kind', 'expense')
-                )
-                for cat in data
-                if not cat.get('archived', False)
-            ]
-            
-            self._categories = active_categories
-            logger.info(f"Encontradas {len(active_categories)} categorias ativas")
-            return active_categories
-        
+            return await metadata_cache.get('categories', self._fetch_categories, force_refresh)
         except Exception as e:
             logger.error(f"Erro ao buscar categorias: {e}")
             return []
     
-    def get_accounts(self, force_refresh: bool = False) -> List[Account]:
-        """Obtém lista de contas ativas"""
-        if self._accounts and not force_refresh:
-            return self._accounts
-        
+    async def get_accounts(self, force_refresh: bool = False) -> List[Account]:
+        """Obtém lista de contas ativas (via cache compartilhado)"""
         try:
-            logger.info("Buscando contas do Organizze")
-            
-            url = f"{self.base_url}/accounts"
-            response = requests.get(url, auth=self.auth, headers=self.headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Filtra apenas contas ativas
-            active_accounts = [
-                Account(
-                    id=acc['id'],
-                    name=acc['name'],
-                    type=acc.get('type', 'checking')
-                )
-                for acc in data
-                if not acc.get('archived', False)
-            ]
-            
-            self._accounts = active_accounts
-            logger.info(f"Encontradas {len(active_accounts)} contas ativas")
-            return active_accounts
-        
+            return await metadata_cache.get('accounts', self._fetch_accounts, force_refresh)
         except Exception as e:
             logger.error(f"Erro ao buscar contas: {e}")
             return []
     
-    def get_credit_cards(self, force_refresh: bool = False) -> List[CreditCard]:
-        """Obtém lista de cartões de crédito ativos"""
-        if self._credit_cards and not force_refresh:
-            return self._credit_cards
-        
+    async def get_credit_cards(self, force_refresh: bool = False) -> List[CreditCard]:
+        """Obtém lista de cartões de crédito ativos (via cache compartilhado)"""
         try:
-            logger.info("Buscando cartões de crédito do Organizze")
-            
-            url = f"{self.base_url}/credit_cards"
-            response = requests.get(url, auth=self.auth, headers=self.headers)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Filtra apenas cartões ativos
-            active_cards = [
-                CreditCard(
-                    id=card['id'],
-                    name=card['name']
-                )
-                for card in data
-                if not card.get('archived', False)
-            ]
-            
-            self._credit_cards = active_cards
-            logger.info(f"Encontrados {len(active_cards)} cartões ativos")
-            return active_cards
-        
+            return await metadata_cache.get('credit_cards', self._fetch_credit_cards, force_refresh)
         except Exception as e:
             logger.error(f"Erro ao buscar cartões: {e}")
             return []
     
-    def find_category_by_name(self, category_name: str) -> Optional[Category]:
-        """Busca categoria por nome (case-insensitive e parcial)"""
-        categories = self.get_categories()
-        category_lower = category_name.lower()
-        
-        # Busca exata
-        for cat in categories:
-            if cat.name.lower() == category_lower:
-                return cat
+    async def _get_json(self, path: str, params: Optional[dict] = None):
+        async def get():
+            response = await get_http_client().get(
+                f"{self.base_url}/{path}", params=params, auth=self.auth, headers=self.headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()
+        return await self.resilience.call(get)
+    
+    async def _fetch_categories(self) -> List[Category]:
+        logger.info("Buscando categorias do Organizze")
+        data = await self._get_json("categories")
         
-        # Busca parcial
-        for cat in categories:
-            if category_lower in cat.name.lower() or cat.name.lower() in category_lower:
-                return cat
+        # Filtra apenas categorias ativas
+        active_categories = [
+            Category(
+                id=cat['id'],
+                name=cat['name'],
+                kind=cat.get('kind', 'expense')
+            )
+            for cat in data
+            if not cat.get('archived', False)
+        ]
         
-        return None
+        logger.info(f"Encontradas {len(active_categories)} categorias ativas")
+        return active_categories
     
-    def find_account_by_name(self, account_name: str) -> Optional[Account]:
-        """Busca conta por nome (case-insensitive e parcial)"""
-        accounts = self.get_accounts()
-        account_lower = account_name.lower()
+    async def _fetch_accounts(self) -> List[Account]:
+        logger.info("Buscando contas do Organizze")
+        data = await self._get_json("accounts")
         
-        for acc in accounts:
-            if account_lower in acc.name.lower() or acc.name.lower() in account_lower:
-                return acc
+        # Filtra apenas contas ativas
+        active_accounts = [
+            Account(
+                id=acc['id'],
+                name=acc['name'],
+                type=acc.get('type', 'checking')
+            )
+            for acc in data
+            if not acc.get('archived', False)
+        ]
         
-        return None
+        logger.info(f"Encontradas {len(active_accounts)} contas ativas")
+        return active_accounts
     
-    def find_credit_card_by_name(self, card_name: str) -> Optional[CreditCard]:
-        """Busca cartão por nome (case-insensitive e parcial)"""
-        cards = self.get_credit_cards()
-        card_lower = card_name.lower()
+    async def _fetch_credit_cards(self) -> List[CreditCard]:
+        logger.info("Buscando cartões de crédito do Organizze")
+        data = await self._get_json("credit_cards")
         
-        for card in cards:
-            if card_lower in card.name.lower() or card.name.lower() in card_lower:
-                return card
+        # Filtra apenas cartões ativos
+        active_cards = [
+            CreditCard(
+                id=card['id'],
+                name=card['name']
+            )
+            for card in data
+            if not card.get('archived', False)
+        ]
         
-        return None
+        logger.info(f"Encontrados {len(active_cards)} cartões ativos")
+        return active_cards
+    
+    async def find_category_by_name(self, category_name: str, categories: Optional[List[Category]] = None) -> Optional[Category]:
+        """Busca categoria por nome (sem caixa/acentos; exata ou a mais parecida).
+
+        Quem já tem a lista em mãos (ex.: o contexto da extração) a repassa e evita
+        nova consulta ao cache; o mesmo vale para contas e cartões.
+        """
+        if categories is None:
+            categories = await self.get_categories()
+        return self._index('categories', categories).find(category_name)
+    
+    async def find_account_by_name(self, account_name: str, accounts: Optional[List[Account]] = None) -> Optional[Account]:
+        """Busca conta por nome (sem caixa/acentos; exata ou a mais parecida)"""
+        if accounts is None:
+            accounts = await self.get_accounts()
+        return self._index('accounts', accounts).find(account_name)
+    
+    async def find_credit_card_by_name(self, card_name: str, credit_cards: Optional[List[CreditCard]] = None) -> Optional[CreditCard]:
+        """Busca cartão por nome (sem caixa/acentos; exata ou a mais parecida)"""
+        if credit_cards is None:
+            credit_cards = await self.get_credit_cards()
+        return self._index('credit_cards', credit_cards).find(card_name)
+    
+    def _index(self, key: str, items: Sequence) -> NameIndex:
+        # o cache devolve a mesma lista até a próxima atualização: basta comparar identidade
+        index = self._indexes.get(key)
+        if index is None or index.items is not items:
+            index = NameIndex(items)
+            self._indexes[key] = index
+        return index
     
-    def create_transaction(self, expense: ExpenseData) -> dict:
+    async def create_transaction(self, expense: ExpenseData) -> dict:
         """Cria uma transação no Organizze"""
         try:
             logger.info("Enviando transação para Organizze")
@@ -168,22 +184,43 @@ class OrganizzeClient:
             
             logger.debug(f"Payload: {payload}")
             
-            response = requests.post(
-                url,
-                auth=self.auth,
-                headers=self.headers,
-                json=payload
-            )
+            async def post():
+                response = await get_http_client().post(
+                    url,
+                    auth=self.auth,
+                    headers=self.headers,
+                    json=payload,
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
+                return response.json()
             
-            response.raise_for_status()
-            result = response.json()
+            # POST não é idempotente: sem novas tentativas aqui (o outbox decide quando repetir)
+            result = await self.resilience.call(post, idempotent=False)
             
             logger.info(f"Transação criada: ID {result.get('id')}")
             return result
         
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             logger.error(f"Erro HTTP: {e.response.text}")
             raise
         except Exception as e:
             logger.error(f"Erro ao criar transação: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    async def find_transaction(self, expense: ExpenseData) -> Optional[dict]:
+        """Transação já criada para o gasto (mesma data, valor, descrição e observação), se houver.
+
+        Usada pelo outbox antes de reenviar um POST que pode ter chegado ao Organizze.
+        """
+        transactions = await self._get_json(
+            "transactions", params={"start_date": expense.date, "end_date": expense.date}
+        )
+        for transaction in transactions:
+            if (
+                transaction.get('amount_cents') == expense.amount_cents
+                and transaction.get('description') == expense.description
+                and transaction.get('notes') == expense.notes
+            ):
+                return transaction
+        return None
\ No newline at end of file
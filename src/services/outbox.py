@@ -0,0 +1,466 @@
+"""Outbox durável para gravações no Organizze.
+
+O gasto extraído é gravado primeiro no SQLite local e o usuário recebe na hora
+a resposta "na fila"; um flusher em background envia ao Organizze e, quando a
+gravação termina, edita a resposta no Telegram. Se o Organizze estiver lento
+ou fora do ar, o áudio não precisa ser reenviado: o envio é repetido com
+backoff e sobrevive a reinícios.
+
+Criar transação não é idempotente: só é repetido na hora o que comprovadamente
+não chegou ao Organizze (falha de conexão, breaker aberto, 429). Depois de
+erros em que a transação pode ter sido criada (timeout de leitura, resposta
+interrompida, 5xx), a entrada fica "não confirmada" e a próxima tentativa
+primeiro procura a transação no Organizze; sem como procurar, ela termina como
+`unknown` para conferência manual.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from ..config.settings import settings
+from ..models.expense import ExpenseData
+from .resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+QUEUED_MESSAGE = "🕒 Na fila para o Organizze (aviso aqui quando for registrado)"
+SENT_MESSAGE = "✅ Gasto registrado no Organizze!"
+FAILED_MESSAGE = "❌ Não foi possível registrar no Organizze: {error}"
+UNKNOWN_MESSAGE = "⚠️ Não deu para confirmar o registro no Organizze ({error}); confira lá antes de lançar de novo"
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+UNKNOWN = 'unknown'  # pode ter sido criada: conferir manualmente
+
+# Edita a resposta no Telegram: (chat_id, message_id, texto)
+Notifier = Callable[[int, int, str], Awaitable[None]]
+# Procura no Organizze a transação já criada para o gasto (None se não existe)
+Finder = Callable[[ExpenseData], Awaitable[Optional[dict]]]
+
+
+@dataclass
+class OutboxEntry:
+    id: int
+    expense: ExpenseData
+    account_key: str
+    attempts: int = 0
+    status: str = PENDING
+    chat_id: Optional[int] = None
+    message_id: Optional[int] = None
+    reply_text: Optional[str] = None
+    last_error: Optional[str] = None
+    unconfirmed: bool = False  # a última tentativa pode ter criado a transação
+
+
+class _TokenBucket:
+    """Limita envios por conta do Organizze: `rate` por segundo, rajadas de até `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Reserva um envio e devolve quanto esperar antes de fazê-lo"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Outbox:
+    """Fila persistente de transações + flusher.
+
+    - `enqueue` grava o gasto (commit no SQLite) e devolve o id;
+    - `attach_reply` associa a resposta do Telegram a editar depois;
+    - o flusher lê lotes de entradas vencidas, envia respeitando o limite por
+      conta (contas diferentes em paralelo, a mesma conta em ordem) e grava o
+      resultado do lote numa única transação do SQLite.
+
+    Falhas de conexão, breaker aberto e 429 são repetidos com backoff
+    exponencial com jitter. Timeouts de leitura, respostas interrompidas e 5xx
+    só são repetidos depois de `find` confirmar que a transação não existe
+    (sem `find`, viram `unknown`); os demais erros (ex.: 4xx) falham na hora.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[ExpenseData], Awaitable[dict]],
+        sqlite_path: str,
+        batch_size: int = 10,
+        max_attempts: int = 8,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        rate_per_account: float = 1.0,
+        burst: int = 3,
+        poll_interval: float = 5.0,
+        find: Optional[Finder] = None,
+    ):
+        self.send = send
+        self.find = find
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_per_account = rate_per_account
+        self.burst = burst
+        self.poll_interval = poll_interval
+        self.notifier: Optional[Notifier] = None
+
+        self._db = _open_db(sqlite_path)
+        self._db_lock = threading.Lock()
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.sent = 0
+        self.failed = 0
+        self.unknown = 0
+        self.found_existing = 0  # não confirmadas que já estavam no Organizze (reenvio evitado)
+        self.retries = 0
+        self.batches = 0
+        self.rate_limited_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    async def start(self, notifier: Optional[Notifier] = None):
+        """Inicia o flusher (retoma também as entradas pendentes de execuções anteriores)"""
+        self.notifier = notifier
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="organizze-outbox")
+            logger.info("Outbox do Organizze iniciado")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def enqueue(self, expense: ExpenseData) -> int:
+        """Grava o gasto de forma durável e acorda o flusher"""
+        entry_id = await asyncio.to_thread(self._db_insert, expense, _account_key(expense))
+        self.enqueued += 1
+        self._wake.set()
+        return entry_id
+
+    async def attach_reply(self, entry_id: int, chat_id: int, message_id: int, text: str):
+        """Associa a resposta do Telegram; se o envio já terminou, edita na hora"""
+        entry = await asyncio.to_thread(self._db_attach, entry_id, chat_id, message_id, text)
+        if entry is not None and entry.status != PENDING:
+            await self._notify(entry)
+
+    def snapshot(self) -> dict:
+        counts, oldest = self._db_stats()
+        return {
+            "pending": counts.get(PENDING, 0),
+            "sent_total": counts.get(SENT, 0),
+            "failed_total": counts.get(FAILED, 0),
+            "unknown_total": counts.get(UNKNOWN, 0),
+            "oldest_pending_s": round(time.time() - oldest, 1) if oldest else None,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "failed": self.failed,
+            "unknown": self.unknown,
+            "found_existing": self.found_existing,
+            "retries": self.retries,
+            "batches": self.batches,
+            "rate_limited_ms": round(self.rate_limited_ms, 1),
+            "last_error": self.last_error,
+        }
+
+    async def _run(self):
+        while True:
+            # limpa antes de consultar para não perder um enqueue entre a consulta e a espera
+            self._wake.clear()
+            next_due = None
+            try:
+                batch, next_due = await asyncio.to_thread(self._db_due, time.time(), self.batch_size)
+                if batch:
+                    await self._flush(batch)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no flusher do outbox: {e}", exc_info=True)
+
+            timeout = self.poll_interval
+            if next_due is not None:
+                timeout = min(timeout, max(0.0, next_due - time.time()))
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush(self, batch: List[OutboxEntry]):
+        self.batches += 1
+        groups: Dict[str, List[OutboxEntry]] = {}
+        for entry in batch:
+            groups.setdefault(entry.account_key, []).append(entry)
+        results = await asyncio.gather(*(self._send_group(entries) for entries in groups.values()))
+        outcomes = [outcome for group in results for outcome in group]
+
+        finished = await asyncio.to_thread(self._db_complete, outcomes)
+        for entry in finished:
+            await self._notify(entry)
+
+    async def _send_group(self, entries: List[OutboxEntry]) -> List[Tuple]:
+        """Envia em ordem as entradas de uma mesma conta, respeitando o limite dela"""
+        bucket = self._buckets.get(entries[0].account_key)
+        if bucket is None:
+            bucket = self._buckets[entries[0].account_key] = _TokenBucket(self.rate_per_account, self.burst)
+
+        outcomes = []
+        for entry in entries:
+            delay = bucket.delay()
+            if delay:
+                self.rate_limited_ms += delay * 1000
+                await asyncio.sleep(delay)
+            outcomes.append(await self._send_one(entry))
+        return outcomes
+
+    async def _send_one(self, entry: OutboxEntry) -> Tuple:
+        attempts = entry.attempts + 1
+        expense = _with_reference(entry.expense, entry.id)
+        if entry.unconfirmed:
+            # a tentativa anterior pode ter criado a transação: procura antes de reenviar
+            try:
+                existing = await self.find(expense)
+            except Exception as e:
+                # leitura: repetir é seguro, mas reenviar sem confirmar não
+                retry_after, _ = _classify(e)
+                return self._failure(entry, attempts, e, retry_after, unconfirmed=True)
+            if existing is not None:
+                self.found_existing += 1
+                self.sent += 1
+                logger.info(f"Outbox: entrada {entry.id} já estava no Organizze (ID {existing.get('id')})")
+                return (entry.id, SENT, attempts, None, None, existing.get('id'), False)
+
+        try:
+            result = await self.send(expense)
+        except Exception as e:
+            retry_after, maybe_created = _classify(e)
+            if maybe_created and self.find is None:
+                retry_after = None
+            return self._failure(entry, attempts, e, retry_after, unconfirmed=maybe_created)
+
+        self.sent += 1
+        return (entry.id, SENT, attempts, None, None, (result or {}).get('id'), False)
+
+    def _failure(
+        self, entry: OutboxEntry, attempts: int, e: Exception, retry_after: Optional[float], unconfirmed: bool
+    ) -> Tuple:
+        error = _describe(e)
+        self.last_error = error
+        if retry_after is not None and attempts < self.max_attempts:
+            self.retries += 1
+            delay = max(retry_after, self._backoff(attempts))
+            logger.warning(f"Outbox: entrada {entry.id} falhou ({error}); nova tentativa em {delay:.1f}s")
+            return (entry.id, PENDING, attempts, time.time() + delay, error, None, unconfirmed)
+        if unconfirmed:
+            self.unknown += 1
+            logger.error(f"Outbox: entrada {entry.id} sem confirmação após {attempts} tentativa(s): {error}")
+            return (entry.id, UNKNOWN, attempts, None, error, None, True)
+        self.failed += 1
+        logger.error(f"Outbox: entrada {entry.id} falhou após {attempts} tentativa(s): {error}")
+        return (entry.id, FAILED, attempts, None, error, None, False)
+
+    def _backoff(self, attempts: int) -> float:
+        # "full jitter": espalha as novas tentativas para não voltarem todas juntas
+        cap = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return random.uniform(cap / 2, cap)
+
+    async def _notify(self, entry: OutboxEntry):
+        if self.notifier is None or entry.message_id is None or not entry.reply_text:
+            return
+        if entry.status == SENT:
+            line = SENT_MESSAGE
+        elif entry.status == UNKNOWN:
+            line = UNKNOWN_MESSAGE.format(error=entry.last_error or "erro desconhecido")
+        else:
+            line = FAILED_MESSAGE.format(error=entry.last_error or "erro desconhecido")
+        text = entry.reply_text.replace(QUEUED_MESSAGE, line)
+        try:
+            await self.notifier(entry.chat_id, entry.message_id, text)
+        except Exception as e:
+            logger.warning(f"Outbox: não foi possível editar a resposta da entrada {entry.id}: {e}")
+
+    def _db_insert(self, expense: ExpenseData, account_key: str) -> int:
+        with self._db_lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (payload, account_key, status, attempts, next_attempt_at, created_at)"
+                " VALUES (?, ?, ?, 0, 0, ?)",
+                (json.dumps(asdict(expense)), account_key, PENDING, time.time()),
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def _db_attach(self, entry_id: int, chat_id: int, message_id: int, text: str) -> Optional[OutboxEntry]:
+        with self._db_lock:
+            self._db.execute(
+                "UPDATE outbox SET chat_id = ?, message_id = ?, reply_text = ? WHERE id = ?",
+                (chat_id, message_id, text, entry_id),
+            )
+            self._db.commit()
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        return _entry(row) if row else None
+
+    def _db_due(self, now: float, limit: int) -> Tuple[List[OutboxEntry], Optional[float]]:
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM outbox WHERE status = ? AND next_attempt_at <= ?"
+                " ORDER BY id LIMIT ?",
+                (PENDING, now, limit),
+            ).fetchall()
+            next_due = self._db.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+        return [_entry(row) for row in rows], next_due
+
+    def _db_complete(self, outcomes: List[Tuple]) -> List[OutboxEntry]:
+        """Grava o resultado do lote numa transação; devolve as entradas finalizadas"""
+        with self._db_lock:
+            for entry_id, status, attempts, next_at, error, transaction_id, unconfirmed in outcomes:
+                self._db.execute(
+                    "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = COALESCE(?, next_attempt_at),"
+                    " last_error = ?, transaction_id = ?, sent_at = ?, unconfirmed = ? WHERE id = ?",
+                    (status, attempts, next_at, error, transaction_id,
+                     time.time() if status == SENT else None, int(unconfirmed), entry_id),
+                )
+            self._db.commit()
+            done = [outcome[0] for outcome in outcomes if outcome[1] != PENDING]
+            if not done:
+                return []
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM outbox WHERE id IN ({','.join('?' * len(done))})", done
+            ).fetchall()
+        return [_entry(row) for row in rows]
+
+    def _db_stats(self) -> Tuple[Dict[str, int], Optional[float]]:
+        with self._db_lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            oldest = self._db.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+        return counts, oldest
+
+
+_COLUMNS = "id, payload, account_key, attempts, status, chat_id, message_id, reply_text, last_error, unconfirmed"
+
+
+def _entry(row) -> OutboxEntry:
+    entry_id, payload, account_key, attempts, status, chat_id, message_id, reply_text, last_error, unconfirmed = row
+    return OutboxEntry(
+        id=entry_id,
+        expense=ExpenseData(**json.loads(payload)),
+        account_key=account_key,
+        attempts=attempts,
+        status=status,
+        chat_id=chat_id,
+        message_id=message_id,
+        reply_text=reply_text,
+        last_error=last_error,
+        unconfirmed=bool(unconfirmed),
+    )
+
+
+def _account_key(expense: ExpenseData) -> str:
+    # mesma precedência do payload: cartão antes da conta
+    if expense.credit_card_id:
+        return f"card:{expense.credit_card_id}"
+    if expense.account_id:
+        return f"account:{expense.account_id}"
+    return "default"
+
+
+def _with_reference(expense: ExpenseData, entry_id: int) -> ExpenseData:
+    """Marca a observação com o id da entrada: distingue a transação de gastos iguais no mesmo dia"""
+    return replace(expense, notes=f"{expense.notes} (ref. {entry_id})")
+
+
+def _classify(error: Exception) -> Tuple[Optional[float], bool]:
+    """(segundos mínimos até a nova tentativa ou None se não deve ser repetido,
+    se o Organizze pode ter criado a transação)"""
+    if isinstance(error, CircuitOpenError):
+        # Organizze fora do ar: espera o breaker reabrir em vez de insistir
+        return error.retry_after, False
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        # o pedido nem saiu
+        return 0.0, False
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status == 429:
+            try:
+                return float(error.response.headers.get('Retry-After', 0)), False
+            except ValueError:
+                return 0.0, False
+        return (0.0, True) if status >= 500 else (None, False)
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        # timeout de leitura, conexão caída no meio, prazo esgotado: pode ter chegado
+        return 0.0, True
+    return None, False
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return str(error) or error.__class__.__name__
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS outbox ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " payload TEXT NOT NULL,"
+        " account_key TEXT NOT NULL,"
+        " status TEXT NOT NULL,"
+        " attempts INTEGER NOT NULL,"
+        " next_attempt_at REAL NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " sent_at REAL,"
+        " last_error TEXT,"
+        " transaction_id INTEGER,"
+        " chat_id INTEGER,"
+        " message_id INTEGER,"
+        " reply_text TEXT,"
+        " unconfirmed INTEGER NOT NULL DEFAULT 0)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+    db.commit()
+    logger.info(f"Outbox do Organizze em {path}")
+    return db
+
+
+def create_outbox(
+    send: Callable[[ExpenseData], Awaitable[dict]], find: Optional[Finder] = None
+) -> Optional[Outbox]:
+    """Outbox configurado pelas settings (None quando desabilitado)"""
+    if not settings.outbox_enabled:
+        return None
+    return Outbox(
+        send,
+        find=find,
+        sqlite_path=settings.outbox_path,
+        batch_size=settings.outbox_batch_size,
+        max_attempts=settings.outbox_max_attempts,
+        backoff_base=settings.outbox_backoff_base,
+        backoff_max=settings.outbox_backoff_max,
+        rate_per_account=settings.outbox_rate_per_account,
+        burst=settings.outbox_burst,
+        poll_interval=settings.outbox_poll_interval,
+    )
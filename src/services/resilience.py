@@ -0,0 +1,220 @@
+"""Camada de resiliência para chamadas externas (OpenAI e Organizze).
+
+Cada dependência tem:
+- prazo total por tentativa (`asyncio.wait_for`), para nenhuma chamada
+  travada prender um worker;
+- novas tentativas com backoff exponencial e jitter, só para chamadas seguras
+  de repetir (leituras, transcrição, extração) e só para erros transitórios;
+- circuit breaker: após falhas transitórias seguidas, falha na hora
+  (`CircuitOpenError`) até passar o tempo de reabertura; então deixa uma
+  chamada de teste passar (meio-aberto) e fecha se ela der certo.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, TypeVar
+import httpx
+import openai
+from ..config.settings import settings
+from . import metrics
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# valor do estado no gauge do Prometheus
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Dependência marcada como indisponível: a chamada nem foi feita"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} indisponível no momento (nova tentativa em {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self._probe_in_flight = False
+
+    def before_call(self, name: str):
+        """Levanta `CircuitOpenError` se a chamada não deve ser feita agora"""
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN:
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if remaining > 0:
+                raise CircuitOpenError(name, remaining)
+            self.state = HALF_OPEN
+        # meio-aberto: uma chamada de teste por vez
+        if self._probe_in_flight:
+            raise CircuitOpenError(name, self.reset_timeout)
+        self._probe_in_flight = True
+
+    def release_probe(self):
+        """Chamada cancelada sem resultado: libera a vaga de teste"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._probe_in_flight = False
+        self.failures = 0
+        self.state = CLOSED
+
+    def record_failure(self):
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = self.clock()
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "opened": self.opened}
+
+
+class Dependency:
+    """Política de chamadas para um serviço externo"""
+
+    def __init__(
+        self,
+        name: str,
+        deadline: float,
+        retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        breaker: CircuitBreaker,
+    ):
+        self.name = name
+        self.deadline = deadline
+        self.retries = max(0, retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+
+        self.calls = 0
+        self.failures = 0
+        self.retried = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+
+    async def call(self, fn: Callable[[], Awaitable[T]], idempotent: bool = True) -> T:
+        """Executa `fn` com prazo, novas tentativas (se `idempotent`) e circuit breaker"""
+        attempts = self.retries + 1 if idempotent else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                self.breaker.before_call(self.name)
+            except CircuitOpenError:
+                self.short_circuited += 1
+                raise
+
+            self.calls += 1
+            started = time.perf_counter()
+            try:
+                with tracer.start_as_current_span(
+                    f"{self.name}.call", attributes={"attempt": attempt, "deadline_s": self.deadline}
+                ):
+                    result = await asyncio.wait_for(fn(), self.deadline)
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self.failures += 1
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                if timed_out:
+                    self.timeouts += 1
+                metrics.observe_outbound(self.name, 'timeout' if timed_out else 'error', time.perf_counter() - started)
+                if not is_transient(e):
+                    # erro do pedido (ex.: 4xx): o serviço respondeu, não conta contra o breaker
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt == attempts or self.breaker.state == OPEN:
+                    raise
+                delay = self._backoff(attempt)
+                self.retried += 1
+                metrics.OUTBOUND_RETRIES.labels(self.name).inc()
+                logger.warning(
+                    f"{self.name}: falha transitória ({_describe(e)}), "
+                    f"tentativa {attempt + 1}/{attempts} em {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            metrics.observe_outbound(self.name, 'ok', time.perf_counter() - started)
+            self.breaker.record_success()
+            return result
+
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+    def snapshot(self) -> dict:
+        return {
+            "deadline_s": self.deadline,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retried,
+            "timeouts": self.timeouts,
+            "short_circuited": self.short_circuited,
+            "breaker": self.breaker.snapshot(),
+        }
+
+
+def is_transient(error: Exception) -> bool:
+    """Erros em que repetir pode dar certo: rede, prazo, 429 e 5xx"""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return False
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "prazo esgotado"
+    return str(error) or error.__class__.__name__
+
+
+_dependencies: Dict[str, Dependency] = {}
+
+
+def dependency(name: str, deadline: float) -> Dependency:
+    """Política compartilhada por nome (ex.: todos os clientes do Organizze usam o mesmo breaker)"""
+    dep = _dependencies.get(name)
+    if dep is None:
+        dep = _dependencies[name] = Dependency(
+            name,
+            deadline=deadline,
+            retries=settings.resilience_retries,
+            backoff_base=settings.resilience_backoff_base,
+            backoff_max=settings.resilience_backoff_max,
+            breaker=CircuitBreaker(settings.breaker_failure_threshold, settings.breaker_reset_seconds),
+        )
+        breaker = dep.breaker
+        metrics.track_gauge(metrics.BREAKER_STATE, name, lambda: STATE_VALUES[breaker.state])
+    return dep
+
+
+def snapshot() -> Dict[str, dict]:
+    return {name: dep.snapshot() for name, dep in _dependencies.items()}
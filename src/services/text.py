@@ -0,0 +1,17 @@
+"""Normalização de texto em português (caixa e acentos)"""
+import re
+import unicodedata
+from typing import List
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Minúsculas e sem acentos: 'Alimentação' -> 'alimentacao'"""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def words(text: str) -> List[str]:
+    """Palavras normalizadas (sem acentos e pontuação)"""
+    return _WORD_RE.findall(fold(text))
@@ -0,0 +1,111 @@
+"""Contabilização de tokens (prompt, cache e resposta) das chamadas ao LLM, por usuário e por modelo"""
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from ..config.settings import settings
+
+
+@dataclass
+class TokenUsage:
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0  # parte do prompt servida pelo cache de prefixo do provedor
+    completion_tokens: int = 0
+    llm_ms: float = 0.0
+    # somado chamada a chamada com o preço do modelo que respondeu; None = sem preço
+    cost_usd: Optional[float] = None
+
+    def add(
+        self,
+        prompt_tokens: int,
+        cached_tokens: int,
+        completion_tokens: int,
+        llm_ms: float,
+        cost_usd: Optional[float] = None,
+    ):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        self.completion_tokens += completion_tokens
+        self.llm_ms += llm_ms
+        if cost_usd is not None:
+            self.cost_usd = (self.cost_usd or 0.0) + cost_usd
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else None,
+            "avg_llm_ms": round(self.llm_ms / self.requests, 1) if self.requests else None,
+            "cost_usd": round(self.cost_usd, 6) if self.cost_usd is not None else None,
+        }
+
+
+class TokenUsageTracker:
+    """Totais gerais, por usuário e por modelo, a partir do `usage_metadata` das respostas"""
+
+    def __init__(self):
+        self.total = TokenUsage()
+        self._per_user: Dict[Optional[int], TokenUsage] = defaultdict(TokenUsage)
+        self._per_model: Dict[str, TokenUsage] = defaultdict(TokenUsage)
+
+    def record(
+        self,
+        user_id: Optional[int],
+        usage_metadata: Optional[dict],
+        llm_ms: float,
+        model: str,
+    ) -> TokenUsage:
+        """Soma o uso de uma chamada; retorna o uso só desta chamada (para log)"""
+        usage = usage_metadata or {}
+        call = TokenUsage()
+        prompt_tokens = usage.get('input_tokens', 0)
+        cached_tokens = (usage.get('input_token_details') or {}).get('cache_read', 0)
+        completion_tokens = usage.get('output_tokens', 0)
+        call.add(
+            prompt_tokens, cached_tokens, completion_tokens, llm_ms,
+            _cost(model, prompt_tokens, cached_tokens, completion_tokens),
+        )
+        for bucket in (self.total, self._per_user[user_id], self._per_model[model]):
+            bucket.add(call.prompt_tokens, call.cached_tokens, call.completion_tokens, llm_ms, call.cost_usd)
+        return call
+
+    def snapshot(self) -> dict:
+        return {
+            **self.total.snapshot(),
+            "per_model": {model: usage.snapshot() for model, usage in self._per_model.items()},
+            "per_user": {
+                str(user_id): usage.snapshot() for user_id, usage in self._per_user.items()
+            },
+        }
+
+
+def _prices(model: str) -> Tuple[float, float, float]:
+    """Preços (entrada, entrada em cache, saída) do modelo; o modelo forte tem os seus"""
+    if settings.openai_strong_model and model == settings.openai_strong_model:
+        return (
+            settings.openai_strong_input_cost_per_mtok,
+            settings.openai_strong_cached_input_cost_per_mtok,
+            settings.openai_strong_output_cost_per_mtok,
+        )
+    return (
+        settings.openai_input_cost_per_mtok,
+        settings.openai_cached_input_cost_per_mtok,
+        settings.openai_output_cost_per_mtok,
+    )
+
+
+def _cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Custo em USD de uma chamada pelos preços do modelo (None se não houver preço)"""
+    prices = _prices(model)
+    if not any(prices):
+        return None
+    input_price, cached_price, output_price = prices
+    uncached = prompt_tokens - cached_tokens
+    return (
+        uncached * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
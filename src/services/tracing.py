@@ -0,0 +1,96 @@
+"""Tracing OpenTelemetry: um trace por update do Telegram.
+
+Spans de um update:
+- `telegram.webhook`: recebimento no /webhook (raiz no modo webhook);
+- `telegram.update`: do enfileiramento ao fim do processamento (filho do
+  webhook; raiz no polling), com `update_queue.wait` para a espera na fila;
+- `telegram.download` e `node.<nome>` para cada nó do workflow;
+- `<dependência>.call`: cada tentativa de chamada à OpenAI ou ao Organizze.
+
+Com `TRACING_EXPORTER` vazio nenhum provider é instalado: a API do
+OpenTelemetry devolve spans no-op e o custo é desprezível. `console` imprime
+os spans concluídos; `memory` os guarda em `memory_exporter` (benchmarks e
+testes locais). O trace_id do span atual vai para todo registro de log.
+"""
+import functools
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "ai-telegram"
+
+# proxy: passa a usar o provider assim que `setup` o instala
+tracer = trace.get_tracer(SERVICE_NAME)
+
+memory_exporter: Optional[InMemorySpanExporter] = None
+_provider: Optional[TracerProvider] = None
+
+
+def setup(exporter: str):
+    """Instala o provider com o exportador pedido ("" mantém o tracing desligado)"""
+    global memory_exporter, _provider
+    if not exporter or _provider is not None:
+        return
+    provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    if exporter == 'console':
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+    elif exporter == 'memory':
+        memory_exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(memory_exporter))
+    else:
+        logger.warning(f"TRACING_EXPORTER desconhecido: {exporter!r} (use console ou memory)")
+        return
+    trace.set_tracer_provider(provider)
+    _provider = provider
+    logger.info(f"Tracing habilitado (exportador: {exporter})")
+
+
+def shutdown():
+    """Exporta os spans pendentes"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def set_attributes(attributes: Dict[str, Any]):
+    """Anota o span atual (valores None são ignorados)"""
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.set_attributes({key: value for key, value in attributes.items() if value is not None})
+
+
+def record_error(error: BaseException):
+    """Marca o span atual com o erro (para exceções tratadas sem propagar)"""
+    span = trace.get_current_span()
+    if span.is_recording():
+        span.record_exception(error)
+        span.set_status(Status(StatusCode.ERROR, str(error)))
+
+
+def traced_node(name: str, node: Callable[[dict], Awaitable[dict]]) -> Callable[[dict], Awaitable[dict]]:
+    """Nó do workflow dentro do span `node.<name>`"""
+    @functools.wraps(node)
+    async def run(state: dict) -> dict:
+        with tracer.start_as_current_span(f"node.{name}"):
+            return await node(state)
+    return run
+
+
+class TraceContextFilter(logging.Filter):
+    """Acrescenta `trace_id` (ou "-") aos registros de log"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = trace.get_current_span().get_span_context()
+        record.trace_id = format(context.trace_id, '032x') if context.is_valid else '-'
+        return True
+
+
+def install_log_filter():
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(TraceContextFilter())
@@ -1,29 +1,181 @@
 """Serviço de transcrição de áudio"""
+import asyncio
 import logging
-from openai import OpenAI
+from typing import List, Optional, Tuple
+from openai import AsyncOpenAI
+from pydub import AudioSegment
 from ..config.settings import settings
+from ..models.audio import AudioPayload
+from .audio_processing import chunk_bounds, decode_for_speech, export_chunk
+from .resilience import dependency
+from .text import words as normalized_words
+from .transcription_cache import create_transcription_cache
 
 logger = logging.getLogger(__name__)
 
+# Máximo de palavras comparadas ao remover a sobreposição entre trechos
+MAX_OVERLAP_WORDS = 12
+
 class TranscriptionService:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.openai_api_key)
-    
-    def transcribe(self, audio_path: str) -> str:
-        """Transcreve áudio usando Whisper"""
+        # novas tentativas e prazos ficam com a camada de resiliência, não com o SDK
+        self.client = AsyncOpenAI(api_key=settings.openai_api_key, max_retries=0)
+        self.resilience = dependency('openai_whisper', settings.whisper_deadline)
+        self.chunking = settings.transcription_chunking
+        self.chunk_threshold_seconds = settings.transcription_chunk_threshold_seconds
+        self.chunk_ms = int(settings.transcription_chunk_seconds * 1000)
+        self.overlap_ms = settings.transcription_chunk_overlap_ms
+        self.max_workers = max(1, settings.transcription_max_workers)
+
+        self.cache = create_transcription_cache()
+        self.cache_hits = {"file_unique_id": 0, "content_hash": 0}
+        self.cache_misses = 0
+
+    async def get_cached(self, file_unique_id: Optional[str] = None, content_hash: Optional[str] = None) -> Optional[str]:
+        """Transcrição já conhecida para o arquivo do Telegram ou para o conteúdo do áudio.
+
+        Consultar por `file_unique_id` antes do download evita baixar o áudio;
+        por `content_hash`, evita o Whisper para o mesmo áudio reenviado. Um
+        acerto por conteúdo também grava o `file_unique_id`, para que o próximo
+        reenvio do mesmo arquivo nem precise ser baixado.
+        """
+        for kind, value in (("file_unique_id", file_unique_id), ("content_hash", content_hash)):
+            if not value:
+                continue
+            text = await self.cache.get(_cache_key(kind, value))
+            if text is not None:
+                self.cache_hits[kind] += 1
+                logger.info(f"Transcrição obtida do cache ({kind})")
+                if kind == "content_hash" and file_unique_id:
+                    await self.cache.put(_cache_key("file_unique_id", file_unique_id), text)
+                return text
+        return None
+
+    def cache_snapshot(self) -> dict:
+        hits = sum(self.cache_hits.values())
+        total = hits + self.cache_misses
+        return {
+            "hits": dict(self.cache_hits),
+            "misses": self.cache_misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+            "entries": len(self.cache),
+            "size_bytes": self.cache.size_bytes,
+            "evictions": self.cache.evictions,
+        }
+
+    async def transcribe(self, audio: AudioPayload) -> str:
+        """Transcreve áudio (em memória) usando Whisper.
+
+        Áudios longos são divididos em trechos transcritos em paralelo, de modo
+        que o tempo até a transcrição acompanha o tamanho do trecho, não do áudio.
+        """
         try:
-            logger.info(f"Transcrevendo áudio: {audio_path}")
-            
-            with open(audio_path, 'rb') as audio_file:
-                transcription = self.client.audio.transcriptions.create(
-                    model=settings.whisper_model,
-                    file=audio_file,
-                    language="pt"
-                )
-            
-            logger.info(f"Transcrição concluída: {transcription.text}")
-            return transcription.text
-        
+            logger.info(f"Transcrevendo áudio: {audio.filename} ({audio.size} bytes)")
+
+            self.cache_misses += 1
+            segment, bounds = await self._plan_chunks(audio)
+            if segment is None or len(bounds) == 1:
+                text = await self._transcribe_one(audio)
+            else:
+                logger.info(f"Áudio dividido em {len(bounds)} trechos")
+                semaphore = asyncio.Semaphore(self.max_workers)
+
+                async def _chunk(index: int, chunk_range: Tuple[int, int]) -> str:
+                    # cada trecho é codificado e enviado assim que há vaga no pool,
+                    # sem esperar os demais
+                    async with semaphore:
+                        chunk = await asyncio.to_thread(
+                            export_chunk, segment, chunk_range, index, settings.audio_bitrate
+                        )
+                        return await self._transcribe_one(chunk)
+
+                # TaskGroup: a primeira falha cancela os trechos ainda em andamento,
+                # em vez de deixá-los rodando (e sendo cobrados) à toa
+                try:
+                    async with asyncio.TaskGroup() as group:
+                        tasks = [group.create_task(_chunk(i, b)) for i, b in enumerate(bounds)]
+                except ExceptionGroup as errors:
+                    raise errors.exceptions[0]
+                text = merge_transcripts([task.result() for task in tasks])
+
+            logger.info(f"Transcrição concluída: {text}")
+            await self._remember(audio, text)
+            return text
+
         except Exception as e:
             logger.error(f"Erro na transcrição: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def _remember(self, audio: AudioPayload, text: str):
+        if not text.strip():
+            return
+        for kind in ("file_unique_id", "content_hash"):
+            value = getattr(audio, kind)
+            if value:
+                await self.cache.put(_cache_key(kind, value), text)
+
+    async def _transcribe_one(self, audio: AudioPayload) -> str:
+        # transcrever não tem efeito colateral: seguro repetir
+        transcription = await self.resilience.call(lambda: self.client.audio.transcriptions.create(
+            model=settings.whisper_model,
+            file=(audio.filename, audio.data),
+            language="pt"
+        ))
+        return transcription.text
+
+    async def _plan_chunks(self, audio: AudioPayload) -> Tuple[Optional[AudioSegment], List[Tuple[int, int]]]:
+        """Decide se o áudio será dividido e onde; `(None, [])` significa enviar inteiro"""
+        if not self.chunking:
+            return None, []
+        if audio.duration is not None and audio.duration <= self.chunk_threshold_seconds:
+            return None, []
+
+        try:
+            segment = await asyncio.to_thread(decode_for_speech, audio)
+            if segment.duration_seconds <= self.chunk_threshold_seconds:
+                return None, []
+            bounds = await asyncio.to_thread(
+                chunk_bounds,
+                segment,
+                self.chunk_ms,
+                self.overlap_ms,
+                settings.audio_min_silence_ms,
+                settings.audio_silence_thresh_db,
+            )
+            return segment, bounds
+        except Exception as e:
+            logger.warning(f"Não foi possível dividir o áudio, enviando inteiro: {e}")
+            return None, []
+
+
+def _cache_key(kind: str, value: str) -> str:
+    prefix = "tg" if kind == "file_unique_id" else "sha256"
+    return f"{prefix}:{value}"
+
+
+def _normalize_word(word: str) -> str:
+    return ''.join(normalized_words(word))
+
+
+def merge_transcripts(texts: List[str], max_overlap_words: int = MAX_OVERLAP_WORDS) -> str:
+    """Junta textos de trechos consecutivos removendo as palavras repetidas na emenda.
+
+    Compara o final do texto acumulado com o início do próximo (ignorando caixa,
+    acentos e pontuação) e descarta a maior sequência de palavras em comum.
+    """
+    merged: List[str] = []
+    for text in texts:
+        words = text.split()
+        if not words:
+            continue
+
+        tail = [_normalize_word(w) for w in merged[-max_overlap_words:]]
+        head = [_normalize_word(w) for w in words[:max_overlap_words]]
+        overlap = 0
+        for size in range(min(len(tail), len(head)), 0, -1):
+            if tail[-size:] == head[:size]:
+                overlap = size
+                break
+
+        merged.extend(words[overlap:])
+    return ' '.join(merged)
@@ -0,0 +1,108 @@
+"""Cache de transcrições endereçado por conteúdo (file_unique_id ou hash do áudio)"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """LRU em memória limitado pelo tamanho total dos textos, com SQLite opcional.
+
+    O SQLite (quando configurado) guarda todas as transcrições e sobrevive a
+    reinícios; a memória funciona como camada quente na frente dele.
+    """
+
+    def __init__(self, max_bytes: int, sqlite_path: str = ""):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self.evictions = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        if sqlite_path:
+            self._db = _open_db(sqlite_path)
+
+    async def get(self, key: str) -> Optional[str]:
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+            return text
+
+        if self._db is None:
+            return None
+        text = await asyncio.to_thread(self._db_get, key)
+        if text is not None:
+            self._remember(key, text)
+        return text
+
+    async def put(self, key: str, text: str):
+        self._remember(key, text)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_put, key, text)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+    def _remember(self, key: str, text: str):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= _text_size(previous)
+        self._entries[key] = text
+        self._size += _text_size(text)
+
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= _text_size(evicted)
+            self.evictions += 1
+
+    def _db_get(self, key: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute("SELECT text FROM transcriptions WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _db_put(self, key: str, text: str):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcriptions (key, text, created_at) VALUES (?, ?, ?)",
+                (key, text, time.time()),
+            )
+            self._db.commit()
+
+
+def _text_size(text: str) -> int:
+    return len(text.encode('utf-8'))
+
+
+def _open_db(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS transcriptions ("
+        " key TEXT PRIMARY KEY,"
+        " text TEXT NOT NULL,"
+        " created_at REAL NOT NULL)"
+    )
+    db.commit()
+    logger.info(f"Cache de transcrições persistente em {path}")
+    return db
+
+
+def create_transcription_cache() -> TranscriptionCache:
+    return TranscriptionCache(
+        max_bytes=settings.transcription_cache_max_bytes,
+        sqlite_path=settings.transcription_cache_path,
+    )
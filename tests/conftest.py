@@ -0,0 +1,4 @@
+"""Configuração lida no import de `settings`: chave falsa para os clientes da OpenAI"""
+import os
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
@@ -0,0 +1,166 @@
+"""Deduplicação: store (LRU, TTL, SQLite) e execução única por chave"""
+import asyncio
+
+from src.bot.dedup import DedupStore, Deduplicator
+from src.bot.handlers import WorkflowOutcome
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_store_evicts_least_recently_used():
+    async def scenario():
+        store = DedupStore(ttl=60, max_entries=2)
+        await store.add("a")
+        await store.add("b")
+        assert await store.contains("a")  # "a" passa a ser a mais recente
+        await store.add("c")
+        return [await store.contains(key) for key in ("a", "b", "c")], len(store)
+
+    assert asyncio.run(scenario()) == ([True, False, True], 2)
+
+
+def test_store_expires_keys_after_ttl():
+    clock = Clock()
+
+    async def scenario():
+        store = DedupStore(ttl=60, max_entries=10, clock=clock)
+        await store.add("update:1")
+        await store.add("audio:1:x", ttl=5)
+        clock.now += 10
+        short = await store.contains("audio:1:x")
+        long = await store.contains("update:1")
+        clock.now += 60
+        return short, long, await store.contains("update:1")
+
+    assert asyncio.run(scenario()) == (False, True, False)
+
+
+def test_sqlite_store_survives_restart_and_honours_ttl(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "dedup.sqlite3")
+
+    async def scenario():
+        await DedupStore(ttl=60, max_entries=10, sqlite_path=path, clock=clock).add("update:1")
+        restarted = DedupStore(ttl=60, max_entries=10, sqlite_path=path, clock=clock)
+        known = await restarted.contains("update:1")
+        clock.now += 61
+        expired = await DedupStore(ttl=60, max_entries=10, sqlite_path=path, clock=clock).contains("update:1")
+        return known, expired
+
+    assert asyncio.run(scenario()) == (True, False)
+
+
+def _deduplicator() -> Deduplicator:
+    return Deduplicator(DedupStore(ttl=60, max_entries=10))
+
+
+def test_run_executes_once_then_reports_duplicate():
+    calls = []
+
+    async def job():
+        calls.append(1)
+        return "ok"
+
+    async def scenario():
+        dedup = _deduplicator()
+        return await dedup.run("k", job), await dedup.run("k", job), dedup.snapshot()
+
+    first, second, snapshot = asyncio.run(scenario())
+    assert first == ("new", "ok")
+    assert second == ("duplicate", None)
+    assert len(calls) == 1
+    assert snapshot["executed"] == 1 and snapshot["duplicates"] == 1
+
+
+def test_concurrent_duplicate_attaches_to_run_in_flight():
+    calls = []
+
+    async def scenario():
+        dedup = _deduplicator()
+        release = asyncio.Event()
+
+        async def job():
+            calls.append(1)
+            await release.wait()
+            return "resultado"
+
+        first = asyncio.create_task(dedup.run("k", job))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(dedup.run("k", job))
+        await asyncio.sleep(0)
+        in_flight = dedup.snapshot()["in_flight"]
+        release.set()
+        return await first, await second, in_flight, dedup.snapshot()
+
+    first, second, in_flight, snapshot = asyncio.run(scenario())
+    assert first == ("new", "resultado")
+    assert second == ("attached", "resultado")
+    assert len(calls) == 1
+    assert in_flight == 1
+    assert snapshot["in_flight"] == 0 and snapshot["attached"] == 1
+
+
+def test_failed_outcome_is_not_remembered():
+    outcomes = [WorkflowOutcome(False, "erro"), WorkflowOutcome(True, "registrado")]
+
+    async def job():
+        return outcomes.pop(0)
+
+    async def scenario():
+        dedup = _deduplicator()
+        remember = lambda outcome: outcome.ok  # noqa: E731 - como em handlers._process_audio
+        failed = await dedup.run("audio:1:x", job, remember=remember)
+        retried = await dedup.run("audio:1:x", job, remember=remember)
+        again = await dedup.run("audio:1:x", job, remember=remember)
+        return failed, retried, again
+
+    failed, retried, again = asyncio.run(scenario())
+    assert failed[0] == "new" and not failed[1].ok
+    assert retried[0] == "new" and retried[1].ok
+    assert again == ("duplicate", None)
+
+
+def test_exception_reaches_attached_duplicates_and_is_not_remembered():
+    async def scenario():
+        dedup = _deduplicator()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("falhou")
+
+        first = asyncio.create_task(dedup.run("k", failing))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(dedup.run("k", failing))
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        return results, await dedup.is_known("k")
+
+    results, known = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert not known
+
+
+def test_is_known_covers_in_flight_and_processed_keys():
+    async def scenario():
+        dedup = _deduplicator()
+        release = asyncio.Event()
+
+        async def job():
+            await release.wait()
+
+        task = asyncio.create_task(dedup.run("k", job))
+        await asyncio.sleep(0)
+        during = await dedup.is_known("k")
+        release.set()
+        await task
+        return during, await dedup.is_known("k"), await dedup.is_known("outra")
+
+    assert asyncio.run(scenario()) == (True, True, False)
@@ -0,0 +1,174 @@
+"""Roteamento da extração: regras de validação e escalada do modelo barato ao forte"""
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from src.config.settings import Settings, settings
+from src.models.expense import Account, Category, ExpenseData, ExtractionContext, ExtractionResult
+from src.services import resilience
+from src.services.extraction import ExtractionError, ExtractionService
+from src.services.extraction_router import CHEAP, STRONG, validate
+from src.services.extraction_schema import DEFAULT_AMOUNT_CENTS
+from src.services.organizze import OrganizzeClient
+
+TODAY = date(2025, 3, 14)
+MAX_AGE_DAYS = 90
+
+
+@pytest.fixture(autouse=True)
+def routing_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'routing_max_date_age_days', MAX_AGE_DAYS)
+    monkeypatch.setattr(settings, 'fast_path_enabled', False)
+    monkeypatch.setattr(settings, 'category_top_k', 0)
+    monkeypatch.setattr(resilience, '_dependencies', {})
+
+
+def _result(amount_cents=-5000, day=TODAY.isoformat(), category_id=1) -> ExtractionResult:
+    return ExtractionResult(expense=ExpenseData(
+        description="Mercado", date=day, amount_cents=amount_cents, category_id=category_id,
+    ))
+
+
+def _validate(result: ExtractionResult, transcription="gastei 50 reais no mercado", has_categories=True):
+    return validate(result, transcription, TODAY, has_categories)
+
+
+def test_valid_result_has_no_problems():
+    assert _validate(_result()) == []
+
+
+@pytest.mark.parametrize("amount", [0, 5000], ids=["zero", "positive"])
+def test_amount_must_be_negative(amount):
+    assert _validate(_result(amount_cents=amount)) == ['amount']
+
+
+def test_default_amount_is_suspicious_only_with_digits_in_text():
+    result = _result(amount_cents=DEFAULT_AMOUNT_CENTS)
+    assert _validate(result, "gastei 50 reais no mercado") == ['amount']
+    assert _validate(result, "gastei no mercado") == []
+
+
+@pytest.mark.parametrize("day, ok", [
+    (TODAY - timedelta(days=MAX_AGE_DAYS), True),
+    (TODAY - timedelta(days=MAX_AGE_DAYS + 1), False),
+    (TODAY + timedelta(days=1), True),
+    (TODAY + timedelta(days=2), False),
+], ids=["oldest", "too_old", "tomorrow", "future"])
+def test_date_must_be_within_allowed_age(day, ok):
+    assert _validate(_result(day=day.isoformat())) == ([] if ok else ['date'])
+
+
+def test_malformed_date_is_a_problem():
+    assert _validate(_result(day="14/03/2025")) == ['date']
+
+
+def test_category_must_be_resolved_when_categories_exist():
+    result = _result(category_id=None)
+    assert _validate(result) == ['category']
+    # sem categorias (Organizze fora do ar) não há o que resolver
+    assert _validate(result, has_categories=False) == []
+
+
+# Escalada: modelos falsos no lugar do barato e do forte
+
+class _FakeLLM:
+    """Devolve os argumentos dados, em ordem; `None` simula resposta sem JSON"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def with_structured_output(self, schema, **kwargs):
+        async def ainvoke(prompt):
+            self.calls += 1
+            args = self.responses.pop(0)
+            if args is None:
+                return {"raw": AIMessage(content="não entendi"), "parsed": None, "parsing_error": ValueError("sem JSON")}
+            return {"raw": None, "parsed": schema.model_validate(args), "parsing_error": None}
+        return type("FakeStructuredLLM", (), {"ainvoke": staticmethod(ainvoke)})()
+
+
+def _answer(**overrides) -> dict:
+    answer = {
+        "description": "Mercado", "date": TODAY.isoformat(), "amount_cents": -5000,
+        "category_name": "Mercado", "payment_method": "conta corrente",
+    }
+    answer.update(overrides)
+    return answer
+
+
+CONTEXT = ExtractionContext(
+    categories=[Category(1, "Mercado", "expense"), Category(2, "Transporte", "expense")],
+    accounts=[Account(10, "Conta Corrente", "checking")],
+    credit_cards=[],
+    prompt_prefix="",
+)
+
+
+def _route(cheap: _FakeLLM, strong: _FakeLLM = None):
+    async def scenario():
+        service = ExtractionService(OrganizzeClient())
+        service.llm = cheap
+        service.strong_llm = strong
+        result, tier, _ = await service._route("gastei 50 reais no mercado", CONTEXT, TODAY, None, None)
+        return service, result, tier
+    return asyncio.run(scenario())
+
+
+def test_accepted_cheap_result_does_not_call_strong_model():
+    cheap, strong = _FakeLLM(_answer()), _FakeLLM()
+    service, result, tier = _route(cheap, strong)
+    assert tier == CHEAP
+    assert strong.calls == 0
+    assert result.expense.category_id == 1
+
+
+def test_rejected_cheap_result_escalates_to_strong_model():
+    old = (TODAY - timedelta(days=MAX_AGE_DAYS + 30)).isoformat()
+    cheap, strong = _FakeLLM(_answer(date=old)), _FakeLLM(_answer())
+    service, result, tier = _route(cheap, strong)
+    assert tier == STRONG
+    assert result.expense.date == TODAY.isoformat()
+    assert service.routing.escalations[CHEAP] == {'date': 1}
+    assert service.routing.tiers[CHEAP].accepted == 0
+    assert service.routing.tiers[STRONG].accepted == 1
+
+
+def test_invalid_cheap_response_escalates_to_strong_model():
+    # resposta inválida mesmo após a nova tentativa
+    cheap, strong = _FakeLLM(None, None), _FakeLLM(_answer())
+    service, _, tier = _route(cheap, strong)
+    assert tier == STRONG
+    assert cheap.calls == 2
+    assert service.routing.escalations[CHEAP] == {'invalid_response': 1}
+
+
+def test_last_tier_is_accepted_even_with_problems():
+    cheap, strong = _FakeLLM(_answer(category_name=None)), _FakeLLM(_answer(category_name=None))
+    service, result, tier = _route(cheap, strong)
+    assert tier == STRONG
+    assert result.expense.category_id is None
+    assert service.routing.tiers[STRONG].accepted == 0
+
+
+def test_without_strong_model_cheap_result_is_accepted():
+    old = (TODAY - timedelta(days=MAX_AGE_DAYS + 30)).isoformat()
+    service, result, tier = _route(_FakeLLM(_answer(date=old)))
+    assert tier == CHEAP
+    assert result.expense.date == old
+    assert not service.routing.escalations[CHEAP]
+
+
+def test_without_strong_model_invalid_response_fails():
+    with pytest.raises(ExtractionError):
+        _route(_FakeLLM(None, None))
+
+
+def test_strong_model_is_disabled_by_default(monkeypatch):
+    # sem OPENAI_STRONG_MODEL não há escalada (nem custo do modelo forte sem preço)
+    monkeypatch.delenv('OPENAI_STRONG_MODEL', raising=False)
+    monkeypatch.setattr(settings, 'openai_strong_model', Settings.from_env().openai_strong_model)
+    assert settings.openai_strong_model == ""
+    assert ExtractionService(OrganizzeClient()).strong_llm is None
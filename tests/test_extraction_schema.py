@@ -0,0 +1,163 @@
+"""Esquema da extração: enum de categorias e reparo local de respostas inválidas"""
+import asyncio
+from datetime import date
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import ValidationError
+
+from src.models.expense import Category
+from src.services import resilience
+from src.services.extraction import MAX_RETRIES, ExtractionError, ExtractionService
+from src.services.extraction_schema import (
+    DEFAULT_AMOUNT_CENTS,
+    OTHER_CATEGORY,
+    build_schema,
+    parse_json_text,
+    repair,
+    schema_category_names,
+)
+
+TODAY = date(2025, 3, 14)
+CATEGORIES = [
+    Category(1, "Mercado", "expense"),
+    Category(2, "Restaurante", "expense"),
+    Category(3, "Transporte", "expense"),
+    Category(4, "Salário", "revenue"),
+]
+
+
+def test_enum_lists_only_suggested_categories_plus_other():
+    names = schema_category_names(CATEGORIES[:2], CATEGORIES)
+    assert names == ("Mercado", "Restaurante", OTHER_CATEGORY)
+    schema = build_schema(names)
+    with pytest.raises(ValidationError):
+        schema.model_validate({
+            "description": "Uber", "date": "2025-03-14", "amount_cents": -1800,
+            "category_name": "Transporte", "payment_method": "dinheiro",
+        })
+
+
+def test_enum_without_pruning_has_no_other_option():
+    assert schema_category_names(CATEGORIES[:3], CATEGORIES) == ("Mercado", "Restaurante", "Transporte")
+
+
+def test_category_outside_enum_becomes_other():
+    names = ("Mercado", "Restaurante", OTHER_CATEGORY)
+    data = repair({"category_name": "Transporte", "payment_method": "dinheiro"}, names, TODAY)
+    assert data["category_name"] == OTHER_CATEGORY
+    assert data["other_category"] == "Transporte"
+
+
+@pytest.mark.parametrize("value, cents", [
+    ("R$ 45,90", -4590),
+    ("1.200,00", -120000),
+    ("cento e oitenta reais", -18000),
+    ("mil e duzentos", -120000),
+    (2500, -2500),
+    ("não informado", DEFAULT_AMOUNT_CENTS),
+    (None, DEFAULT_AMOUNT_CENTS),
+], ids=["text", "thousands", "words", "words_thousands", "positive", "no_number", "missing"])
+def test_amount_is_repaired_to_negative_cents(value, cents):
+    data = repair({"amount_cents": value, "payment_method": "dinheiro"}, (), TODAY)
+    assert data["amount_cents"] == cents
+
+
+def test_category_outside_enum_without_other_is_dropped():
+    names = ("Mercado", "Restaurante", "Transporte")
+    data = repair({"category_name": "Lazer", "payment_method": "dinheiro"}, names, TODAY)
+    assert data["category_name"] is None
+    assert data["other_category"] is None
+
+
+def test_category_with_different_case_and_accents_matches_enum():
+    names = ("Mercado", "Alimentação")
+    data = repair({"category_name": "ALIMENTACAO"}, names, TODAY)
+    assert data["category_name"] == "Alimentação"
+
+
+def test_missing_payment_method_defaults_to_checking_account():
+    data = repair({"description": "padaria", "amount_cents": -800}, (), TODAY)
+    assert data["payment_method"] == "conta corrente"
+    assert data["description"] == "Padaria"
+    assert data["date"] == TODAY.isoformat()
+    build_schema(()).model_validate(data)
+
+
+def test_parse_json_text_tolerates_markdown_and_surrounding_text():
+    assert parse_json_text('```json\n{"amount_cents": -500}\n```') == {"amount_cents": -500}
+    assert parse_json_text('Aqui está: {"amount_cents": -500} pronto') == {"amount_cents": -500}
+    with pytest.raises(ValueError):
+        parse_json_text("não entendi o áudio")
+
+
+# Chamada ao modelo: reparo local primeiro, uma nova tentativa, depois falha
+
+class _ScriptedLLM:
+    """Devolve as mensagens dadas, em ordem, como `with_structured_output(include_raw=True)`"""
+
+    def __init__(self, *messages: AIMessage):
+        self.messages = list(messages)
+        self.prompts = []
+
+    def with_structured_output(self, schema, **kwargs):
+        async def ainvoke(prompt):
+            self.prompts.append(prompt)
+            message = self.messages.pop(0)
+            args = message.tool_calls[0]['args'] if message.tool_calls else None
+            try:
+                return {"raw": message, "parsed": schema.model_validate(args), "parsing_error": None}
+            except ValidationError as e:
+                return {"raw": message, "parsed": None, "parsing_error": e}
+        return type("ScriptedStructuredLLM", (), {"ainvoke": staticmethod(ainvoke)})()
+
+
+def _tool_call(**args) -> AIMessage:
+    return AIMessage(content="", tool_calls=[{"name": "ExpenseExtraction", "args": args, "id": "call_1"}])
+
+
+def _extract(llm: _ScriptedLLM):
+    names = ("Mercado", "Restaurante")
+
+    async def scenario():
+        service = ExtractionService(organizze_client=object())
+        service.llm = llm
+        data = await service._structured_extract([HumanMessage("gastei 50 no mercado")], names, TODAY)
+        return service, data
+    return asyncio.run(scenario())
+
+
+@pytest.fixture(autouse=True)
+def fresh_dependencies(monkeypatch):
+    monkeypatch.setattr(resilience, '_dependencies', {})
+
+
+def test_missing_payment_method_is_repaired_without_retry():
+    llm = _ScriptedLLM(_tool_call(description="Mercado", date="2025-03-14", amount_cents=-5000, category_name="Mercado"))
+    service, data = _extract(llm)
+    assert data["payment_method"] == "conta corrente"
+    assert len(llm.prompts) == 1
+    assert service.parse_stats.repaired == 1
+    assert service.parse_stats.retries == 0
+
+
+def test_unrepairable_response_is_retried_once():
+    llm = _ScriptedLLM(
+        AIMessage(content="não entendi o áudio"),
+        _tool_call(description="Mercado", date="2025-03-14", amount_cents=-5000,
+                   category_name="Mercado", payment_method="dinheiro"),
+    )
+    service, data = _extract(llm)
+    assert data["amount_cents"] == -5000
+    assert len(llm.prompts) == 2
+    # o erro vai anexado ao fim do prompt original
+    assert llm.prompts[1][:-1] == llm.prompts[0]
+    assert "inválida" in llm.prompts[1][-1].content
+    assert service.parse_stats.retries == 1
+
+
+def test_second_invalid_response_fails_without_another_call():
+    llm = _ScriptedLLM(AIMessage(content="não entendi"), AIMessage(content="ainda não entendi"))
+    with pytest.raises(ExtractionError):
+        _extract(llm)
+    assert len(llm.prompts) == MAX_RETRIES + 1 == 2
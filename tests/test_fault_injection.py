@@ -0,0 +1,304 @@
+"""Resiliência contra Organizze e OpenAI locais com falhas injetadas.
+
+Os servidores falsos (`benchmarks/fake_organizze.py`, `benchmarks/fake_openai.py`)
+sobem no event loop de cada teste e os clientes reais apontam para eles:
+
+- leitura do Organizze se recupera após 503s seguidos (novas tentativas);
+- chamada travada estoura o prazo e abre o circuit breaker; com ele aberto as
+  chamadas falham na hora, e a chamada de teste o fecha depois da reabertura;
+- POST de transação não é repetido pela camada de resiliência;
+- 500 do Whisper e prazo esgotado do LLM são repetidos;
+- outbox: só repete na hora o que não chegou ao Organizze; depois de um 5xx
+  procura a transação antes de reenviar (sem como procurar, vira `unknown`).
+"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'benchmarks')))
+
+from fake_openai import FakeOpenAI  # noqa: E402
+from fake_organizze import FakeOrganizze  # noqa: E402
+
+from src.config.settings import settings  # noqa: E402
+from src.models.audio import AudioPayload  # noqa: E402
+from src.models.expense import ExpenseData  # noqa: E402
+from src.services import resilience  # noqa: E402
+from src.services.extraction import ExtractionService  # noqa: E402
+from src.services.organizze import OrganizzeClient, close_http_client  # noqa: E402
+from src.services.outbox import FAILED, SENT, UNKNOWN, Outbox  # noqa: E402
+from src.services.resilience import CLOSED, OPEN, CircuitOpenError, dependency  # noqa: E402
+from src.services.transcription import TranscriptionService  # noqa: E402
+
+DEADLINE = 0.5
+RESET_SECONDS = 1.0
+
+
+@pytest.fixture(autouse=True)
+def fast_resilience(monkeypatch, tmp_path):
+    """Prazos curtos, breaker sensível e dependências novas (breakers zerados) por teste"""
+    for name, value in {
+        'openai_api_key': 'sk-test',
+        'organizze_deadline': DEADLINE,
+        'whisper_deadline': DEADLINE,
+        'llm_deadline': DEADLINE,
+        'resilience_retries': 2,
+        'resilience_backoff_base': 0.05,
+        'breaker_failure_threshold': 3,
+        'breaker_reset_seconds': RESET_SECONDS,
+        'fast_path_enabled': False,
+        'openai_strong_model': '',
+        'transcription_cache_path': str(tmp_path / 'transcriptions.sqlite3'),
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(resilience, '_dependencies', {})
+
+
+@pytest.fixture
+def organizze(monkeypatch):
+    server = FakeOrganizze()
+    monkeypatch.setattr(settings, 'organizze_api_base', server.base_url)
+    return server
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    server = FakeOpenAI()
+    monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+    return server
+
+
+def _run(scenario, *servers):
+    """Sobe os servidores, roda o cenário e encerra tudo no mesmo event loop"""
+    async def main():
+        for server in servers:
+            await server.start()
+        try:
+            return await scenario()
+        finally:
+            await close_http_client()
+            for server in servers:
+                await server.stop()
+    return asyncio.run(main())
+
+
+def _expense() -> ExpenseData:
+    return ExpenseData(description="Mercado", date="2025-01-10", amount_cents=-5000, category_id=1, account_id=10)
+
+
+def test_read_recovers_after_transient_errors(organizze):
+    organizze.read_faults.fail_next = 2
+    categories = _run(lambda: OrganizzeClient()._get_json('categories'), organizze)
+    assert categories
+    assert organizze.calls['categories'] == 3
+
+
+def test_hung_call_opens_breaker_until_probe_succeeds(organizze):
+    async def scenario():
+        client = OrganizzeClient()
+        breaker = dependency('organizze', DEADLINE).breaker
+
+        # prazo por tentativa esgotado em todas: o breaker abre
+        organizze.read_faults.hang = DEADLINE * 4
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await client._get_json('accounts')
+        assert time.monotonic() - started < DEADLINE * 4
+        assert breaker.state == OPEN
+
+        # aberto: falha na hora, sem chegar ao servidor
+        organizze.read_faults.reset()
+        calls = organizze.calls['accounts']
+        started = time.monotonic()
+        with pytest.raises(CircuitOpenError):
+            await client._get_json('accounts')
+        assert time.monotonic() - started < 0.05
+        assert organizze.calls['accounts'] == calls
+
+        # passado o tempo de reabertura, a chamada de teste fecha o breaker
+        await asyncio.sleep(RESET_SECONDS)
+        await client._get_json('accounts')
+        assert breaker.state == CLOSED
+
+    _run(scenario, organizze)
+
+
+def test_transaction_post_is_not_retried(organizze):
+    organizze.write_faults.fail_next = 1
+    with pytest.raises(httpx.HTTPStatusError):
+        _run(lambda: OrganizzeClient().create_transaction(_expense()), organizze)
+    assert organizze.calls['transactions'] == 1
+    assert not organizze.transactions
+
+
+def test_whisper_retries_after_server_error(openai_server):
+    openai_server.transcription_faults.fail_next = 1
+    openai_server.transcription_faults.error_status = 500
+
+    async def scenario():
+        return await TranscriptionService()._transcribe_one(AudioPayload(data=b"\0" * 64, filename="audio.ogg"))
+
+    assert _run(scenario, openai_server) == openai_server.transcript
+    assert openai_server.calls['transcriptions'] == 2
+
+
+def test_llm_retries_after_deadline(organizze, openai_server):
+    openai_server.chat_faults.hang = DEADLINE * 2
+
+    async def recover():
+        # só a primeira chamada trava
+        while not openai_server.calls.get('chat'):
+            await asyncio.sleep(0.01)
+        openai_server.chat_faults.hang = 0.0
+
+    async def scenario():
+        extractor = ExtractionService(OrganizzeClient())
+        _, result = await asyncio.gather(recover(), extractor.extract("gastei 50 reais no mercado"))
+        return result
+
+    result = _run(scenario, organizze, openai_server)
+    assert result.expense.amount_cents == -5000
+    assert openai_server.calls['chat'] >= 2
+
+
+# Outbox: política de novas tentativas da gravação no Organizze
+
+def _outbox(tmp_path, send, find=None) -> Outbox:
+    return Outbox(
+        send,
+        find=find,
+        sqlite_path=str(tmp_path / 'outbox.sqlite3'),
+        max_attempts=3,
+        backoff_base=0.01,
+        backoff_max=0.05,
+        rate_per_account=0,
+        poll_interval=0.05,
+    )
+
+
+async def _drain(outbox: Outbox, timeout: float = 5.0) -> dict:
+    """Roda o flusher até não haver entradas pendentes"""
+    await outbox.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while outbox.snapshot()['pending']:
+            assert time.monotonic() < deadline, "outbox não esvaziou"
+            await asyncio.sleep(0.01)
+    finally:
+        await outbox.stop()
+    return outbox.snapshot()
+
+
+def _status(outbox: Outbox, entry_id: int) -> str:
+    return outbox._db.execute("SELECT status FROM outbox WHERE id = ?", (entry_id,)).fetchone()[0]
+
+
+def _http_error(status: int, headers: dict = None) -> httpx.HTTPStatusError:
+    request = httpx.Request('POST', 'http://organizze.test/transactions')
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+def _flaky_send(*errors: Exception):
+    """Levanta os erros dados, em ordem, e depois grava; `calls` conta as chamadas"""
+    pending = list(errors)
+
+    async def send(expense):
+        send.calls += 1
+        if pending:
+            raise pending.pop(0)
+        return {"id": 1}
+    send.calls = 0
+    return send
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused"),
+    httpx.ConnectTimeout("connect timeout"),
+    CircuitOpenError('organizze', 0.0),
+    _http_error(429, {'Retry-After': '0'}),
+], ids=["connect", "connect_timeout", "breaker_open", "429"])
+def test_outbox_retries_what_never_reached_organizze(tmp_path, error):
+    send = _flaky_send(error)
+
+    async def scenario():
+        outbox = _outbox(tmp_path, send)
+        entry_id = await outbox.enqueue(_expense())
+        return outbox, entry_id, await _drain(outbox)
+
+    outbox, entry_id, snapshot = asyncio.run(scenario())
+    assert _status(outbox, entry_id) == SENT
+    assert send.calls == 2
+    assert snapshot['retries'] == 1
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ReadTimeout("read timeout"),
+    asyncio.TimeoutError(),
+    _http_error(502),
+], ids=["read_timeout", "deadline", "502"])
+def test_outbox_without_finder_does_not_resend_maybe_created(tmp_path, error):
+    send = _flaky_send(error)
+
+    async def scenario():
+        outbox = _outbox(tmp_path, send)
+        entry_id = await outbox.enqueue(_expense())
+        return outbox, entry_id, await _drain(outbox)
+
+    outbox, entry_id, snapshot = asyncio.run(scenario())
+    assert _status(outbox, entry_id) == UNKNOWN
+    assert send.calls == 1
+    assert snapshot['unknown'] == 1
+
+
+def test_outbox_client_error_fails_immediately(tmp_path):
+    send = _flaky_send(_http_error(400))
+
+    async def scenario():
+        outbox = _outbox(tmp_path, send)
+        entry_id = await outbox.enqueue(_expense())
+        return outbox, entry_id, await _drain(outbox)
+
+    outbox, entry_id, snapshot = asyncio.run(scenario())
+    assert _status(outbox, entry_id) == FAILED
+    assert send.calls == 1
+    assert snapshot['retries'] == 0
+
+
+@pytest.mark.parametrize("committed", [True, False], ids=["created", "not_created"])
+def test_outbox_finds_transaction_before_resending(tmp_path, organizze, committed):
+    # 502 depois (ou antes) de criar a transação: a resposta não diz qual dos dois
+    organizze.write_faults.fail_next = 1
+    organizze.write_faults.error_status = 502
+    organizze.write_faults.after_commit = committed
+
+    async def scenario():
+        client = OrganizzeClient()
+        outbox = _outbox(tmp_path, client.create_transaction, find=client.find_transaction)
+        entry_id = await outbox.enqueue(_expense())
+        return outbox, entry_id, await _drain(outbox)
+
+    outbox, entry_id, snapshot = _run(scenario, organizze)
+    assert _status(outbox, entry_id) == SENT
+    assert len(organizze.transactions) == 1
+    assert snapshot['found_existing'] == (1 if committed else 0)
+    assert organizze.calls['transactions'] == (1 if committed else 2)
+
+
+def test_outbox_without_finder_marks_lost_response_unknown(tmp_path, organizze):
+    organizze.write_faults.fail_next = 1
+    organizze.write_faults.error_status = 502
+    organizze.write_faults.after_commit = True
+
+    async def scenario():
+        outbox = _outbox(tmp_path, OrganizzeClient().create_transaction)
+        entry_id = await outbox.enqueue(_expense())
+        return outbox, entry_id, await _drain(outbox)
+
+    outbox, entry_id, _ = _run(scenario, organizze)
+    assert _status(outbox, entry_id) == UNKNOWN
+    assert len(organizze.transactions) == 1
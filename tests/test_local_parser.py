@@ -0,0 +1,164 @@
+"""Parser local (fast-path): valores, datas, categoria, forma de pagamento e confiança"""
+from datetime import date
+
+import pytest
+
+from src.models.expense import Account, Category, CreditCard, ExtractionContext
+from src.services.local_parser import (
+    LocalExpenseParser,
+    match_category,
+    match_payment,
+    parse_amount,
+    parse_date,
+)
+from src.services.text import fold, words
+
+TODAY = date(2025, 3, 14)  # sexta-feira
+
+CATEGORIES = [
+    Category(1, "Mercado", "expense"),
+    Category(2, "Restaurante", "expense"),
+    Category(3, "Transporte", "expense"),
+    Category(4, "Farmácia", "expense"),
+    Category(5, "Lazer", "expense"),
+    Category(6, "Casa", "expense"),
+    Category(7, "Salário", "revenue"),
+]
+ACCOUNTS = [Account(10, "Conta Corrente", "checking"), Account(11, "Poupança", "savings")]
+CARDS = [CreditCard(20, "Nubank"), CreditCard(21, "Itaú")]
+CONTEXT = ExtractionContext(categories=CATEGORIES, accounts=ACCOUNTS, credit_cards=CARDS, prompt_prefix="")
+
+
+def _amount(text: str):
+    return parse_amount(fold(text), words(text))
+
+
+def _parse(text: str):
+    return LocalExpenseParser().parse(text, CONTEXT, TODAY)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("gastei 50 reais no mercado", (5000, True)),
+    ("R$ 27,90 na farmácia", (2790, True)),
+    ("aluguel 1.500 reais", (150000, True)),
+    ("12.5 reais de pão", (1250, True)),
+    ("32 reais e 50 centavos", (3250, True)),
+    ("cinquenta e dois reais no bar", (5200, True)),
+    ("mil e duzentos reais de aluguel", (120000, True)),
+    ("pizza 89 no ifood", (8900, False)),
+])
+def test_parse_amount(text, expected):
+    assert _amount(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "mercado dia 15",          # dia do mês, não valor
+    "10 reais e 20 reais",     # dois valores
+    "almoço no restaurante",   # sem valor
+])
+def test_parse_amount_missing_or_ambiguous(text):
+    assert _amount(text) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ontem", date(2025, 3, 13)),
+    ("anteontem", date(2025, 3, 12)),
+    ("dia 10", date(2025, 3, 10)),
+    ("dia 20", date(2025, 2, 20)),        # ainda não chegou: mês anterior
+    ("dia cinco de janeiro", date(2025, 1, 5)),
+    ("em 02/03", date(2025, 3, 2)),
+    ("em 20/12", date(2024, 12, 20)),     # ainda não chegou: ano anterior
+    ("sexta passada", date(2025, 3, 7)),
+    ("na segunda", date(2025, 3, 10)),
+    ("hoje", TODAY),
+])
+def test_parse_date(text, expected):
+    assert parse_date(fold(text), words(text), TODAY) == expected
+
+
+def test_parse_date_ordinal_segunda_is_not_weekday():
+    assert parse_date("segunda vez", ["segunda", "vez"], TODAY) is None
+
+
+def test_keyword_beats_incidental_category_name():
+    category, _, keyword = match_category(words("uber pra casa 18 reais"), CATEGORIES)
+    assert category.name == "Transporte"
+    assert keyword == "uber"
+
+
+def test_category_name_alone_still_matches():
+    category, score, _ = match_category(words("gastei 30 reais em casa"), CATEGORIES)
+    assert category.name == "Casa"
+    assert score >= 0.8
+
+
+def test_revenue_categories_are_ignored():
+    category, _, _ = match_category(words("salario"), CATEGORIES)
+    assert category is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("pago da poupança", ACCOUNTS[1]),
+    ("no débito da conta corrente", ACCOUNTS[0]),
+    ("no cartão itaú", CARDS[1]),
+    ("no nubank", CARDS[0]),
+])
+def test_match_payment_by_name(text, expected):
+    payment, resolved = match_payment(words(text), CONTEXT)
+    assert payment == expected
+    assert resolved
+
+
+def test_default_account_is_not_resolved():
+    payment, resolved = match_payment(words("gastei 50 reais no mercado"), CONTEXT)
+    assert payment == ACCOUNTS[0]
+    assert not resolved
+
+
+def test_unnamed_card_with_several_cards_is_not_resolved():
+    payment, resolved = match_payment(words("no cartão de crédito"), CONTEXT)
+    assert payment == CARDS[0]
+    assert not resolved
+
+
+def test_full_sentence_is_confident():
+    result = _parse("gastei 45 reais no mercado ontem no cartão nubank")
+    assert result.confidence == 1.0
+    assert result.expense.amount_cents == -4500
+    assert result.expense.date == "2025-03-13"
+    assert result.category.name == "Mercado"
+    assert result.credit_card == CARDS[0]
+    assert result.expense.credit_card_id == 20
+
+
+def test_named_savings_account():
+    result = _parse("remédio 54 reais pago da poupança")
+    assert result.account == ACCOUNTS[1]
+    assert result.category.name == "Farmácia"
+    assert result.confidence >= 0.8
+
+
+def test_uber_home_goes_to_transport():
+    result = _parse("uber pra casa 18 reais no itaú")
+    assert result.category.name == "Transporte"
+    assert result.credit_card == CARDS[1]
+
+
+@pytest.mark.parametrize("text", [
+    "gastei 50 reais no mercado",                  # forma de pagamento não dita
+    "padaria 12 reais no nubank",                  # sem categoria correspondente
+    "paguei 100 reais no mercado, dividi em 2",    # valor pode não ser o lançado
+    "50 reais cada no cinema no nubank",
+])
+def test_incomplete_or_ambiguous_sentences_go_to_llm(text):
+    result = _parse(text)
+    assert result is None or result.confidence < 0.8
+
+
+@pytest.mark.parametrize("text", [
+    "recebi 500 reais de salário",
+    "comprei uma tv parcelado em 10 vezes",
+    "almoço no restaurante",
+])
+def test_unsupported_sentences_are_not_parsed(text):
+    assert _parse(text) is None
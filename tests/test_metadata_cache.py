@@ -0,0 +1,179 @@
+"""Cache de metadados: TTL, stale-while-revalidate, cache negativo e single-flight"""
+import asyncio
+
+import pytest
+
+from src.services.metadata_cache import MetadataCache, MetadataUnavailableError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Loader:
+    """Busca falsa: devolve `value`, ou levanta `error`; `gate` segura a resposta"""
+
+    def __init__(self, value="v1"):
+        self.value = value
+        self.error = None
+        self.calls = 0
+        self.gate = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _cache(clock: Clock) -> MetadataCache:
+    return MetadataCache(ttl=60, stale_ttl=300, error_backoff=10, error_backoff_max=40, clock=clock)
+
+
+def test_fresh_value_is_served_until_ttl_expires():
+    clock, loader = Clock(), Loader()
+
+    async def scenario():
+        cache = _cache(clock)
+        first = await cache.get("categories", loader)
+        clock.now += 59
+        second = await cache.get("categories", loader)
+        return cache, first, second
+
+    cache, first, second = asyncio.run(scenario())
+    assert first == second == "v1"
+    assert loader.calls == 1
+    assert (cache.stats.misses, cache.stats.hits) == (1, 1)
+    assert cache.snapshot()["hit_rate"] == 0.5
+
+
+def test_expired_value_is_refetched_after_stale_window():
+    clock, loader = Clock(), Loader()
+
+    async def scenario():
+        cache = _cache(clock)
+        await cache.get("categories", loader)
+        clock.now += 60 + 300
+        loader.value = "v2"
+        return cache, await cache.get("categories", loader)
+
+    cache, value = asyncio.run(scenario())
+    assert value == "v2"
+    assert loader.calls == 2
+    assert cache.stats.misses == 2
+    assert cache.version("categories") == 2
+
+
+def test_stale_value_is_served_while_refreshing_in_background():
+    clock, loader = Clock(), Loader()
+
+    async def scenario():
+        cache = _cache(clock)
+        await cache.get("categories", loader)
+        clock.now += 61
+        loader.value = "v2"
+        loader.gate = asyncio.Event()
+        # a leitura não espera a atualização (presa no `gate`)
+        stale = await cache.get("categories", loader)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        calls_during = loader.calls
+        loader.gate.set()
+        await asyncio.gather(*cache._background)
+        return cache, stale, calls_during, await cache.get("categories", loader)
+
+    cache, stale, calls_during, fresh = asyncio.run(scenario())
+    assert stale == "v1"
+    assert calls_during == 2
+    assert fresh == "v2"
+    assert cache.stats.stale_hits == 1
+    assert cache.stats.refreshes == 2
+
+
+def test_failure_is_cached_with_exponential_backoff():
+    clock, loader = Clock(), Loader()
+    loader.error = RuntimeError("503")
+
+    async def scenario():
+        cache = _cache(clock)
+        with pytest.raises(RuntimeError):
+            await cache.get("accounts", loader)
+        # dentro do backoff: nenhuma chamada nova
+        clock.now += 9
+        with pytest.raises(MetadataUnavailableError):
+            await cache.get("accounts", loader)
+        calls_in_backoff = loader.calls
+        # passado o backoff, tenta de novo e falha: o próximo backoff dobra
+        clock.now += 2
+        with pytest.raises(RuntimeError):
+            await cache.get("accounts", loader)
+        clock.now += 15
+        with pytest.raises(MetadataUnavailableError):
+            await cache.get("accounts", loader)
+        clock.now += 6
+        loader.error = None
+        return cache, calls_in_backoff, await cache.get("accounts", loader)
+
+    cache, calls_in_backoff, value = asyncio.run(scenario())
+    assert calls_in_backoff == 1
+    assert value == "v1"
+    assert loader.calls == 3
+    assert cache.stats.negative_hits == 2
+    assert cache.stats.refresh_errors == 2
+    assert cache.snapshot()["keys"]["accounts"]["failures"] == 0
+
+
+def test_failed_refresh_keeps_serving_last_value():
+    clock, loader = Clock(), Loader()
+
+    async def scenario():
+        cache = _cache(clock)
+        await cache.get("credit_cards", loader)
+        clock.now += 60 + 300
+        loader.error = RuntimeError("timeout")
+        after_failure = await cache.get("credit_cards", loader)
+        during_backoff = await cache.get("credit_cards", loader)
+        return cache, after_failure, during_backoff
+
+    cache, after_failure, during_backoff = asyncio.run(scenario())
+    assert after_failure == during_backoff == "v1"
+    assert loader.calls == 2
+    assert cache.stats.negative_hits == 1
+
+
+def test_concurrent_misses_share_one_fetch():
+    clock, loader = Clock(), Loader()
+
+    async def scenario():
+        cache = _cache(clock)
+        loader.gate = asyncio.Event()
+        waiters = [asyncio.create_task(cache.get("categories", loader)) for _ in range(5)]
+        await asyncio.sleep(0)
+        loader.gate.set()
+        return cache, await asyncio.gather(*waiters)
+
+    cache, values = asyncio.run(scenario())
+    assert values == ["v1"] * 5
+    assert loader.calls == 1
+    assert cache.stats.misses == 5
+    assert cache.stats.coalesced == 4
+
+
+def test_invalidate_forces_a_new_fetch():
+    clock, loader = Clock(), Loader()
+
+    async def scenario():
+        cache = _cache(clock)
+        await cache.get("categories", loader)
+        cache.invalidate("categories")
+        loader.value = "v2"
+        return await cache.get("categories", loader)
+
+    assert asyncio.run(scenario()) == "v2"
+    assert loader.calls == 2
@@ -0,0 +1,94 @@
+"""Índice de nomes: busca sem caixa/acentos, ordem exata → palavras → trigramas e memo"""
+import pytest
+
+from src.models.expense import Category
+from src.services import name_index
+from src.services.name_index import NameIndex
+from src.services.organizze import OrganizzeClient
+
+
+def _categories(*names: str):
+    return [Category(i, name, "expense") for i, name in enumerate(names, 1)]
+
+
+CATEGORIES = _categories(
+    "Alimentação", "Restaurante", "Viagem", "Casa e Mercado", "Mercado", "Conta Itaú", "Itaú",
+)
+
+
+def _find(name: str, items=CATEGORIES):
+    found = NameIndex(items).find(name)
+    return found.name if found else None
+
+
+@pytest.mark.parametrize("query", ["alimentacao", "ALIMENTAÇÃO", "  Alimentação  ", "alimentação!"])
+def test_lookup_ignores_case_accents_and_punctuation(query):
+    assert _find(query) == "Alimentação"
+
+
+def test_exact_name_wins_over_names_sharing_words():
+    # "Casa e Mercado" vem antes na lista e também tem a palavra
+    assert _find("mercado") == "Mercado"
+    assert _find("itau") == "Itaú"
+    assert _find("conta itau") == "Conta Itaú"
+
+
+def test_exact_match_does_not_score_candidates(monkeypatch):
+    index = NameIndex(CATEGORIES)
+    monkeypatch.setattr(index, "_by_trigram", {})
+    monkeypatch.setattr(index, "_by_token", {})
+    assert index.find("RESTAURANTE").name == "Restaurante"
+
+
+def test_shared_word_wins_over_closer_spelling():
+    items = _categories("Cademia", "Mensalidade academia")
+    assert _find("academia", items) == "Mensalidade academia"
+
+
+def test_word_variants_match_by_stem():
+    assert _find("viagens") == "Viagem"
+
+
+def test_trigrams_resolve_misspelling_without_shared_word():
+    assert _find("restaurnte") == "Restaurante"
+
+
+def test_unrelated_name_finds_nothing():
+    assert _find("xyz") is None
+    assert _find("") is None
+
+
+def test_memo_remembers_results_including_misses(monkeypatch):
+    index = NameIndex(CATEGORIES)
+    searches = []
+    search = index._search
+    monkeypatch.setattr(index, "_search", lambda name: searches.append(name) or search(name))
+
+    for _ in range(3):
+        assert index.find("restaurnte").name == "Restaurante"
+        assert index.find("xyz") is None
+    assert searches == ["restaurnte", "xyz"]
+
+
+def test_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(name_index, "MEMO_SIZE", 2)
+    index = NameIndex(CATEGORIES)
+    for query in ("mercado", "viagem", "restaurante"):
+        index.find(query)
+    assert list(index._memo) == ["mercado", "viagem"]
+
+
+def test_client_rebuilds_index_when_list_identity_changes():
+    client = OrganizzeClient()
+    first = client._index('categories', CATEGORIES)
+    assert first.find("mercado").id == 5
+    # mesma lista (cache sem atualização): mesmo índice e mesmo memo
+    assert client._index('categories', CATEGORIES) is first
+
+    # lista nova do cache (categoria renomeada): índice novo, memo antigo descartado
+    refreshed = _categories("Alimentação", "Restaurante", "Viagem", "Casa e Mercado", "Supermercado")
+    second = client._index('categories', refreshed)
+    assert second is not first
+    assert second.find("mercado").name == "Casa e Mercado"
+    # índices são por tipo: contas não reaproveitam o de categorias
+    assert client._index('accounts', CATEGORIES) is not first
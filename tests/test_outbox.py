@@ -0,0 +1,116 @@
+"""Flusher do outbox: conferência antes do reenvio e limite de envios por conta"""
+import asyncio
+import time
+
+import httpx
+
+from src.models.expense import ExpenseData
+from src.services.outbox import SENT, Outbox
+
+
+def _expense(account_id: int = 10) -> ExpenseData:
+    return ExpenseData(description="Mercado", date="2025-01-10", amount_cents=-5000, account_id=account_id)
+
+
+def _bad_gateway() -> httpx.HTTPStatusError:
+    request = httpx.Request('POST', 'http://organizze.test/transactions')
+    return httpx.HTTPStatusError("HTTP 502", request=request, response=httpx.Response(502, request=request))
+
+
+def _outbox(tmp_path, send, find=None, rate_per_account: float = 0, burst: int = 3) -> Outbox:
+    return Outbox(
+        send,
+        find=find,
+        sqlite_path=str(tmp_path / 'outbox.sqlite3'),
+        backoff_base=0.01,
+        backoff_max=0.05,
+        rate_per_account=rate_per_account,
+        burst=burst,
+        poll_interval=0.05,
+    )
+
+
+async def _drain(outbox: Outbox, timeout: float = 5.0) -> dict:
+    await outbox.start()
+    deadline = time.monotonic() + timeout
+    try:
+        while outbox.snapshot()['pending']:
+            assert time.monotonic() < deadline, "outbox não esvaziou"
+            await asyncio.sleep(0.01)
+    finally:
+        await outbox.stop()
+    return outbox.snapshot()
+
+
+def _status(outbox: Outbox, entry_id: int) -> str:
+    return outbox._db.execute("SELECT status FROM outbox WHERE id = ?", (entry_id,)).fetchone()[0]
+
+
+def test_unconfirmed_entry_is_looked_up_before_resend(tmp_path):
+    events = []
+
+    async def send(expense):
+        events.append('send')
+        if events.count('send') == 1:
+            raise _bad_gateway()
+        return {"id": 1}
+
+    async def find(expense):
+        events.append('find')
+        assert expense.notes.endswith("(ref. 1)")
+        return None
+
+    async def scenario():
+        outbox = _outbox(tmp_path, send, find)
+        entry_id = await outbox.enqueue(_expense())
+        return outbox, entry_id, await _drain(outbox)
+
+    outbox, entry_id, snapshot = asyncio.run(scenario())
+    assert events == ['send', 'find', 'send']
+    assert _status(outbox, entry_id) == SENT
+    assert snapshot['found_existing'] == 0
+
+
+def test_unconfirmed_entry_found_in_organizze_is_not_resent(tmp_path):
+    events = []
+
+    async def send(expense):
+        events.append('send')
+        raise _bad_gateway()
+
+    async def find(expense):
+        events.append('find')
+        return {"id": 99}
+
+    async def scenario():
+        outbox = _outbox(tmp_path, send, find)
+        entry_id = await outbox.enqueue(_expense())
+        return outbox, entry_id, await _drain(outbox)
+
+    outbox, entry_id, snapshot = asyncio.run(scenario())
+    assert events == ['send', 'find']
+    assert _status(outbox, entry_id) == SENT
+    assert snapshot['found_existing'] == 1
+
+
+def test_token_bucket_spaces_posts_of_the_same_account(tmp_path):
+    sent_at = {}
+
+    async def send(expense):
+        sent_at.setdefault(expense.account_id, []).append(time.monotonic())
+        return {"id": 1}
+
+    async def scenario():
+        # 10/s com rajada de 1: a partir do segundo envio, ~100 ms entre posts da mesma conta
+        outbox = _outbox(tmp_path, send, rate_per_account=10, burst=1)
+        for account_id in (10, 10, 10, 11):
+            await outbox.enqueue(_expense(account_id))
+        return await _drain(outbox)
+
+    snapshot = asyncio.run(scenario())
+    same_account = sent_at[10]
+    assert len(same_account) == 3
+    assert all(later - earlier >= 0.08 for earlier, later in zip(same_account, same_account[1:]))
+    # outra conta tem o próprio balde: não espera a primeira
+    assert sent_at[11][0] - same_account[0] < 0.05
+    assert snapshot['rate_limited_ms'] > 0
@@ -0,0 +1,31 @@
+"""Uso de tokens: custo calculado com o preço do modelo que respondeu"""
+from src.config.settings import settings
+from src.services.token_usage import TokenUsageTracker
+
+USAGE = {"input_tokens": 1_000_000, "output_tokens": 100_000, "input_token_details": {"cache_read": 0}}
+
+
+def test_cost_uses_each_model_prices(monkeypatch):
+    monkeypatch.setattr(settings, "openai_strong_model", "gpt-4o")
+    monkeypatch.setattr(settings, "openai_input_cost_per_mtok", 0.15)
+    monkeypatch.setattr(settings, "openai_output_cost_per_mtok", 0.6)
+    monkeypatch.setattr(settings, "openai_strong_input_cost_per_mtok", 2.5)
+    monkeypatch.setattr(settings, "openai_strong_output_cost_per_mtok", 10.0)
+
+    tracker = TokenUsageTracker()
+    tracker.record(1, USAGE, 100.0, "gpt-4o-mini")
+    tracker.record(1, USAGE, 300.0, "gpt-4o")
+    snapshot = tracker.snapshot()
+
+    assert snapshot["per_model"]["gpt-4o-mini"]["cost_usd"] == 0.21
+    assert snapshot["per_model"]["gpt-4o"]["cost_usd"] == 3.5
+    assert snapshot["cost_usd"] == 3.71
+    assert snapshot["per_user"]["1"]["cost_usd"] == 3.71
+
+
+def test_cost_is_none_without_prices(monkeypatch):
+    for name in ("input", "cached_input", "output"):
+        monkeypatch.setattr(settings, f"openai_{name}_cost_per_mtok", 0.0)
+    tracker = TokenUsageTracker()
+    tracker.record(None, USAGE, 100.0, "gpt-4o-mini")
+    assert tracker.snapshot()["cost_usd"] is None
@@ -0,0 +1,23 @@
+"""Cache de transcrições: acerto por conteúdo também vale para o arquivo do Telegram"""
+import asyncio
+
+from src.config.settings import settings
+from src.services.transcription import TranscriptionService, _cache_key
+
+
+def test_content_hash_hit_remembers_file_unique_id(monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "sk-test")
+    monkeypatch.setattr(settings, "transcription_cache_path", "")
+
+    async def scenario():
+        service = TranscriptionService()
+        await service.cache.put(_cache_key("content_hash", "abc"), "gastei 10 reais")
+
+        first = await service.get_cached(file_unique_id="file-2", content_hash="abc")
+        # reenvio do mesmo arquivo: resolvido antes do download
+        second = await service.get_cached(file_unique_id="file-2")
+        return first, second, service.cache_hits
+
+    first, second, hits = asyncio.run(scenario())
+    assert first == second == "gastei 10 reais"
+    assert hits == {"file_unique_id": 1, "content_hash": 1}
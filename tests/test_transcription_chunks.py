@@ -0,0 +1,111 @@
+"""Áudio longo em trechos: onde cortar, como juntar os textos e falha de um trecho"""
+import asyncio
+
+import pytest
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from src.config.settings import settings
+from src.models.audio import AudioPayload
+from src.services import transcription
+from src.services.audio_processing import chunk_bounds
+from src.services.transcription import TranscriptionService, merge_transcripts
+
+FRAME_RATE = 16000
+CHUNK_MS = 10_000
+OVERLAP_MS = 500
+MIN_SILENCE_MS = 300
+SILENCE_THRESH_DB = 16
+
+
+def _tone(duration_ms: int) -> AudioSegment:
+    return Sine(440, sample_rate=FRAME_RATE).to_audio_segment(duration=duration_ms, volume=-20)
+
+
+def _silence(duration_ms: int) -> AudioSegment:
+    return AudioSegment.silent(duration=duration_ms, frame_rate=FRAME_RATE)
+
+
+def _bounds(segment: AudioSegment):
+    return chunk_bounds(segment, CHUNK_MS, OVERLAP_MS, MIN_SILENCE_MS, SILENCE_THRESH_DB)
+
+
+def test_short_audio_is_a_single_chunk():
+    assert _bounds(_tone(CHUNK_MS)) == [(0, CHUNK_MS)]
+
+
+def test_cuts_at_pause_and_overlaps_neighbours():
+    # pausa em 7,0–7,4 s (dentro da janela do primeiro corte); depois só fala
+    segment = _tone(7_000) + _silence(400) + _tone(17_600)
+    bounds = _bounds(segment)
+
+    assert len(bounds) == 3
+    first_cut = bounds[0][1] - OVERLAP_MS
+    assert 7_000 <= first_cut <= 7_400
+    # sem pausa no segundo trecho: corta no limite
+    second_cut = first_cut + CHUNK_MS
+    assert bounds == [
+        (0, first_cut + OVERLAP_MS),
+        (first_cut - OVERLAP_MS, second_cut + OVERLAP_MS),
+        (second_cut - OVERLAP_MS, len(segment)),
+    ]
+
+
+def test_last_chunk_ends_at_audio_end_without_overlap_past_it():
+    segment = _silence(CHUNK_MS * 2 + 1_000)
+    bounds = _bounds(segment)
+
+    assert bounds[0][0] == 0
+    assert bounds[-1] == (CHUNK_MS * 2 - OVERLAP_MS, len(segment))
+    assert all(begin < end <= len(segment) for begin, end in bounds)
+
+
+def test_merge_removes_repeated_words_at_the_seam():
+    texts = ["gastei cinquenta reais no mercado", "No mercado, e vinte na farmácia"]
+    assert merge_transcripts(texts) == "gastei cinquenta reais no mercado e vinte na farmácia"
+
+
+def test_merge_without_overlap_keeps_every_word():
+    texts = ["gastei cinquenta reais", "no mercado ontem"]
+    assert merge_transcripts(texts) == "gastei cinquenta reais no mercado ontem"
+
+
+def test_merge_skips_empty_chunks():
+    texts = ["", "gastei cinquenta reais no", "   ", "no mercado"]
+    assert merge_transcripts(texts) == "gastei cinquenta reais no mercado"
+
+
+def test_failed_chunk_cancels_the_others(monkeypatch):
+    monkeypatch.setattr(settings, "transcription_cache_path", "")
+    monkeypatch.setattr(settings, "transcription_max_workers", 3)
+    monkeypatch.setattr(
+        transcription, "export_chunk",
+        lambda segment, bounds, index, bitrate: AudioPayload(data=b"\0", filename=f"chunk_{index}.ogg"),
+    )
+    cancelled = []
+
+    async def scenario():
+        service = TranscriptionService()
+
+        async def plan(audio):
+            return _silence(10), [(0, 1), (1, 2), (2, 3)]
+
+        async def transcribe_one(chunk):
+            if chunk.filename == "chunk_0.ogg":
+                await asyncio.sleep(0.01)
+                raise RuntimeError("whisper fora do ar")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(chunk.filename)
+                raise
+            return "não deveria chegar aqui"
+
+        service._plan_chunks = plan
+        service._transcribe_one = transcribe_one
+        with pytest.raises(RuntimeError, match="whisper fora do ar"):
+            await asyncio.wait_for(service.transcribe(AudioPayload(data=b"\0", filename="audio.ogg")), 2)
+        # já cancelados quando o erro chega, não só no encerramento do loop
+        assert sorted(cancelled) == ["chunk_1.ogg", "chunk_2.ogg"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+"""Fila de updates: ordem por chat, limite de pendentes e reentregas"""
+import asyncio
+
+import pytest
+from telegram import Update
+
+from src.bot.update_queue import QueueFullError, UpdateQueue
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": "oi",
+        },
+    }, None)
+
+
+def test_redelivery_of_queued_update_is_ignored():
+    async def scenario():
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(update):
+            await release.wait()
+            handled.append(update.update_id)
+
+        queue = UpdateQueue(handler, workers=1, maxsize=2)
+        queue.start()
+        assert queue.submit(_update(1, 100))
+        assert queue.submit(_update(2, 200))
+        # reentrega com a fila cheia: ignorada, sem 429 e sem ocupar posição
+        assert not queue.submit(_update(2, 200))
+        with pytest.raises(QueueFullError):
+            queue.submit(_update(3, 300))
+
+        release.set()
+        await queue.stop()
+        return handled, queue.snapshot()
+
+    handled, snapshot = asyncio.run(scenario())
+    assert handled == [1, 2]
+    assert snapshot["redelivered"] == 1
+    assert snapshot["rejected"] == 1
+
+
+def test_updates_of_a_chat_run_in_order_and_chats_in_parallel():
+    async def scenario():
+        running, order = set(), []
+        overlap = False
+
+        async def handler(update):
+            nonlocal overlap
+            chat_id = update.effective_chat.id
+            overlap = overlap or bool(running - {chat_id})
+            running.add(chat_id)
+            await asyncio.sleep(0.01)
+            order.append(update.update_id)
+            running.discard(chat_id)
+
+        queue = UpdateQueue(handler, workers=4, maxsize=10)
+        queue.start()
+        for update_id, chat_id in [(1, 100), (2, 100), (3, 200), (4, 100), (5, 200)]:
+            queue.submit(_update(update_id, chat_id))
+        await queue.stop()
+        return order, overlap
+
+    order, overlap = asyncio.run(scenario())
+    assert [u for u in order if u in (1, 2, 4)] == [1, 2, 4]
+    assert [u for u in order if u in (3, 5)] == [3, 5]
+    assert overlap
@@ -0,0 +1,158 @@
+"""Retomada do workflow: a nova tentativa repete só a etapa que falhou"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.bot import handlers
+from src.bot.dedup import DedupStore, Deduplicator
+from src.graph import nodes
+from src.graph.checkpoint import open_checkpointer, thread_config, thread_id
+from src.models.expense import ExpenseData, ExtractionContext, ExtractionResult
+
+CHAT_ID, MESSAGE_ID = 100, 7
+THREAD = thread_id(CHAT_ID, MESSAGE_ID)
+
+
+class FakeTranscription:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_cached(self, file_unique_id=None, content_hash=None):
+        return None
+
+    async def transcribe(self, audio):
+        self.calls += 1
+        return "gastei 50 reais no mercado"
+
+
+class FakeExtraction:
+    def __init__(self):
+        self.calls = 0
+
+    async def load_context(self):
+        return ExtractionContext(categories=[], accounts=[], credit_cards=[], prompt_prefix="")
+
+    async def extract(self, transcription, context=None, user_id=None):
+        self.calls += 1
+        return ExtractionResult(expense=ExpenseData(description="Mercado", date="2025-03-14", amount_cents=-5000))
+
+
+class FlakyOrganizze:
+    """Falha na primeira gravação, registra nas seguintes"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create_transaction(self, expense):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("Organizze indisponível")
+        return {"id": 1}
+
+
+async def _reply(*args, **kwargs):
+    return SimpleNamespace(chat_id=CHAT_ID, message_id=MESSAGE_ID + 1)
+
+
+def _voice_update():
+    async def download_to_memory(buffer):
+        buffer.write(b"\0" * 64)
+
+    async def get_file():
+        return SimpleNamespace(file_path="voice/file.ogg", download_to_memory=download_to_memory)
+
+    voice = SimpleNamespace(file_unique_id="fuid", file_size=64, duration=2, mime_type="audio/ogg", get_file=get_file)
+    message = SimpleNamespace(message_id=MESSAGE_ID, voice=voice, reply_text=_reply)
+    return SimpleNamespace(
+        message=message,
+        effective_chat=SimpleNamespace(id=CHAT_ID),
+        effective_user=SimpleNamespace(id=1),
+    ), voice
+
+
+def _retry_update(edits: list):
+    async def answer():
+        return None
+
+    async def edit_message_text(text, reply_markup=None):
+        edits.append((text, reply_markup))
+        return await _reply()
+
+    query = SimpleNamespace(data=f"{handlers.RETRY_PREFIX}{THREAD}", answer=answer, edit_message_text=edit_message_text)
+    return SimpleNamespace(callback_query=query)
+
+
+@pytest.fixture
+def services(monkeypatch):
+    fakes = SimpleNamespace(
+        transcription=FakeTranscription(), extraction=FakeExtraction(), organizze=FlakyOrganizze()
+    )
+    monkeypatch.setattr(nodes, 'transcription_service', fakes.transcription)
+    monkeypatch.setattr(handlers, 'transcription_service', fakes.transcription)
+    monkeypatch.setattr(nodes, 'extraction_service', fakes.extraction)
+    monkeypatch.setattr(nodes, 'organizze_client', fakes.organizze)
+    monkeypatch.setattr(nodes.audio_preprocessor, 'enabled', False)
+    monkeypatch.setattr(handlers, 'deduplicator', Deduplicator(DedupStore(ttl=60, max_entries=100)))
+    # configure_workflow troca estes globais: o monkeypatch os restaura no fim
+    for name in ('expense_workflow', 'checkpointer', 'outbox'):
+        monkeypatch.setattr(handlers, name, getattr(handlers, name))
+    return fakes
+
+
+def _scenario(tmp_path, resume):
+    async def run():
+        async with open_checkpointer(str(tmp_path / 'checkpoints.sqlite3')) as saver:
+            handlers.configure_workflow(saver, None)
+            update, voice = _voice_update()
+
+            failed = await handlers._run_workflow(update, voice, "voice")
+            assert not failed.ok
+            assert failed.retry_thread == THREAD
+
+            resumed = await resume(update, voice)
+            return failed, resumed, await saver.aget_tuple(thread_config(THREAD))
+    return asyncio.run(run())
+
+
+def _assert_only_send_repeated(services, resumed, checkpoint):
+    assert resumed.ok
+    assert "Gasto registrado" in resumed.text
+    assert services.transcription.calls == 1
+    assert services.extraction.calls == 1
+    assert services.organizze.calls == 2
+    # concluída: a thread é apagada do arquivo
+    assert checkpoint is None
+
+
+def test_redelivered_update_resumes_from_failed_send(tmp_path, services):
+    async def redeliver(update, voice):
+        return await handlers._run_workflow(update, voice, "voice")
+
+    _, resumed, checkpoint = _scenario(tmp_path, redeliver)
+    _assert_only_send_repeated(services, resumed, checkpoint)
+
+
+def test_retry_button_resumes_from_failed_send(tmp_path, services):
+    edits = []
+
+    async def press_retry(update, voice):
+        await handlers.retry_handler(_retry_update(edits), None)
+        # "processando" e depois o resultado, sem botão de nova tentativa
+        text, markup = edits[-1]
+        return SimpleNamespace(ok=markup is None, text=text)
+
+    _, resumed, checkpoint = _scenario(tmp_path, press_retry)
+    assert len(edits) == 2
+    _assert_only_send_repeated(services, resumed, checkpoint)
+
+
+def test_retry_after_completion_has_nothing_to_resume(tmp_path, services):
+    async def retry_twice(update, voice):
+        await handlers._resume(THREAD)
+        return await handlers._resume(THREAD)
+
+    _, again, _ = _scenario(tmp_path, retry_twice)
+    assert not again.ok
+    assert again.text == handlers.RETRY_EXPIRED_MESSAGE
+    assert services.organizze.calls == 2